@@ -5,11 +5,13 @@
  */
 """
 
+import json
 import logging
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from apscheduler.events import EVENT_JOB_MISSED, EVENT_JOB_SUBMITTED  # type: ignore
 from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
 from apscheduler.schedulers.base import (  # type: ignore
     STATE_PAUSED,
@@ -18,9 +20,26 @@ from apscheduler.schedulers.base import (  # type: ignore
 )
 from database import config_db
 from email_notifier import EmailNotifier
-from embress_renamer import EmbressRenamer, WhitelistLoader
-from flask import Flask, jsonify, render_template, request  # type: ignore
+from event_stream import EventBroadcaster
+from embress_renamer import EmbressRenamer, RegexLoader, WhitelistLoader
+from flask import (  # type: ignore
+    Flask,
+    Response,
+    jsonify,
+    render_template,
+    request,
+    stream_with_context,
+)
 from logging_utils import DailyFileHandler
+from media_watcher import MediaWatcher
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    SCHEDULER_LAG_SECONDS,
+    SCHEDULER_MISSED,
+    SCHEDULER_NEXT_RUN_LAG,
+    registry as metrics_registry,
+)
+from scan_jobs import ScanJob, ScanJobManager, result_summary
 
 LOGS_PATH = Path(os.getenv("LOG_PATH", "./data/logs"))
 MEDIA_PATH = os.getenv("MEDIA_PATH", "./data/media")
@@ -37,6 +56,7 @@ renamer = EmbressRenamer(MEDIA_PATH)
 scheduler = BackgroundScheduler()
 
 email_notifier = EmailNotifier()
+events = EventBroadcaster()
 
 WHITELIST_ENDPOINTS = {
     "static",
@@ -74,7 +94,12 @@ def scheduled_scan() -> None:
     try:
         app.logger.info("Start scheduled scanning … …")
         result = renamer.scan_and_rename()
-        config_db.add_scan_history(result)
+        if result.get("attached"):
+            # 复用了正在进行的全库扫描，结果由发起方记录
+            app.logger.info("Scheduled scanning attached to a running full scan")
+            return
+        record_scan_history(result)
+        publish_scan_result(result)
         app.logger.info(f"Scheduled scanning completed: {result}")
         email_notifier.send_notification(result)
     except Exception as exc:
@@ -88,6 +113,96 @@ def scheduled_scan() -> None:
         email_notifier.send_notification(error_result)
 
 
+def record_watch_scan(result: dict) -> None:
+    """监听模式触发的季目录扫描只记录产生了变更的结果，不发送邮件"""
+    if result.get("status") == "error":
+        app.logger.warning(f"Watch scanning skipped: {result.get('message')}")
+        return
+    if result.get("attached"):
+        return
+    effect_keys = (
+        "renamed",
+        "renamed_subtitle",
+        "renamed_audio",
+        "renamed_picture",
+        "deleted_nfo",
+    )
+    if not any(result.get(k) for k in effect_keys):
+        discard_scan_result(result)
+        return
+    record_scan_history(result)
+    publish_scan_result(result)
+    app.logger.info(f"Watch scanning completed: {result}")
+
+
+def run_scan_job(job: ScanJob) -> dict:
+    if job.kind == "rollback_run":
+        app.logger.info(f"Start rollback of scan run: {job.target}")
+        return renamer.rollback_scan_run(job.target, progress=job.progress)
+    if job.kind == "rollback_tree":
+        app.logger.info(f"Start rollback of directory: {job.target}")
+        return renamer.rollback_tree(job.target, progress=job.progress)
+    app.logger.info(f"Start {job.kind} scanning: {job.target}")
+    return renamer.scan_and_rename(
+        sub_path=job.params.get("sub_path"),
+        full_sweep=bool(job.params.get("full_sweep")),
+        progress=job.progress,
+    )
+
+
+def finish_scan_job(job: ScanJob) -> None:
+    """任务结束后写入扫描历史；指定目录扫描的路径错误不记录，与同步接口一致"""
+    result = job.result
+    app.logger.info(f"Scan job {job.id} {job.status}: {result}")
+    if job.kind == "directory" and result.get("status") == "error":
+        discard_scan_result(result)
+        return
+    if result.get("attached") or result.get("status") == "busy":
+        return
+    record_scan_history(result)
+
+
+def record_scan_history(result: dict) -> None:
+    """写入扫描历史，结果中带回历史 ID，未重命名文件明细由前端按该 ID 分页拉取"""
+    result["history_id"] = config_db.add_scan_history(result)
+
+
+def discard_scan_result(result: dict) -> None:
+    """不写入历史的扫描结果丢弃其暂存的未重命名文件；附加到其他扫描的结果由发起方处理"""
+    if result.get("scan_id") and not result.get("attached"):
+        config_db.discard_pending_unrenamed(result["scan_id"])
+
+
+def publish_job_update(job: ScanJob) -> None:
+    events.publish("job", job.as_dict())
+
+
+def publish_scan_result(result: dict) -> None:
+    """定时/监听扫描结束时推送摘要，未重命名列表等大字段由前端按需重新拉取"""
+    summary = result_summary(result)
+    summary.pop("fs_stats", None)
+    events.publish("scan", summary)
+
+
+def publish_log_line(filename: str, line: str) -> None:
+    events.publish("log", {"file": filename, "line": line})
+
+
+def record_scheduler_event(event) -> None:
+    """记录调度任务实际提交时间相对计划时间的延迟，以及因错过时间窗口被跳过的次数"""
+    if event.code == EVENT_JOB_MISSED:
+        SCHEDULER_MISSED.inc(job=event.job_id)
+        return
+    for run_time in event.scheduled_run_times:
+        lag = (datetime.now(run_time.tzinfo) - run_time).total_seconds()
+        SCHEDULER_LAG_SECONDS.observe(max(0.0, lag), job=event.job_id)
+
+
+scan_jobs = ScanJobManager(run_scan_job, finish_scan_job, publish_job_update)
+DailyFileHandler.add_listener(publish_log_line)
+scheduler.add_listener(record_scheduler_event, EVENT_JOB_SUBMITTED | EVENT_JOB_MISSED)
+
+
 def enrich_path_fields(entries: list[dict]) -> list[dict]:
     enriched = []
     for item in entries:
@@ -129,14 +244,6 @@ def get_status():
     last_scan = config_db.get_last_scan_result()
     last_effect_scan = config_db.get_last_effect_scan_result()
 
-    if last_scan and "unrenamed_files" in last_scan:
-        last_scan["unrenamed_files"] = enrich_path_fields(last_scan["unrenamed_files"])
-
-    if last_effect_scan and "unrenamed_files" in last_effect_scan:
-        last_effect_scan["unrenamed_files"] = enrich_path_fields(
-            last_effect_scan["unrenamed_files"]
-        )
-
     return jsonify(
         {
             "media_path": MEDIA_PATH,
@@ -156,6 +263,18 @@ def get_status():
     )
 
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus 文本格式指标，抓取时需带 access_key 参数或 X-Access-Key 请求头"""
+    for job in scheduler.get_jobs():
+        lag = 0.0
+        if job.next_run_time is not None:
+            now = datetime.now(job.next_run_time.tzinfo)
+            lag = max(0.0, (now - job.next_run_time).total_seconds())
+        SCHEDULER_NEXT_RUN_LAG.set(lag, job=job.id)
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 @app.route("/api/scheduler/toggle", methods=["POST"])
 def toggle_scheduler():
     try:
@@ -188,29 +307,38 @@ def toggle_scheduler():
 @app.route("/api/history/<filter_flag>")
 def get_history(filter_flag: str):
     historys = config_db.get_scan_history(filter_flag)
-    for history in historys:
-        if "unrenamed_files" in history:
-            history["unrenamed_files"] = enrich_path_fields(history["unrenamed_files"])
     return jsonify({"history": historys, "total": len(historys)})
 
 
+@app.route("/api/history/<int:history_id>/unrenamed")
+def get_history_unrenamed(history_id: int):
+    """分页返回某次扫描的未重命名文件，历史列表与状态接口只带计数"""
+    page = max(1, request.args.get("page", 1, type=int))
+    page_size = min(500, max(1, request.args.get("page_size", 100, type=int)))
+    files, total = config_db.get_unrenamed_files(
+        history_id, offset=(page - 1) * page_size, limit=page_size
+    )
+    return jsonify(
+        {
+            "files": enrich_path_fields(files),
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+        }
+    )
+
+
 @app.route("/api/manual-scan", methods=["POST"])
 def manual_scan():
-    try:
-        app.logger.info("Start manual scanning … …")
-        result = renamer.scan_and_rename()
-        config_db.add_scan_history(result)
-        app.logger.info(f"Manual scanning completed: {result}")
-        return jsonify({"success": True, "result": result})
-    except Exception as exc:
-        app.logger.exception("Manual scanning failed")
-        error_result = {
-            "status": "error",
-            "message": str(exc),
-            "timestamp": datetime.now().isoformat(),
-        }
-        config_db.add_scan_history(error_result)
-        return jsonify({"success": False, "result": error_result}), 500
+    data = request.get_json(silent=True) or {}
+    full_sweep = bool(data.get("full_sweep"))
+    if renamer.full_scan_busy(full_sweep):
+        return (
+            jsonify({"success": False, "message": "全库增量扫描正在进行中，请稍后再发起全量扫描"}),
+            409,
+        )
+    job = scan_jobs.submit("manual", "ALL", full_sweep=full_sweep)
+    return jsonify({"success": True, "job_id": job.id, "job": job.as_dict()}), 202
 
 
 @app.route("/api/scan-directory", methods=["POST"])
@@ -219,17 +347,68 @@ def scan_directory():
     sub_path = data.get("sub_path")
     if not sub_path:
         return jsonify({"success": False, "message": "缺少 sub_path"}), 200
-    try:
-        app.logger.info(f"Start scan directory: {sub_path}")
-        result = renamer.scan_and_rename(sub_path=sub_path)
-        app.logger.info(f"Directory scan completed: {result}")
-        if result.get("status") == "error":
-            return jsonify({"success": False, "message": result.get("message")}), 200
-        config_db.add_scan_history(result)
-        return jsonify({"success": True, "result": result})
-    except Exception as exc:
-        app.logger.exception("Directory scan failed")
-        return jsonify({"success": False, "message": str(exc)}), 200
+    job = scan_jobs.submit("directory", sub_path, sub_path=sub_path)
+    return jsonify({"success": True, "job_id": job.id, "job": job.as_dict()}), 202
+
+
+@app.route("/api/scans/<scan_id>/rollback", methods=["POST"])
+def rollback_scan_run(scan_id: str):
+    """回滚某次扫描产生的全部重命名，作为后台任务执行"""
+    if not config_db.get_scan_season_dirs(scan_id):
+        return jsonify({"success": False, "message": "该次扫描没有可回滚的重命名"}), 404
+    job = scan_jobs.submit("rollback_run", scan_id)
+    return jsonify({"success": True, "job_id": job.id, "job": job.as_dict()}), 202
+
+
+@app.route("/api/events")
+def event_stream():
+    """
+    Server-Sent Events：推送扫描任务进度（job）与新写入的日志行（log）。
+    EventSource 无法设置请求头，通过 access_key 查询参数鉴权。
+    """
+    return Response(
+        stream_with_context(events.stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/jobs")
+def list_jobs():
+    return jsonify({"jobs": scan_jobs.list()})
+
+
+@app.route("/api/jobs/<job_id>")
+def get_job(job_id: str):
+    job = scan_jobs.get(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "任务不存在"}), 404
+    return jsonify({"success": True, "job": job.as_dict()})
+
+
+@app.route("/api/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id: str):
+    job = scan_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({"success": False, "message": "任务不存在"}), 404
+    return jsonify({"success": True, "job": job.as_dict()})
+
+
+@app.route("/api/plan", methods=["POST"])
+def plan_renames():
+    """预览重命名计划，以 JSON Lines 流式返回，不改动文件也不写数据库"""
+    data = request.get_json(silent=True) or {}
+    sub_path = data.get("sub_path") or None
+
+    def generate():
+        try:
+            for item in renamer.plan_renames(sub_path):
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        except Exception as exc:
+            app.logger.exception("Rename planning failed")
+            yield json.dumps({"type": "error", "message": str(exc)}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
 
 @app.route("/api/rename-file", methods=["POST"])
@@ -298,9 +477,15 @@ def rollback_season():
     if full_path.is_file():
         app.logger.info(f"Detected file path, start rollback file: {sub_path}")
         rollback_result = renamer.rollback_single_file(sub_path)
-    elif full_path.is_dir():
+    elif renamer.is_season_dir(full_path):
         app.logger.info(f"Start rollback Season: {sub_path}")
         rollback_result = renamer.scan_and_rollback(sub_path)
+    elif full_path.is_dir():
+        # 节目/媒体类型目录：按季目录并发回滚，作为后台任务执行
+        if not config_db.get_rollback_season_dirs(str(full_path.absolute())):
+            return jsonify({"success": False, "message": "该目录下没有可回滚的重命名"}), 200
+        job = scan_jobs.submit("rollback_tree", sub_path)
+        return jsonify({"success": True, "job_id": job.id, "job": job.as_dict()}), 202
     else:
         return (
             jsonify({"success": False, "message": f"路径类型不明确: {sub_path}"}),
@@ -339,6 +524,7 @@ def update_regex_patterns():
         )
     try:
         config_db.update_regex_patterns(payload)
+        RegexLoader.force_reload()
         return jsonify({"success": True, "message": "正则配置已更新"})
     except Exception as exc:
         app.logger.exception("Writing regex configuration failed")
@@ -418,6 +604,7 @@ def add_to_whitelist():
     if "items" in data:
         try:
             summary = config_db.add_whitelist_items(data["items"])
+            WhitelistLoader.force_reload()
             return jsonify({"success": summary["failed"] == [], **summary})
         except Exception as exc:
             app.logger.exception("Batch writing to whitelist failed")
@@ -654,5 +841,8 @@ if __name__ == "__main__":
             "Scheduler started. scan_job is paused by default, log_cleanup_job is active."
         )
 
+    watcher = MediaWatcher(renamer, on_result=record_watch_scan)
+    watcher.start()
+
     port = int(os.getenv("FLASK_PORT", 15000))
     app.run(host="0.0.0.0", port=port, debug=False)
@@ -0,0 +1,419 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import database
+from database import ConfigDB, load_regex_from_file
+from episode_matcher import PATTERN_TYPES, EpisodeMatcher
+from library_generator import generate_library, library_shape, release_names
+
+DEFAULT_SIZES = "1000,10000,100000"
+
+
+def _sequential_match(
+    raw: Dict[str, List[str]], filename: str
+) -> Optional[Tuple[str, Tuple[int, int], Tuple]]:
+    """旧实现：逐条 re.search，作为等价性对照"""
+    for p_type in PATTERN_TYPES:
+        for pat in raw.get(p_type, []):
+            if m := re.search(pat, filename, re.I):
+                return p_type, m.span(), m.groups()
+    return None
+
+
+def bench_matcher(args) -> Dict:
+    if args.patterns:
+        with open(args.patterns, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    else:
+        raw = load_regex_from_file()
+    names = release_names(args.count, seed=args.seed)
+    matcher = EpisodeMatcher(
+        {t: [re.compile(p, re.I) for p in pats] for t, pats in raw.items()}
+    )
+
+    mismatches = []
+    for name in names:
+        expected = _sequential_match(raw, name)
+        hit = matcher.match(name)
+        actual = (hit[0], hit[1].span(), hit[1].groups()) if hit else None
+        if actual != expected:
+            mismatches.append({"name": name, "expected": expected, "actual": actual})
+
+    start = time.perf_counter()
+    for name in names:
+        _sequential_match(raw, name)
+    sequential_secs = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in names:
+        matcher.match(name)
+    combined_secs = time.perf_counter() - start
+
+    return {
+        "benchmark": "matcher",
+        "filenames": len(names),
+        "equivalent": not mismatches,
+        "mismatches": mismatches[:20],
+        "sequential_per_sec": round(len(names) / sequential_secs),
+        "combined_per_sec": round(len(names) / combined_secs),
+        "speedup": round(sequential_secs / combined_secs, 2),
+    }
+
+
+def _use_db(path: str) -> ConfigDB:
+    """让 ConfigDB 单例在当前线程改连指定的库文件，并重新建表"""
+    local = ConfigDB._local
+    if hasattr(local, "conn"):
+        local.conn.close()
+        del local.conn
+        del local.cursor
+    database.CONFIG_DB_PATH = path
+    ConfigDB._initialized = False
+    return database.config_db
+
+
+def _legacy_record_exists(
+    cursor, path: str, original: str, record_type: str, status: str
+) -> bool:
+    cursor.execute(
+        "SELECT COUNT(*) FROM change_record "
+        "WHERE path = ? AND original = ? AND type = ? AND status = ?",
+        (path, original, record_type, status),
+    )
+    return cursor.fetchone()[0] > 0
+
+
+def _legacy_update_record(
+    conn, cursor, path: str, original: str, record_type: str, **updates
+):
+    fields = [
+        f for f in ("new", "status", "error", "timestamp", "rollback") if f in updates
+    ]
+    if not fields:
+        return
+    values = [
+        (1 if updates[f] else 0) if f == "rollback" else updates[f] for f in fields
+    ]
+    cursor.execute(
+        f"UPDATE change_record SET {', '.join(f'{f} = ?' for f in fields)} "
+        "WHERE path = ? AND original = ? AND type = ?",
+        values + [path, original, record_type],
+    )
+    conn.commit()
+
+
+def _legacy_add_change_records(db: ConfigDB, records: List[Dict]):
+    """旧实现：逐条查询是否存在再逐条更新（每条更新各自提交）"""
+    conn, cursor = db._get_connection()
+    for record in records:
+        path, original, record_type = (
+            record["path"],
+            record["original"],
+            record["type"],
+        )
+        if _legacy_record_exists(cursor, path, original, record_type, record["status"]):
+            updates = {
+                "new": record.get("new"),
+                "status": record.get("status"),
+                "error": record.get("error"),
+                "timestamp": datetime.now().isoformat(),
+                "rollback": record.get("rollback", 0),
+            }
+            if record.get("status") != "skip":
+                updates = {k: v for k, v in updates.items() if v is not None}
+                if updates:
+                    _legacy_update_record(
+                        conn, cursor, path, original, record_type, **updates
+                    )
+        else:
+            cursor.execute(
+                """
+                INSERT INTO change_record
+                (path, original, new, type, status, error, timestamp, media_type,
+                show_name, season_name, rollback, season_dir)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    path,
+                    original,
+                    record.get("new"),
+                    record_type,
+                    record.get("status"),
+                    record.get("error"),
+                    record.get("timestamp"),
+                    record.get("media_type"),
+                    record.get("show_name"),
+                    record.get("season_name"),
+                    1 if record.get("rollback") else 0,
+                    record.get("season_dir"),
+                ),
+            )
+    conn.commit()
+
+
+def _change_records(count: int, seed: int) -> List[Dict]:
+    """按 每季 24 集 组织的重命名记录，文件名取自真实发布风格"""
+    names = release_names(count, seed=seed)
+    now = datetime.now().isoformat()
+    records = []
+    for i, name in enumerate(names):
+        season_dir = f"/media/tv/Show {i // 240:05d}/Season {i // 24 % 10 + 1}"
+        new = f"S{i // 24 % 10 + 1:02d}E{i % 24 + 1:02d} - {i}.mkv"
+        records.append(
+            {
+                "path": f"{season_dir}/{new}",
+                "original": f"{i}-{name}",
+                "new": new,
+                "type": "rename",
+                "status": "success",
+                "timestamp": now,
+                "media_type": "tv",
+                "show_name": f"Show {i // 240:05d}",
+                "season_name": f"Season {i // 24 % 10 + 1}",
+                "season_dir": season_dir,
+            }
+        )
+    return records
+
+
+def bench_ingest(args) -> Dict:
+    records = _change_records(args.count, args.seed)
+    batches = [
+        records[i : i + args.batch] for i in range(0, len(records), args.batch)
+    ]
+    variants = {
+        "legacy": lambda db, batch: _legacy_add_change_records(db, batch),
+        "upsert": lambda db, batch: db.add_change_records(batch),
+    }
+    result = {"benchmark": "ingest", "records": len(records), "batch": args.batch}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, ingest in variants.items():
+            db = _use_db(os.path.join(tmp, f"{name}.db"))
+            # insert：全新记录；update：同一批记录再次写入（重复扫描）
+            for phase in ("insert", "update"):
+                start = time.perf_counter()
+                for batch in batches:
+                    ingest(db, batch)
+                secs = time.perf_counter() - start
+                result[f"{name}_{phase}_per_sec"] = round(len(records) / secs)
+            _, cursor = db._get_connection()
+            cursor.execute("SELECT COUNT(*) FROM change_record;")
+            result[f"{name}_rows"] = cursor.fetchone()[0]
+    for phase in ("insert", "update"):
+        result[f"{phase}_speedup"] = round(
+            result[f"upsert_{phase}_per_sec"] / result[f"legacy_{phase}_per_sec"], 2
+        )
+    result["equivalent"] = result["legacy_rows"] == result["upsert_rows"]
+    return result
+
+
+def _import_renamer(workdir: str):
+    """embress_renamer 在导入时读取 MEDIA_PATH/LOG_PATH，需在首次导入前指向工作目录"""
+    if "embress_renamer" not in sys.modules:
+        os.environ["MEDIA_PATH"] = os.path.join(workdir, "media")
+        os.environ["LOG_PATH"] = os.path.join(workdir, "logs")
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import embress_renamer
+
+    return embress_renamer
+
+
+def _peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _phase(secs: float, files: int, **extra) -> Dict:
+    return {
+        "seconds": round(secs, 3),
+        "files_per_sec": round(files / secs) if secs else None,
+        **extra,
+    }
+
+
+def bench_library(args) -> Dict:
+    """在生成的媒体库上计时：首次扫描、全量复扫、索引增量扫描、逐季回滚"""
+    renamer_module = _import_renamer(args.workdir)
+    media_root = Path(renamer_module.MEDIA_PATH)
+    lib_dir = media_root / f"lib-{args.files}-{args.seed}"
+    if lib_dir.exists():
+        shutil.rmtree(lib_dir)
+    shape = library_shape(args.files, args.seasons, args.episodes)
+
+    start = time.perf_counter()
+    counts = generate_library(lib_dir, seed=args.seed, **shape)
+    generate_secs = time.perf_counter() - start
+
+    _use_db(os.path.join(args.workdir, f"lib-{args.files}-{args.seed}.db"))
+    renamer_module.RegexLoader.force_reload()
+    renamer_module.WhitelistLoader.force_reload()
+    renamer = renamer_module.EmbressRenamer(str(lib_dir))
+    videos = counts["videos"]
+    phases = {}
+
+    def scan(name: str, **kwargs):
+        start = time.perf_counter()
+        result = renamer.scan_and_rename(**kwargs)
+        phases[name] = _phase(
+            time.perf_counter() - start,
+            videos,
+            renamed=result.get("renamed", 0),
+            skipped_seasons=result.get("skipped_seasons", 0),
+            fs_stats=result.get("fs_stats"),
+        )
+
+    # 回滚接口会向 stdout 打印结果，计时期间转到 stderr，保持输出为纯 JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        scan("scan_cold", full_sweep=True)
+        # 刚改动过的季目录不写索引，等待其稳定后全量复扫一次建立索引
+        time.sleep(renamer_module.INDEX_SETTLE_SECONDS)
+        scan("scan_full_rescan", full_sweep=True)
+        scan("scan_incremental")
+
+        seasons = sorted(
+            str(p.relative_to(media_root)) for p in lib_dir.glob("*/*/Season *")
+        )
+        rolled_back = 0
+        start = time.perf_counter()
+        for sub_path in seasons:
+            outcome = renamer.scan_and_rollback(sub_path)
+            rolled_back += outcome["result"].get("renamed", 0) or 0
+        phases["rollback"] = _phase(
+            time.perf_counter() - start, rolled_back, rolled_back=rolled_back
+        )
+
+    if not args.keep:
+        shutil.rmtree(lib_dir)
+    return {
+        "benchmark": "library",
+        "files": args.files,
+        "library": counts,
+        "generate_seconds": round(generate_secs, 3),
+        "scan_workers": renamer_module.SCAN_WORKERS,
+        "phases": phases,
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_suite(args) -> Dict:
+    """按文件规模依次运行 library 与 ingest，汇总为一份可用于回归对比的结果"""
+    results = []
+    for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        results.append(
+            bench_library(
+                argparse.Namespace(
+                    files=size,
+                    seasons=args.seasons,
+                    episodes=args.episodes,
+                    seed=args.seed,
+                    workdir=args.workdir,
+                    keep=False,
+                )
+            )
+        )
+        results.append(
+            bench_ingest(argparse.Namespace(count=size, batch=1000, seed=args.seed))
+        )
+    return {
+        "benchmark": "suite",
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "equivalent": all(r.get("equivalent", True) for r in results),
+        "results": results,
+    }
+
+
+def _with_workdir(func):
+    """library/suite 需要独立的媒体库与数据库目录，未指定 --workdir 时使用临时目录"""
+
+    def run(args) -> Dict:
+        if args.workdir:
+            os.makedirs(args.workdir, exist_ok=True)
+            return func(args)
+        with tempfile.TemporaryDirectory(prefix="embress-bench-") as tmp:
+            args.workdir = tmp
+            return func(args)
+
+    return run
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="EMBRESS 性能基准")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_matcher = sub.add_parser("matcher", help="集数正则匹配：等价性校验与吞吐量")
+    p_matcher.add_argument("--count", type=int, default=50000)
+    p_matcher.add_argument("--seed", type=int, default=0)
+    p_matcher.add_argument("--patterns", help="正则配置 JSON，默认使用内置配置")
+    p_matcher.set_defaults(func=bench_matcher)
+
+    p_ingest = sub.add_parser("ingest", help="变更记录批量写入：旧逐条实现与 UPSERT 对比")
+    p_ingest.add_argument("--count", type=int, default=100000)
+    p_ingest.add_argument("--batch", type=int, default=1000, help="每次调用写入的记录数")
+    p_ingest.add_argument("--seed", type=int, default=0)
+    p_ingest.set_defaults(func=bench_ingest)
+
+    p_library = sub.add_parser("library", help="生成媒体库并计时扫描与回滚")
+    p_library.add_argument("--files", type=int, default=1000, help="视频文件数")
+    p_library.add_argument("--seasons", type=int, default=2, help="每个节目的季数")
+    p_library.add_argument("--episodes", type=int, default=12, help="每季集数")
+    p_library.add_argument("--seed", type=int, default=0)
+    p_library.add_argument("--workdir", help="媒体库与数据库目录，默认临时目录")
+    p_library.add_argument("--keep", action="store_true", help="保留生成的媒体库")
+    p_library.set_defaults(func=_with_workdir(bench_library))
+
+    p_suite = sub.add_parser("suite", help="按规模运行 library 与 ingest 基准")
+    p_suite.add_argument("--sizes", default=DEFAULT_SIZES, help="逗号分隔的文件数")
+    p_suite.add_argument("--seasons", type=int, default=2)
+    p_suite.add_argument("--episodes", type=int, default=12)
+    p_suite.add_argument("--seed", type=int, default=0)
+    p_suite.add_argument("--workdir", help="媒体库与数据库目录，默认临时目录")
+    p_suite.add_argument("--output", help="结果另存为 JSON 文件")
+    p_suite.set_defaults(func=_with_workdir(bench_suite))
+
+    args = parser.parse_args(argv)
+    result = args.func(args)
+    output = json.dumps(result, ensure_ascii=False)
+    if getattr(args, "output", None):
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    return 0 if result.get("equivalent", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
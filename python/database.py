@@ -7,34 +7,99 @@
 
 import os
 import json
+import logging
 import sqlite3
 import threading
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
 import functools
+import inspect
 import time
 
+from metrics import DB_LOCK_RETRIES, DB_OPERATION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# UPSERT 条件：新写入的失败记录遇到未回滚的成功记录时保留成功记录
+_KEEP_SUCCESS_SQL = (
+    "(excluded.status = 'failed' AND change_record.status = 'success' "
+    "AND change_record.rollback = 0)"
+)
+
+# 暂存的未重命名文件超过该秒数仍未写入扫描历史时，启动时清理
+UNRENAMED_PENDING_TTL = 24 * 3600
+
+# config_meta 中的标记：旧版 scan_history.data 内嵌的 unrenamed_files 已迁移完成
+UNRENAMED_MIGRATED_META = "unrenamed_files_migrated"
+
 
 def retry_db_operation(max_retries=3, delay=0.1):
     def decorator(func):
         @functools.wraps(func)
         def wrapper(self, *args, **kwargs):
-            for attempt in range(max_retries):
-                try:
-                    return func(self, *args, **kwargs)
-                except sqlite3.OperationalError as e:
-                    if "database is locked" in str(e) and attempt < max_retries - 1:
-                        time.sleep(delay * (2**attempt))  # 指数退避
-                        continue
-                    raise
-            return None
+            started = time.monotonic()
+            try:
+                for attempt in range(max_retries):
+                    try:
+                        return func(self, *args, **kwargs)
+                    except sqlite3.OperationalError as e:
+                        if "database is locked" in str(e) and attempt < max_retries - 1:
+                            DB_LOCK_RETRIES.inc(operation=func.__name__)
+                            time.sleep(delay * (2**attempt))  # 指数退避
+                            continue
+                        raise
+                return None
+            finally:
+                DB_OPERATION_SECONDS.observe(
+                    time.monotonic() - started, operation=func.__name__
+                )
 
         return wrapper
 
     return decorator
 
 
+def timed_db_read(func):
+    """
+    记录读操作耗时。流式读取（生成器）只累计在生成器内部取数的时间，
+    不包含调用方处理每一行的时间，迭代结束或关闭时记录一次。
+    """
+    if inspect.isgeneratorfunction(func):
+
+        @functools.wraps(func)
+        def gen_wrapper(self, *args, **kwargs):
+            spent = 0.0
+            rows = func(self, *args, **kwargs)
+            try:
+                while True:
+                    started = time.monotonic()
+                    try:
+                        row = next(rows)
+                    except StopIteration:
+                        return
+                    finally:
+                        spent += time.monotonic() - started
+                    yield row
+            finally:
+                rows.close()
+                DB_OPERATION_SECONDS.observe(spent, operation=func.__name__)
+
+        return gen_wrapper
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            DB_OPERATION_SECONDS.observe(
+                time.monotonic() - started, operation=func.__name__
+            )
+
+    return wrapper
+
+
 CONFIG_DB_PATH = os.getenv("CONFIG_DB_PATH", "data/conf/config.db")
 DEFAULT_REGEX_PATH = os.getenv("DEFAULT_REGEX_PATH", "/app/conf/regex_pattern.json")
 
@@ -150,6 +215,46 @@ class ConfigDB:
             );
         """
         )
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS season_index (
+                season_dir TEXT PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                unrenamed TEXT,
+                updated_at TEXT NOT NULL
+            );
+        """
+        )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                path TEXT PRIMARY KEY,
+                season_dir TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                dir_mtime_ns INTEGER,
+                regex_version TEXT NOT NULL,
+                status TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+        """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_parse_cache_season_dir "
+            "ON parse_cache(season_dir);"
+        )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS config_meta (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            );
+        """
+        )
+
         cursor.execute("SELECT COUNT(*) FROM regex_config;")
         if cursor.fetchone()[0] == 0:
             for p_type, patterns in DEFAULT_REGEX.items():
@@ -168,8 +273,95 @@ class ConfigDB:
         self._add_column_if_missing("scan_history", "scan_type TEXT")
         self._add_column_if_missing("scan_history", "renamed_audio INTEGER DEFAULT 0")
         self._add_column_if_missing("scan_history", "renamed_picture INTEGER DEFAULT 0")
+        self._add_column_if_missing("scan_history", "duration REAL")
+        self._add_column_if_missing("scan_history", "timings TEXT")
+        self._add_column_if_missing("scan_history", "scan_id TEXT")
+        self._drop_column_if_present("season_index", "entry_count")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scan_history_scan_id "
+            "ON scan_history(scan_id);"
+        )
+        # 未重命名文件按扫描历史拆表存放，scan_history.data 只保留计数
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scan_unrenamed (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                history_id INTEGER NOT NULL
+                    REFERENCES scan_history(id) ON DELETE CASCADE,
+                path TEXT NOT NULL
+            );
+        """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scan_unrenamed_history "
+            "ON scan_unrenamed(history_id, id);"
+        )
+        # 扫描过程中按 scan_id 分批暂存，写入扫描历史时移入 scan_unrenamed
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scan_unrenamed_pending (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                scan_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+        """
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scan_unrenamed_pending_scan "
+            "ON scan_unrenamed_pending(scan_id, id);"
+        )
+        # 未写入历史的扫描（CLI、无变更的监听扫描等）留下的暂存记录
+        cursor.execute(
+            "DELETE FROM scan_unrenamed_pending WHERE created < ?;",
+            (time.time() - UNRENAMED_PENDING_TTL,),
+        )
+        conn.commit()
+        self._migrate_unrenamed_files(conn, cursor)
         self._init_change_record_table()
 
+    @staticmethod
+    def _migrate_unrenamed_files(conn, cursor):
+        """
+        把旧版 data 中内嵌的 unrenamed_files 移入 scan_unrenamed。
+        LIKE 需要扫描整张 scan_history，完成后在 config_meta 中记下标记，之后启动不再执行
+        """
+        cursor.execute(
+            "SELECT 1 FROM config_meta WHERE key = ?;", (UNRENAMED_MIGRATED_META,)
+        )
+        if cursor.fetchone():
+            return
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            cursor.execute(
+                "SELECT id, data FROM scan_history "
+                "WHERE data LIKE '%\"unrenamed_files\"%';"
+            )
+            rows = cursor.fetchall()
+            for history_id, data in rows:
+                try:
+                    record = json.loads(data)
+                except json.JSONDecodeError:
+                    continue
+                files = record.pop("unrenamed_files", None) or []
+                record.setdefault("unrenamed_count", len(files))
+                cursor.executemany(
+                    "INSERT INTO scan_unrenamed (history_id, path) VALUES (?, ?);",
+                    [(history_id, f.get("path")) for f in files if f.get("path")],
+                )
+                cursor.execute(
+                    "UPDATE scan_history SET data = ? WHERE id = ?;",
+                    (json.dumps(record, ensure_ascii=False), history_id),
+                )
+            cursor.execute(
+                "INSERT OR REPLACE INTO config_meta (key, value) VALUES (?, '1');",
+                (UNRENAMED_MIGRATED_META,),
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
     def _init_change_record_table(self):
         conn, cursor = self._get_connection()
         cursor.execute(
@@ -192,7 +384,8 @@ class ConfigDB:
                     show_name TEXT,
                     season_name TEXT,
                     rollback INTEGER DEFAULT 0,
-                    season_dir TEXT NOT NULL
+                    season_dir TEXT NOT NULL,
+                    scan_id TEXT
                 );
                 """
             )
@@ -207,6 +400,13 @@ class ConfigDB:
             cursor.execute(
                 "CREATE INDEX idx_change_record_path ON change_record(path);"
             )
+            cursor.execute(
+                "CREATE UNIQUE INDEX idx_change_record_key ON change_record(path, original, type);"
+            )
+            cursor.execute(
+                "CREATE INDEX idx_change_record_scan_id ON change_record(scan_id);"
+            )
+            conn.commit()
             return False
         else:
             cursor.execute(
@@ -218,8 +418,49 @@ class ConfigDB:
             cursor.execute(
                 "CREATE INDEX IF NOT EXISTS idx_change_record_path ON change_record(path);"
             )
+            self._add_column_if_missing("change_record", "scan_id TEXT")
+            cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_change_record_scan_id ON change_record(scan_id);"
+            )
+            self._migrate_change_record_key(conn, cursor)
             return True
 
+    @staticmethod
+    def _migrate_change_record_key(conn, cursor):
+        """
+        旧库迁移：同一 (path, original, type) 保留最新的成功记录（没有则保留最新一条），
+        再建唯一索引。成功记录之后的失败/跳过记录不能把它挤掉，否则该重命名无法回滚。
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_change_record_key';"
+        )
+        if cursor.fetchone() is not None:
+            conn.commit()
+            return
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            cursor.execute(
+                """
+                DELETE FROM change_record
+                WHERE id NOT IN (
+                    SELECT COALESCE(
+                        MAX(CASE WHEN status = 'success' THEN id END), MAX(id)
+                    )
+                    FROM change_record GROUP BY path, original, type
+                );
+                """
+            )
+            removed = cursor.rowcount
+            cursor.execute(
+                "CREATE UNIQUE INDEX idx_change_record_key ON change_record(path, original, type);"
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if removed:
+            logger.info("change_record 去重迁移完成，删除重复记录 %d 条", removed)
+
     def _add_column_if_missing(self, table: str, column_def: str):
         conn, cursor = self._get_connection()
         col_name = column_def.split()[0]  # 提取列名
@@ -235,6 +476,20 @@ class ConfigDB:
             if "duplicate column name" not in str(exc).lower():
                 raise
 
+    def _drop_column_if_present(self, table: str, column: str):
+        conn, cursor = self._get_connection()
+        cursor.execute(f"PRAGMA table_info({table});")
+        if column not in (row[1].strip() for row in cursor.fetchall()):
+            return
+
+        try:
+            cursor.execute(f"ALTER TABLE {table} DROP COLUMN {column};")
+            conn.commit()
+        except sqlite3.OperationalError as exc:
+            # SQLite < 3.35 不支持 DROP COLUMN；旧列带默认值，保留不影响写入
+            logger.warning("Keeping column %s.%s: %s", table, column, exc)
+
+    @timed_db_read
     def get_regex_patterns(self):
         conn, cursor = self._get_connection()
         cursor.execute("SELECT pattern_type, pattern FROM regex_config;")
@@ -252,8 +507,13 @@ class ConfigDB:
                     "INSERT INTO regex_config (pattern_type, pattern) VALUES (?, ?)",
                     (p_type, pat),
                 )
+        # 正则变化后未匹配文件可能变为可匹配，目录索引和解析缓存需整体失效
+        cursor.execute("DELETE FROM season_index;")
+        cursor.execute("DELETE FROM parse_cache;")
+        self._bump_config_version(cursor, "regex")
         conn.commit()
 
+    @timed_db_read
     def get_whitelist(self):
         conn, cursor = self._get_connection()
         cursor.execute(
@@ -293,6 +553,9 @@ class ConfigDB:
             except Exception as exc:
                 failed.append({"path": path, "error": str(exc)})
 
+        if inserted:
+            cursor.execute("DELETE FROM season_index;")
+            self._bump_config_version(cursor, "whitelist")
         conn.commit()
         return {"inserted": inserted, "skipped": skipped, "failed": failed}
 
@@ -302,20 +565,32 @@ class ConfigDB:
     def remove_from_whitelist(self, file_path: str):
         conn, cursor = self._get_connection()
         cursor.execute("DELETE FROM whitelist WHERE path = ?;", (file_path,))
+        removed = cursor.rowcount > 0
+        if removed:
+            cursor.execute("DELETE FROM season_index;")
+            self._bump_config_version(cursor, "whitelist")
         conn.commit()
-        return cursor.rowcount > 0
+        return removed
 
     @retry_db_operation()
-    def add_scan_history(self, result: dict):
+    def add_scan_history(self, result: dict) -> int:
         conn, cursor = self._get_connection()
         try:
             conn.execute("BEGIN IMMEDIATE;")
+            # 分阶段耗时、未重命名文件单独存放，data 中只保留计数等标量
+            data = {
+                k: v
+                for k, v in result.items()
+                if k not in ("timings", "unrenamed_files")
+            }
+            timings = result.get("timings")
             cursor.execute(
                 """
                 INSERT INTO scan_history
                 (timestamp, status, scan_type, message, processed, renamed,
-                renamed_subtitle, renamed_audio, renamed_picture, deleted_nfo, target, data)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+                renamed_subtitle, renamed_audio, renamed_picture, deleted_nfo, target,
+                duration, timings, scan_id, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
             """,
                 (
                     result.get("timestamp"),
@@ -329,19 +604,59 @@ class ConfigDB:
                     result.get("renamed_picture", 0),
                     result.get("deleted_nfo", 0),
                     result.get("target"),
-                    json.dumps(result, ensure_ascii=False),
+                    result.get("duration"),
+                    json.dumps(timings, ensure_ascii=False) if timings else None,
+                    result.get("scan_id"),
+                    json.dumps(data, ensure_ascii=False),
                 ),
             )
+            history_id = cursor.lastrowid
+            scan_id = result.get("scan_id")
+            if scan_id and result.get("unrenamed_count"):
+                cursor.execute(
+                    "INSERT INTO scan_unrenamed (history_id, path) "
+                    "SELECT ?, path FROM scan_unrenamed_pending "
+                    "WHERE scan_id = ? ORDER BY id;",
+                    (history_id, scan_id),
+                )
+                cursor.execute(
+                    "DELETE FROM scan_unrenamed_pending WHERE scan_id = ?;", (scan_id,)
+                )
             conn.commit()
+            return history_id
         except Exception as e:
             conn.rollback()
             raise sqlite3.OperationalError(f"添加扫描历史失败: {e}")
 
+    @retry_db_operation()
+    def add_pending_unrenamed(self, scan_id: str, paths: List[str]):
+        """暂存扫描中的未重命名文件，写入该次扫描的历史时一并移入 scan_unrenamed"""
+        if not paths:
+            return
+        conn, cursor = self._get_connection()
+        now = time.time()
+        cursor.executemany(
+            "INSERT INTO scan_unrenamed_pending (scan_id, path, created) "
+            "VALUES (?, ?, ?);",
+            [(scan_id, path, now) for path in paths],
+        )
+        conn.commit()
+
+    @retry_db_operation()
+    def discard_pending_unrenamed(self, scan_id: str):
+        """不写入扫描历史的扫描结果，丢弃其暂存的未重命名文件"""
+        conn, cursor = self._get_connection()
+        cursor.execute(
+            "DELETE FROM scan_unrenamed_pending WHERE scan_id = ?;", (scan_id,)
+        )
+        conn.commit()
+
+    @timed_db_read
     def get_scan_history(self, filter_flag: str):
         conn, cursor = self._get_connection()
         if filter_flag == "1":
             cursor.execute(
-                "SELECT data FROM scan_history "
+                "SELECT id, data, timings FROM scan_history "
                 "WHERE deleted_nfo > 0 "
                 "OR renamed > 0 "
                 "OR renamed_subtitle > 0 "
@@ -351,36 +666,68 @@ class ConfigDB:
             )
         else:
             cursor.execute(
-                "SELECT data FROM scan_history ORDER BY timestamp DESC LIMIT 50;"
+                "SELECT id, data, timings FROM scan_history "
+                "ORDER BY timestamp DESC LIMIT 50;"
             )
         history = []
-        for (row,) in cursor.fetchall():
-            try:
-                history.append(json.loads(row))
-            except json.JSONDecodeError:
-                pass
+        for row in cursor.fetchall():
+            record = self._load_history_row(*row)
+            if record is not None:
+                history.append(record)
         return history
 
+    @staticmethod
+    def _load_history_row(
+        history_id: int, data: str, timings: Optional[str]
+    ) -> Optional[Dict]:
+        try:
+            record = json.loads(data)
+            if timings:
+                record["timings"] = json.loads(timings)
+        except json.JSONDecodeError:
+            return None
+        record["id"] = history_id
+        return record
+
+    @timed_db_read
+    def get_unrenamed_files(
+        self, history_id: int, offset: int = 0, limit: int = 100
+    ) -> Tuple[List[Dict], int]:
+        """分页读取某条扫描历史的未重命名文件，返回 (当前页, 总数)"""
+        conn, cursor = self._get_connection()
+        cursor.execute(
+            "SELECT COUNT(*) FROM scan_unrenamed WHERE history_id = ?;", (history_id,)
+        )
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT path FROM scan_unrenamed WHERE history_id = ? "
+            "ORDER BY id LIMIT ? OFFSET ?;",
+            (history_id, limit, offset),
+        )
+        return [{"path": row[0]} for row in cursor.fetchall()], total
+
+    @timed_db_read
     def get_scan_history_count(self):
         conn, cursor = self._get_connection()
         cursor.execute("SELECT count(*) FROM scan_history;")
         return cursor.fetchone()[0]
 
+    @timed_db_read
     def get_last_scan_result(self):
         conn, cursor = self._get_connection()
-        cursor.execute("SELECT data FROM scan_history ORDER BY timestamp DESC LIMIT 1;")
+        cursor.execute(
+            "SELECT id, data, timings FROM scan_history ORDER BY timestamp DESC LIMIT 1;"
+        )
         row = cursor.fetchone()
         if row:
-            try:
-                return json.loads(row[0])
-            except json.JSONDecodeError:
-                pass
+            return self._load_history_row(*row)
         return None
 
+    @timed_db_read
     def get_last_effect_scan_result(self):
         conn, cursor = self._get_connection()
         cursor.execute(
-            "SELECT data FROM scan_history "
+            "SELECT id, data, timings FROM scan_history "
             "WHERE deleted_nfo > 0 "
             "OR renamed > 0 "
             "OR renamed_subtitle > 0 "
@@ -390,61 +737,77 @@ class ConfigDB:
         )
         row = cursor.fetchone()
         if row:
-            try:
-                return json.loads(row[0])
-            except json.JSONDecodeError:
-                pass
+            return self._load_history_row(*row)
         return None
 
+    @retry_db_operation()
     def add_change_records(self, records: List[Dict]):
-        """批量添加变更记录到数据库，避免重复"""
+        """
+        批量写入变更记录：(path, original, type) 唯一，单事务 executemany UPSERT。
+        已存在时更新状态，状态未变时只覆盖非空字段；skip 记录重复写入不做改动。
+        未回滚的成功记录不被之后的失败尝试覆盖，只记下错误信息，保证仍可回滚、仍视为已处理。
+        """
+        keep = _KEEP_SUCCESS_SQL
+        if not records:
+            return
         conn, cursor = self._get_connection()
-        for record in records:
-            path = record.get("path")
-            original = record.get("original")
-            record_type = record.get("type")
-            season_dir = record.get("season_dir")
-            status = record.get("status")
-            if self.record_exists(path, original, record_type, status):
-                updates = {
-                    "new": record.get("new"),
-                    "status": record.get("status"),
-                    "error": record.get("error"),
-                    "timestamp": datetime.now().isoformat(),
-                    "rollback": record.get("rollback", 0),
-                }
-
-                if record.get("status") != "skip":
-                    updates = {k: v for k, v in updates.items() if v is not None}
-                    if updates:
-                        self.update_existing_record(
-                            path, original, record_type, **updates
-                        )
-            else:
-                cursor.execute(
-                    """
-                    INSERT INTO change_record 
-                    (path, original, new, type, status, error, timestamp, media_type, 
-                    show_name, season_name, rollback, season_dir)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        path,
-                        original,
-                        record.get("new"),
-                        record_type,
-                        record.get("status"),
-                        record.get("error"),
-                        record.get("timestamp"),
-                        record.get("media_type"),
-                        record.get("show_name"),
-                        record.get("season_name"),
-                        1 if record.get("rollback") else 0,
-                        season_dir,
-                    ),
-                )
-        conn.commit()
+        now = datetime.now().isoformat()
+        rows = [
+            (
+                record.get("path"),
+                record.get("original"),
+                record.get("new"),
+                record.get("type"),
+                record.get("status"),
+                record.get("error"),
+                record.get("timestamp") or now,
+                record.get("media_type"),
+                record.get("show_name"),
+                record.get("season_name"),
+                1 if record.get("rollback") else 0,
+                record.get("season_dir"),
+                record.get("scan_id"),
+            )
+            for record in records
+        ]
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            cursor.executemany(
+                f"""
+                INSERT INTO change_record
+                (path, original, new, type, status, error, timestamp, media_type,
+                show_name, season_name, rollback, season_dir, scan_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path, original, type) DO UPDATE SET
+                    new = CASE WHEN {keep} THEN change_record.new
+                        WHEN excluded.status = change_record.status
+                        THEN COALESCE(excluded.new, change_record.new)
+                        ELSE excluded.new END,
+                    error = CASE WHEN excluded.status = change_record.status OR {keep}
+                        THEN COALESCE(excluded.error, change_record.error)
+                        ELSE excluded.error END,
+                    status = CASE WHEN {keep}
+                        THEN change_record.status ELSE excluded.status END,
+                    timestamp = CASE WHEN {keep}
+                        THEN change_record.timestamp ELSE excluded.timestamp END,
+                    rollback = CASE WHEN {keep}
+                        THEN change_record.rollback ELSE excluded.rollback END,
+                    media_type = COALESCE(excluded.media_type, change_record.media_type),
+                    show_name = COALESCE(excluded.show_name, change_record.show_name),
+                    season_name = COALESCE(excluded.season_name, change_record.season_name),
+                    season_dir = excluded.season_dir,
+                    scan_id = CASE WHEN {keep} THEN change_record.scan_id
+                        ELSE COALESCE(excluded.scan_id, change_record.scan_id) END
+                WHERE NOT (excluded.status = 'skip' AND change_record.status = 'skip')
+                """,
+                rows,
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
+    @timed_db_read
     def get_change_records_by_shows(self, limit: int = 200) -> List[Dict]:
         conn, cursor = self._get_connection()
         cursor.execute(
@@ -475,6 +838,7 @@ class ConfigDB:
         conn.close()
         return shows
 
+    @timed_db_read
     def get_change_records_by_show(
         self, media_type: str, show_name: str, limit: int = 100
     ) -> List[Dict]:
@@ -496,58 +860,30 @@ class ConfigDB:
         conn.close()
         return records
 
-    def record_exists(
-        self, path: str, original: str, record_type: str, status: str
-    ) -> bool:
-        """检查记录是否已存在"""
-        conn, cursor = self._get_connection()
-        cursor.execute(
-            "SELECT COUNT(*) FROM change_record WHERE path = ? AND original = ? AND type = ? AND status = ?",
-            (path, original, record_type, status),
-        )
-        return cursor.fetchone()[0] > 0
-
-    def update_existing_record(
-        self, path: str, original: str, record_type: str, **updates
-    ):
-        """更新现有记录"""
-        conn, cursor = self._get_connection()
-        update_fields = []
-        values = []
-        for field, value in updates.items():
-            if field in ["new", "status", "error", "timestamp", "rollback"]:
-                update_fields.append(f"{field} = ?")
-                if field == "rollback":
-                    values.append(1 if value else 0)
-                else:
-                    values.append(value)
-
-        if not update_fields:
+    @retry_db_operation()
+    def mark_rolled_back(self, keys: List[Tuple[str, str]]):
+        """批量标记已回滚，keys 为 (path, original)，单事务 executemany"""
+        if not keys:
             return
-
-        values.extend([path, original, record_type])
-        cursor.execute(
-            f"UPDATE change_record SET {', '.join(update_fields)} WHERE path = ? AND original = ? AND type = ?",
-            values,
-        )
-        conn.commit()
-
-    def update_change_record_rollback(
-        self, path: str, original: str, rollback: bool = True
-    ):
         conn, cursor = self._get_connection()
-        cursor.execute(
-            "UPDATE change_record SET rollback = ? WHERE path = ? AND original = ?",
-            (1 if rollback else 0, path, original),
-        )
-        conn.commit()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            cursor.executemany(
+                "UPDATE change_record SET rollback = 1 WHERE path = ? AND original = ?",
+                keys,
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
+    @timed_db_read
     def get_season_change_records(self, season_dir: str) -> List[Dict]:
         conn, cursor = self._get_connection()
         cursor.execute(
             """
             SELECT path, original, new, type, status, error, timestamp, 
-                media_type, rollback
+                media_type, rollback, scan_id
             FROM change_record 
             WHERE season_dir = ?
             ORDER BY timestamp DESC
@@ -568,11 +904,235 @@ class ConfigDB:
                     "timestamp": row[6],
                     "media_type": row[7],
                     "rollback": bool(row[8]),
+                    "scan_id": row[9],
                 }
             )
 
         return records
 
+    @timed_db_read
+    def get_scan_season_dirs(self, scan_id: str) -> List[str]:
+        """某次扫描中存在未回滚的成功重命名记录的季目录"""
+        conn, cursor = self._get_connection()
+        cursor.execute(
+            """
+            SELECT DISTINCT season_dir FROM change_record
+            WHERE scan_id = ? AND type = 'rename' AND status = 'success'
+              AND rollback = 0
+            ORDER BY season_dir
+            """,
+            (scan_id,),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    @timed_db_read
+    def get_rollback_season_dirs(self, root_dir: str) -> List[str]:
+        """root_dir（含自身及所有子目录）下存在未回滚的成功重命名记录的季目录"""
+        conn, cursor = self._get_connection()
+        prefix = root_dir.rstrip(os.sep) + os.sep
+        cursor.execute(
+            """
+            SELECT DISTINCT season_dir FROM change_record
+            WHERE (season_dir = ? OR (season_dir >= ? AND season_dir < ?))
+              AND type = 'rename' AND status = 'success' AND rollback = 0
+            ORDER BY season_dir
+            """,
+            (root_dir, prefix, prefix[:-1] + chr(ord(os.sep) + 1)),
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    @timed_db_read
+    def iter_processed_paths(self, root_dir: str) -> Iterator[str]:
+        """
+        流式返回 root_dir（含自身及所有子目录）下已处理（success/skip）文件的路径，
+        只取 path/new 两列，且仅保留 path 文件名与 new 一致的记录
+        """
+        conn, _ = self._get_connection()
+        prefix = root_dir.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        cursor = conn.execute(
+            """
+            SELECT path, new FROM change_record
+            WHERE status IN ('success', 'skip')
+              AND (season_dir = ? OR (season_dir >= ? AND season_dir < ?))
+            """,
+            (root_dir, prefix, upper),
+        )
+        try:
+            while rows := cursor.fetchmany(1000):
+                for path, new in rows:
+                    if new and os.path.basename(path) == new:
+                        yield path
+        finally:
+            cursor.close()
+
+    @timed_db_read
+    def count_season_index(self, root_dir: str) -> int:
+        """root_dir 下已建索引的季目录数，用于估算扫描进度"""
+        conn, cursor = self._get_connection()
+        prefix = root_dir.rstrip(os.sep) + os.sep
+        cursor.execute(
+            "SELECT COUNT(*) FROM season_index WHERE season_dir >= ? AND season_dir < ?;",
+            (prefix, prefix[:-1] + chr(ord(os.sep) + 1)),
+        )
+        return cursor.fetchone()[0]
+
+    @timed_db_read
+    def get_season_index(self) -> Dict[str, Dict]:
+        """读取季目录索引，返回 {season_dir: {mtime_ns, inode, unrenamed}}"""
+        conn, cursor = self._get_connection()
+        cursor.execute("SELECT season_dir, mtime_ns, inode, unrenamed FROM season_index;")
+        index = {}
+        for season_dir, mtime_ns, inode, unrenamed in cursor.fetchall():
+            try:
+                unrenamed_list = json.loads(unrenamed) if unrenamed else []
+            except json.JSONDecodeError:
+                continue
+            index[season_dir] = {
+                "mtime_ns": mtime_ns,
+                "inode": inode,
+                "unrenamed": unrenamed_list,
+            }
+        return index
+
+    @retry_db_operation()
+    def save_season_index(
+        self, entries: Dict[str, Optional[Dict]], replace_all: bool = False
+    ):
+        """批量写入季目录索引，值为 None 表示删除该目录的索引；replace_all 时先清空"""
+        conn, cursor = self._get_connection()
+        now = datetime.now().isoformat()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            if replace_all:
+                cursor.execute("DELETE FROM season_index;")
+            cursor.executemany(
+                "DELETE FROM season_index WHERE season_dir = ?;",
+                [(d,) for d, e in entries.items() if e is None],
+            )
+            cursor.executemany(
+                """
+                INSERT OR REPLACE INTO season_index
+                (season_dir, mtime_ns, inode, unrenamed, updated_at)
+                VALUES (?, ?, ?, ?, ?);
+                """,
+                [
+                    (
+                        d,
+                        e["mtime_ns"],
+                        e["inode"],
+                        json.dumps(e.get("unrenamed", []), ensure_ascii=False),
+                        now,
+                    )
+                    for d, e in entries.items()
+                    if e is not None
+                ],
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    @timed_db_read
+    def iter_parse_cache(
+        self, root_dir: str, regex_version: str
+    ) -> Iterator[Tuple[str, int, int, Optional[int], str]]:
+        """
+        流式返回 root_dir（含自身及所有子目录）下当前正则版本的解析缓存，
+        每行为 (path, size, mtime_ns, dir_mtime_ns, status)
+        """
+        conn, _ = self._get_connection()
+        prefix = root_dir.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        cursor = conn.execute(
+            """
+            SELECT path, size, mtime_ns, dir_mtime_ns, status FROM parse_cache
+            WHERE regex_version = ?
+              AND (season_dir = ? OR (season_dir >= ? AND season_dir < ?))
+            """,
+            (regex_version, root_dir, prefix, upper),
+        )
+        try:
+            while rows := cursor.fetchmany(1000):
+                yield from rows
+        finally:
+            cursor.close()
+
+    @retry_db_operation()
+    def save_parse_cache(self, entries: Dict[str, Optional[Dict]]):
+        """批量写入解析缓存，值为 None 表示删除该文件的缓存"""
+        conn, cursor = self._get_connection()
+        now = datetime.now().isoformat()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            cursor.executemany(
+                "DELETE FROM parse_cache WHERE path = ?;",
+                [(p,) for p, e in entries.items() if e is None],
+            )
+            cursor.executemany(
+                """
+                INSERT OR REPLACE INTO parse_cache
+                (path, season_dir, size, mtime_ns, dir_mtime_ns, regex_version,
+                 status, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?);
+                """,
+                [
+                    (
+                        p,
+                        e["season_dir"],
+                        e["size"],
+                        e["mtime_ns"],
+                        e.get("dir_mtime_ns"),
+                        e["regex_version"],
+                        e["status"],
+                        now,
+                    )
+                    for p, e in entries.items()
+                    if e is not None
+                ],
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def clear_parse_cache(self, root_dir: str):
+        """清除 root_dir 下的解析缓存，全量扫描时借此回收已移走文件的缓存行"""
+        conn, cursor = self._get_connection()
+        prefix = root_dir.rstrip(os.sep) + os.sep
+        cursor.execute(
+            "DELETE FROM parse_cache "
+            "WHERE season_dir = ? OR (season_dir >= ? AND season_dir < ?);",
+            (root_dir, prefix, prefix[:-1] + chr(ord(os.sep) + 1)),
+        )
+        conn.commit()
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        conn, cursor = self._get_connection()
+        cursor.execute("SELECT value FROM config_meta WHERE key = ?;", (key,))
+        row = cursor.fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        conn, cursor = self._get_connection()
+        cursor.execute(
+            "INSERT OR REPLACE INTO config_meta (key, value) VALUES (?, ?);",
+            (key, value),
+        )
+        conn.commit()
+
+    @staticmethod
+    def _bump_config_version(cursor, name: str):
+        cursor.execute(
+            "INSERT INTO config_meta (key, value) VALUES (?, '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1;",
+            (f"{name}_version",),
+        )
+
+    def get_config_version(self, name: str) -> str:
+        """配置版本号，随对应配置的每次写入递增"""
+        return self.get_meta(f"{name}_version", "0")
+
     def close(self):
         if hasattr(self._local, "conn"):
             try:
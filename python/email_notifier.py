@@ -1,15 +1,20 @@
 # email_notifier.py
 import os
 import smtplib
+import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
+from database import config_db
 from logging_utils import get_logger
+from metrics import EMAIL_SEND_SECONDS
 from pathlib import Path
 import logging
 
 LOGS_PATH = Path(os.getenv("LOG_PATH", "./data/logs"))
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 邮件中列出的未重命名文件上限，完整列表在扫描历史中分页查看
+EMAIL_UNRENAMED_LIMIT = 200
 
 
 class EmailNotifier:
@@ -68,10 +73,15 @@ class EmailNotifier:
         subject = "EMBRESS - 自动扫描完成通知"
         # 构建未重命名文件详情
         unrenamed_details = ""
-        if result.get("unrenamed_count", 0) > 0:
+        if unrenamed_count > 0 and result.get("history_id"):
+            files, total = config_db.get_unrenamed_files(
+                result["history_id"], limit=EMAIL_UNRENAMED_LIMIT
+            )
             unrenamed_details = "<h3>未重命名文件详情:</h3><ul>"
-            for file in result.get("unrenamed_files", []):
+            for file in files:
                 unrenamed_details += f"<li>{file.get('path')}</li>"
+            if total > len(files):
+                unrenamed_details += f"<li>…… 共 {total} 个，完整列表见扫描历史</li>"
             unrenamed_details += "</ul>"
 
         html_content = f"""
@@ -162,6 +172,7 @@ class EmailNotifier:
         self._send_email(subject, html_content, is_html=True)
 
     def _send_email(self, subject, content, is_html=False):
+        started = time.monotonic()
         try:
             # 创建邮件对象
             message = MIMEMultipart()
@@ -187,8 +198,10 @@ class EmailNotifier:
                     server.sendmail(self.EMAIL_SENDER, to_addr, message.as_string())
 
             server.quit()
+            EMAIL_SEND_SECONDS.observe(time.monotonic() - started, result="success")
             self.logger.info("Email notification sent successfully")
         except Exception as e:
+            EMAIL_SEND_SECONDS.observe(time.monotonic() - started, result="error")
             self.logger.error(f"Failed to send email notification: {e}")
 
     def _check_email_config(self):
@@ -5,22 +5,62 @@
  */
 """
 
+import argparse
 import json
 import logging
 import os
 import re
+import threading
 import time
 import sys
 
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Set, Tuple, Union
 from database import config_db
+from episode_matcher import EpisodeMatcher
+from fs_walker import (
+    SeasonSnapshot,
+    WalkStats,
+    iter_child_season_dirs,
+    iter_season_dirs,
+    list_dir,
+    stat_path,
+)
 from logging_utils import get_logger
+from metrics import (
+    FILES_PARSED,
+    FILES_RESULT,
+    PARSE_CACHE_HITS,
+    SCAN_DURATION,
+    SCANS_COMPLETED,
+    SCANS_STARTED,
+)
+from record_journal import RecordJournal
+from scan_context import OwnChanges, ScanContext, SeasonLocks
+from scan_jobs import ScanProgress
+from scan_timing import (
+    PHASE_DB_FLUSH,
+    PHASE_PARSE,
+    PHASE_RENAME,
+    PHASE_WALK,
+    ScanTimings,
+)
 
 LOGS_PATH = Path(os.getenv("LOG_PATH", "./data/logs"))
 MEDIA_PATH = os.getenv("MEDIA_PATH", "./data/media")
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+SCAN_WORKERS = max(1, int(os.getenv("SCAN_WORKERS", 4)))
+FULL_SWEEP_INTERVAL = int(os.getenv("FULL_SWEEP_INTERVAL", 86400))
+# 变更记录攒满该条数即写库，扫描中途崩溃最多丢失一批
+CHANGE_RECORD_BATCH = max(1, int(os.getenv("CHANGE_RECORD_BATCH", 500)))
+# mtime 距今不足该秒数的目录视为仍在写入，不写入索引
+INDEX_SETTLE_SECONDS = 2
+# 进程内文件名解析结果的 LRU 容量，同名文件（多季、多版本）只解析一次
+PARSE_LRU_SIZE = 4096
 
 
 STATUS_RENAMED = "renamed"
@@ -29,16 +69,32 @@ STATUS_SKIP = "skip"
 STATUS_UNMATCHED = "unmatched"
 STATUS_WHITELIST = "whitelisted"
 STATUS_UNPROCESSED = "unprocessed"
+STATUS_PLANNED = "planned"
+STATUS_CONFLICT = "conflict"
+
+VIDEO_EXTS: Set[str] = {
+    ".mkv",
+    ".mp4",
+    ".avi",
+    ".mov",
+    ".wmv",
+    ".flv",
+    ".webm",
+    ".ts",
+    ".m2ts",
+}
 
 SUBTITLE_EXTS: Set[str] = {".ass", ".srt", ".vtt", ".sub"}
 AUDIO_EXTS: Set[str] = {".mka", ".flac"}
 PICTURE_EXTS: Set[str] = {".jpg", ".png", ".jpeg"}
+ASSOCIATED_EXTS: Set[str] = SUBTITLE_EXTS | AUDIO_EXTS | PICTURE_EXTS
 ADDITION_CHANGE: Set[str] = {
     "subtitle_rename",
     "audio_rename",
     "picture_rename",
     "nfo_delete",
 }
+ASSOCIATED_CHANGE: Set[str] = {"subtitle_rename", "audio_rename", "picture_rename"}
 
 SEASON_PATTERNS = [
     re.compile(r"season[ _\-]?(\d{1,2})", re.I),
@@ -48,65 +104,341 @@ SEASON_PATTERNS = [
 
 
 class WhitelistLoader:
-    _cache: Dict[str, Union[Set[str], List[Path]]] = None
+    """白名单缓存：文件走集合，目录走路径分量前缀树，仅在白名单版本变化时重建"""
+
+    _cache: Dict[str, Union[Set[str], List[Path], Dict]] = None
+    _version: Optional[str] = None
     _cache_time: float = 0
     _ttl = 5
+    _lock = threading.Lock()
+    _TERMINAL = "\0"
 
     @classmethod
-    def whitelist(cls) -> Dict[str, Union[Set[str], List[Path]]]:
+    def whitelist(cls) -> Dict[str, Union[Set[str], List[Path], Dict]]:
         now = time.time()
-        FULL_MEDIA_PATH = Path(MEDIA_PATH).resolve()
-        if cls._cache is None or now - cls._cache_time > cls._ttl:
-            entries = config_db.get_whitelist()
-            file_set: Set[str] = set()
-            dir_list: List[Path] = []
-            for entry in entries:
-                if entry.get("type") == "directory":
-                    raw = entry["path"].strip().lstrip("/\\")
-                    path = (FULL_MEDIA_PATH / raw).resolve()
-                    dir_list.append(path)
-                else:
-                    file_set.add(str(entry["path"]))
-            cls._cache = {"files": file_set, "dirs": dir_list}
-            cls._cache_time = now
+        if cls._cache is not None and now - cls._cache_time <= cls._ttl:
+            return cls._cache
+        with cls._lock:
+            if cls._cache is None or now - cls._cache_time > cls._ttl:
+                version = config_db.get_config_version("whitelist")
+                if cls._cache is None or version != cls._version:
+                    cls._cache = cls._build(config_db.get_whitelist())
+                    cls._version = version
+                cls._cache_time = now
         return cls._cache
 
+    @classmethod
+    def _build(cls, entries: List[Dict]) -> Dict[str, Union[Set[str], List[Path], Dict]]:
+        FULL_MEDIA_PATH = Path(MEDIA_PATH).resolve()
+        file_set: Set[str] = set()
+        dir_list: List[Path] = []
+        trie: Dict = {}
+        for entry in entries:
+            if entry.get("type") == "directory":
+                raw = entry["path"].strip().lstrip("/\\")
+                path = (FULL_MEDIA_PATH / raw).resolve()
+                dir_list.append(path)
+                node = trie
+                for part in path.parts:
+                    node = node.setdefault(part, {})
+                node[cls._TERMINAL] = True
+            else:
+                file_set.add(str(entry["path"]))
+        return {"files": file_set, "dirs": dir_list, "trie": trie}
+
     @classmethod
     def is_whitelisted(cls, abs_path: str) -> bool:
         wl = cls.whitelist()
         if abs_path in wl["files"]:
             return True
-        path = Path(abs_path)
-        for d in wl["dirs"]:
-            try:
-                if path.is_relative_to(d):
-                    return True
-            except ValueError:
-                continue
+        node = wl["trie"]
+        if not node:
+            return False
+        for part in Path(abs_path).parts:
+            node = node.get(part)
+            if node is None:
+                return False
+            if cls._TERMINAL in node:
+                return True
         return False
 
     @classmethod
     def force_reload(cls):
         """手动刷新缓存"""
         cls._cache = None
+        cls._version = None
         cls._cache_time = 0
 
 
 class RegexLoader:
-    _cache_mtime: float = 0.0
-    _patterns: Dict[str, List[str]] = {}
+    """预编译的正则缓存，按配置版本号失效，每个文件的解析不再查询数据库"""
+
+    _compiled: Dict[str, List[re.Pattern]] = None
+    _matcher: EpisodeMatcher = None
+    _version: Optional[str] = None
+    _checked_at: float = 0
+    _ttl = 5
+    _lock = threading.Lock()
+
+    @classmethod
+    def patterns(cls) -> Dict[str, List[re.Pattern]]:
+        now = time.time()
+        if cls._compiled is not None and now - cls._checked_at <= cls._ttl:
+            return cls._compiled
+        with cls._lock:
+            if cls._compiled is None or now - cls._checked_at > cls._ttl:
+                version = config_db.get_config_version("regex")
+                if cls._compiled is None or version != cls._version:
+                    cls._compiled = cls._compile(config_db.get_regex_patterns())
+                    cls._matcher = EpisodeMatcher(cls._compiled)
+                    cls._version = version
+                cls._checked_at = now
+        return cls._compiled
+
+    @classmethod
+    def matcher(cls) -> EpisodeMatcher:
+        cls.patterns()
+        return cls._matcher
+
+    @classmethod
+    def version(cls) -> Optional[str]:
+        cls.patterns()
+        return cls._version
+
+    @staticmethod
+    def _compile(raw: Dict[str, List[str]]) -> Dict[str, List[re.Pattern]]:
+        compiled: Dict[str, List[re.Pattern]] = {}
+        for p_type, pats in raw.items():
+            for pat in pats:
+                try:
+                    compiled.setdefault(p_type, []).append(re.compile(pat, re.I))
+                except re.error as e:
+                    logging.getLogger("EmbressRenamer").warning(
+                        "Invalid regex pattern skipped (%s): %s (%s)", p_type, pat, e
+                    )
+        return compiled
 
     @classmethod
-    def patterns(cls) -> Dict[str, List[str]]:
-        return config_db.get_regex_patterns()
+    def force_reload(cls):
+        """手动刷新缓存"""
+        cls._compiled = None
+        cls._checked_at = 0
+
+
+def _bounded_map(
+    pool: ThreadPoolExecutor, fn, items, max_in_flight: int
+) -> Iterator:
+    """
+    与 pool.map 相同按提交顺序产出结果，但只从 items 中预取 max_in_flight 个任务，
+    遍历生成器不会被一次性读完，内存占用与媒体库大小无关
+    """
+    in_flight = deque()
+    items = iter(items)
+    try:
+        for item in items:
+            in_flight.append(pool.submit(fn, item))
+            if len(in_flight) >= max_in_flight:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+@lru_cache(maxsize=PARSE_LRU_SIZE)
+def _parse_episode(
+    regex_version: Optional[str], filename: str
+) -> Optional[Tuple[Optional[int], Union[int, float], Optional[Tuple[int, int]]]]:
+    """按 (正则版本, 文件名) 缓存的集数解析，正则配置变化后旧键自然不再命中"""
+    hit = RegexLoader.matcher().match(filename)
+    if hit is None:
+        return None
+    p_type, m = hit
+
+    # (季,集) 模式
+    if p_type == "season_episode":
+        season = int(m.group(1))
+        episode = float(m.group(2)) if "." in m.group(2) else int(m.group(2))
+        return season, episode, m.span()
+
+    # 仅集数模式
+    episode_str = m.group(1)
+    episode = float(episode_str) if "." in episode_str else int(episode_str)
+    return None, episode, m.span()
+
+
+class ProcessedIndex:
+    """扫描根目录下已处理文件路径的内存索引，首次使用时以一次流式查询整体加载"""
+
+    def __init__(self, root_dir: Path):
+        self.root_key = str(root_dir.absolute())
+        self._paths: Optional[Set[str]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Set[str]:
+        if self._paths is None:
+            with self._lock:
+                if self._paths is None:
+                    try:
+                        self._paths = set(
+                            config_db.iter_processed_paths(self.root_key)
+                        )
+                    except Exception as e:
+                        logging.getLogger("EmbressRenamer").error(
+                            f"从数据库获取已处理文件失败: {e}"
+                        )
+                        self._paths = set()
+        return self._paths
+
+    def __contains__(self, abs_path: str) -> bool:
+        return abs_path in self._load()
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+
+class ParseCache:
+    """
+    未匹配、重命名失败文件的持久化负缓存，键为 (路径, 大小, mtime_ns, 正则版本)，
+    文件和正则都未变化时直接沿用上次结果，不再解析和尝试重命名。
+    失败记录额外比对季目录 mtime：冲突的目标文件被移走后目录 mtime 变化，缓存随之失效。
+    首次使用时以一次流式查询整体加载，新结果攒在内存中分批写库。
+    """
+
+    CACHED_STATUSES = {STATUS_UNMATCHED, STATUS_FAILED}
+
+    def __init__(self, root_dir: Path, stats: WalkStats):
+        self.root_key = str(root_dir.absolute())
+        self.regex_version = RegexLoader.version()
+        self._stats = stats
+        self._rows: Optional[Dict[str, Tuple[int, int, Optional[int], str]]] = None
+        self._failed_seasons: Set[str] = set()
+        self._pending: Dict[str, Optional[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Tuple[int, int, Optional[int], str]]:
+        if self._rows is None:
+            with self._lock:
+                if self._rows is None:
+                    rows = {}
+                    try:
+                        for path, size, mtime_ns, dir_mtime_ns, status in (
+                            config_db.iter_parse_cache(self.root_key, self.regex_version)
+                        ):
+                            rows[path] = (size, mtime_ns, dir_mtime_ns, status)
+                            if status == STATUS_FAILED:
+                                self._failed_seasons.add(os.path.dirname(path))
+                    except Exception as e:
+                        logging.getLogger("EmbressRenamer").error(
+                            f"从数据库获取解析缓存失败: {e}"
+                        )
+                        rows = {}
+                    self._rows = rows
+        return self._rows
+
+    def season_mtime(self, season_dir: Path) -> Optional[int]:
+        """季目录当前 mtime，仅在该目录有失败缓存时才 stat"""
+        self._load()
+        season_key = str(season_dir.absolute())
+        if season_key not in self._failed_seasons:
+            return None
+        try:
+            return stat_path(season_dir, self._stats).st_mtime_ns
+        except OSError:
+            return None
+
+    def lookup(
+        self, entry: os.DirEntry, abs_path: str, season_mtime: Optional[int]
+    ) -> Optional[str]:
+        """命中时返回缓存的状态，文件或季目录有变化时返回 None"""
+        row = self._load().get(abs_path)
+        if row is None:
+            return None
+        size, mtime_ns, dir_mtime_ns, status = row
+        try:
+            self._stats.add(stat=1)
+            st = entry.stat()
+        except OSError:
+            return None
+        if st.st_size != size or st.st_mtime_ns != mtime_ns:
+            return None
+        if status == STATUS_FAILED and (
+            season_mtime is None or season_mtime != dir_mtime_ns
+        ):
+            return None
+        return status
+
+    def record(
+        self, season_dir: Path, observed: List[Tuple[os.DirEntry, str, str]]
+    ):
+        """记录一个季目录的解析结果：未匹配/失败的写入缓存，其余已缓存的删除"""
+        rows = self._load()
+        season_key = str(season_dir.absolute())
+        dir_mtime_ns = None
+        if any(status == STATUS_FAILED for _, _, status in observed):
+            try:
+                # 在本季所有重命名完成之后取目录 mtime，下次扫描未变化才沿用失败结果
+                dir_mtime_ns = stat_path(season_dir, self._stats).st_mtime_ns
+            except OSError:
+                pass
+        updates: Dict[str, Optional[Dict]] = {}
+        for entry, abs_path, status in observed:
+            if status not in self.CACHED_STATUSES:
+                if abs_path in rows:
+                    updates[abs_path] = None
+                continue
+            if status == STATUS_FAILED and dir_mtime_ns is None:
+                continue
+            try:
+                self._stats.add(stat=1)
+                st = entry.stat()
+            except OSError:
+                continue
+            updates[abs_path] = {
+                "season_dir": season_key,
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "dir_mtime_ns": dir_mtime_ns if status == STATUS_FAILED else None,
+                "regex_version": self.regex_version,
+                "status": status,
+            }
+        if updates:
+            with self._lock:
+                self._pending.update(updates)
+
+    def take(self, min_count: int = 1) -> Optional[Dict[str, Optional[Dict]]]:
+        """待写条目不少于 min_count 时整体取出，否则返回 None"""
+        with self._lock:
+            if not self._pending or len(self._pending) < min_count:
+                return None
+            taken, self._pending = self._pending, {}
+        return taken
+
+
+# 附加到正在进行的全库扫描时，同步其进度的间隔（秒）
+ATTACH_POLL_SECONDS = 0.5
+
+
+class _InFlightScan:
+    """正在进行的全库扫描，重复请求共享其进度与取消，等待它结束并共享结果"""
+
+    def __init__(self, ctx: ScanContext):
+        self.ctx = ctx
+        self.done = threading.Event()
+        self.result: Optional[Dict] = None
 
 
 class EmbressRenamer:
     def __init__(self, media_path: str):
         self.media_path = Path(media_path)
         self.logger = self._setup_logger()
-        self._pending_change_records: List[Dict] = []
-        self._seasons_to_update: Set[Path] = set()
+        # 扫描状态都在各自的 ScanContext 中，实例本身只保留跨扫描共享的协调对象
+        self.season_locks = SeasonLocks()
+        self.own_changes = OwnChanges()
+        self.journal = RecordJournal()
+        self._full_scan: Optional[_InFlightScan] = None
+        self._full_scan_lock = threading.Lock()
 
     def _setup_logger(self) -> logging.Logger:
         return get_logger(
@@ -121,23 +453,7 @@ class EmbressRenamer:
         self, filename: str
     ) -> Optional[Tuple[Optional[int], Union[int, float], Optional[Tuple[int, int]]]]:
         """提取集数信息，返回 (季数, 集数, 匹配位置)"""
-        p_cfg = RegexLoader.patterns()
-
-        # (季,集) 模式
-        for pat in p_cfg.get("season_episode", []):
-            if m := re.search(pat, filename, re.I):
-                season = int(m.group(1))
-                episode = float(m.group(2)) if "." in m.group(2) else int(m.group(2))
-                return season, episode, m.span()
-
-        # 仅集数模式
-        for pat in p_cfg.get("episode_only", []):
-            if m := re.search(pat, filename, re.I):
-                episode_str = m.group(1)
-                episode = float(episode_str) if "." in episode_str else int(episode_str)
-                return None, episode, m.span()
-
-        return None
+        return _parse_episode(RegexLoader.version(), filename)
 
     def _get_season_from_path(self, file_path: Path) -> Optional[int]:
         for part in file_path.parts:
@@ -244,16 +560,22 @@ class EmbressRenamer:
         return name.strip()
 
     def _rollback_file_and_subtitles(
-        self, file_path: Path, new_name: str, original_records: List[Dict] = None
+        self,
+        file_path: Path,
+        new_name: str,
+        snapshot: Optional[SeasonSnapshot] = None,
     ) -> List[Dict]:
+        """把视频及其关联文件改回 new_name，目录状态只读快照并随重命名原地更新"""
         changes: List[Dict] = []
         old_stem = file_path.stem
         new_stem = Path(new_name).stem
         new_file_path = file_path.parent / new_name
-        ASSOCIATED_EXTS = set().union(SUBTITLE_EXTS, AUDIO_EXTS, PICTURE_EXTS)
-        if file_path != new_file_path and not new_file_path.exists():
+        if snapshot is None:
+            snapshot = self._snapshot_season(file_path.parent)
+        if file_path != new_file_path and not snapshot.exists(new_name):
             try:
-                file_path.rename(new_file_path)
+                self._move(file_path, new_file_path)
+                snapshot.rename(file_path.name, new_name)
                 changes.append(
                     {
                         "type": "rename",
@@ -274,61 +596,32 @@ class EmbressRenamer:
                 )
                 self.logger.error(f"重命名失败: {e}")
                 return changes
-        for associated_file in file_path.parent.iterdir():
-            if not associated_file.is_file():
-                continue
-            ext = associated_file.suffix.lower()
-            if ext not in ASSOCIATED_EXTS:
-                continue
-            if not re.match(
-                re.escape(old_stem) + r"(\.|$)", associated_file.stem, re.I
-            ):
-                continue
-
-            remainder = associated_file.name[len(old_stem) :]
+        for assoc_name in snapshot.sidecars_for(old_stem):
+            record_type = self._associated_record_type(
+                os.path.splitext(assoc_name)[1].lower()
+            )
+            remainder = assoc_name[len(old_stem) :]
             new_assoc_name = f"{new_stem}{remainder}"
-            new_assoc_path = associated_file.parent / new_assoc_name
-            record_type = "subtitle_rename"
-            if ext in SUBTITLE_EXTS:
-                record_type = "subtitle_rename"
-            elif ext in AUDIO_EXTS:
-                record_type = "audio_rename"
-            else:
-                record_type = "picture_rename"
-            if new_assoc_path.exists():
+            if snapshot.exists(new_assoc_name):
                 continue
             try:
-                associated_file.rename(new_assoc_path)
-
+                self._move(
+                    file_path.parent / assoc_name, file_path.parent / new_assoc_name
+                )
+                snapshot.rename(assoc_name, new_assoc_name)
                 changes.append(
                     {
                         "type": record_type,
-                        "original": associated_file.name,
+                        "original": assoc_name,
                         "new": new_assoc_name,
                         "status": "success",
                     }
                 )
-                if original_records:
-                    for record in original_records:
-                        if (
-                            (
-                                record.get("type") == "subtitle_rename"
-                                or record.get("type") == "audio_rename"
-                                or record.get("type") == "picture_rename"
-                            )
-                            and record.get("status") == "success"
-                            and record.get("rollback") is not True
-                            and record.get("new") == associated_file.name
-                            and record.get("original") == new_assoc_name
-                        ):
-                            record["rollback"] = True
-                            break
-
             except Exception as e:
                 changes.append(
                     {
                         "type": record_type,
-                        "original": associated_file.name,
+                        "original": assoc_name,
                         "new": new_assoc_name,
                         "status": "failed",
                         "error": str(e),
@@ -337,21 +630,66 @@ class EmbressRenamer:
 
         return changes
 
-    def _rename_file_and_subtitles(self, file_path: Path, new_name: str) -> List[Dict]:
+    def _move(self, src: Path, dst: Path):
+        """重命名并登记为自身改动，监听模式不会因此再次扫描"""
+        src.rename(dst)
+        self.own_changes.moved(src, dst)
+
+    def _remove(self, path: Path):
+        path.unlink()
+        self.own_changes.removed(path)
+
+    @staticmethod
+    def _associated_record_type(ext: str) -> str:
+        if ext in SUBTITLE_EXTS:
+            return "subtitle_rename"
+        if ext in AUDIO_EXTS:
+            return "audio_rename"
+        return "picture_rename"
+
+    def _snapshot_season(
+        self, season_dir: Path, entries: Optional[List[os.DirEntry]] = None
+    ) -> SeasonSnapshot:
+        if entries is None:
+            entries = self._list_season(season_dir)
+        return SeasonSnapshot(season_dir, entries, ASSOCIATED_EXTS)
+
+    def _rename_file_and_subtitles(
+        self,
+        file_path: Path,
+        new_name: str,
+        snapshot: Optional[SeasonSnapshot] = None,
+        dry_run: bool = False,
+    ) -> List[Dict]:
+        """dry_run 时只在快照上模拟，变更状态记为 planned，不触碰文件系统"""
         changes: List[Dict] = []
         old_stem = file_path.stem
         new_stem = Path(new_name).stem
         new_file_path = file_path.parent / new_name
-        ASSOCIATED_EXTS = set().union(SUBTITLE_EXTS, AUDIO_EXTS, PICTURE_EXTS)
-        if file_path != new_file_path and not new_file_path.exists():
+        done_status = STATUS_PLANNED if dry_run else "success"
+        if snapshot is None:
+            snapshot = self._snapshot_season(file_path.parent)
+        if dry_run and file_path != new_file_path and snapshot.exists(new_name):
+            changes.append(
+                {
+                    "type": "rename",
+                    "original": file_path.name,
+                    "new": new_name,
+                    "status": STATUS_CONFLICT,
+                    "error": "目标文件已存在",
+                }
+            )
+        if file_path != new_file_path and not snapshot.exists(new_name):
             try:
-                file_path.rename(new_file_path)
+                if not dry_run:
+                    self._move(file_path, new_file_path)
+                snapshot.rename(file_path.name, new_name)
                 changes.append(
                     {
                         "type": "rename",
                         "original": file_path.name,
                         "new": new_name,
-                        "status": "success",
+                        "status": done_status,
                         "error": None,
                     }
                 )
@@ -368,36 +706,27 @@ class EmbressRenamer:
                 self.logger.error(f"重命名失败: {e}")
                 return changes
 
-        for associated_file in file_path.parent.iterdir():
-            if not associated_file.is_file():
-                continue
-            ext = associated_file.suffix.lower()
-            if ext not in ASSOCIATED_EXTS:
-                continue
-            if not re.match(
-                re.escape(old_stem) + r"(\.|$)", associated_file.stem, re.I
-            ):
-                continue
-            record_type = "subtitle_rename"
-            if ext in SUBTITLE_EXTS:
-                record_type = "subtitle_rename"
-            elif ext in AUDIO_EXTS:
-                record_type = "audio_rename"
-            else:
-                record_type = "picture_rename"
-            remainder = associated_file.name[len(old_stem) :]
+        for assoc_name in snapshot.sidecars_for(old_stem):
+            record_type = self._associated_record_type(
+                os.path.splitext(assoc_name)[1].lower()
+            )
+            remainder = assoc_name[len(old_stem) :]
             new_assoc_name = f"{new_stem}{remainder}"
-            new_assoc_path = associated_file.parent / new_assoc_name
-            if new_assoc_path.exists():
+            if snapshot.exists(new_assoc_name):
                 continue
             try:
-                associated_file.rename(new_assoc_path)
+                if not dry_run:
+                    self._move(
+                        file_path.parent / assoc_name,
+                        file_path.parent / new_assoc_name,
+                    )
+                snapshot.rename(assoc_name, new_assoc_name)
                 changes.append(
                     {
                         "type": record_type,
-                        "original": associated_file.name,
+                        "original": assoc_name,
                         "new": new_assoc_name,
-                        "status": "success",
+                        "status": done_status,
                         "error": None,
                     }
                 )
@@ -405,16 +734,20 @@ class EmbressRenamer:
                 changes.append(
                     {
                         "type": record_type,
-                        "original": associated_file.name,
+                        "original": assoc_name,
                         "new": new_assoc_name,
                         "status": "failed",
                         "error": str(e),
                     }
                 )
-        changes = self._delete_old_nfo(file_path.parent, old_stem, changes)
+        changes = self._delete_old_nfo(
+            file_path.parent, old_stem, changes, snapshot, dry_run
+        )
         return changes
 
-    def _sync_orphan_subtitles(self, season_dir: Path) -> List[Dict]:
+    def _sync_orphan_subtitles(
+        self, season_dir: Path, snapshot: Optional[SeasonSnapshot] = None
+    ) -> List[Dict]:
         try:
             records = config_db.get_season_change_records(str(season_dir.absolute()))
         except Exception as e:
@@ -436,54 +769,45 @@ class EmbressRenamer:
         if not latest_map:
             return []
         # --- 统一处理字幕 & NFO -------------------------------------------------
-        ASSOCIATED_EXTS = set().union(SUBTITLE_EXTS, AUDIO_EXTS, PICTURE_EXTS)
+        # 复用同一份目录快照，每条历史记录通过 stem 前缀二分查找定位孤儿字幕
+        if snapshot is None:
+            snapshot = self._snapshot_season(season_dir)
         changes: List[Dict] = []
         for orig, (latest_new, _) in latest_map.items():  # ← 一个 for 里搞定两件事
             orig_stem = Path(orig).stem
             new_stem = Path(latest_new).stem
 
-            for item in season_dir.iterdir():
-                if not item.is_file():
-                    continue
-                ext = item.suffix.lower()
-                if ext in ASSOCIATED_EXTS and re.match(
-                    rf"{re.escape(orig_stem)}(\.|$)", item.stem, re.I
-                ):
-                    remainder = item.name[len(orig_stem) :]
-                    new_name = f"{new_stem}{remainder}"
-                    new_path = item.with_name(new_name)
-                    record_type = "subtitle_rename"
-                    if ext in SUBTITLE_EXTS:
-                        record_type = "subtitle_rename"
-                    elif ext in AUDIO_EXTS:
-                        record_type = "audio_rename"
-                    else:
-                        record_type = "picture_rename"
-                    if not new_path.exists():
-                        try:
-
-                            item.rename(new_path)
-                            changes.append(
-                                {
-                                    "type": record_type,
-                                    "original": item.name,
-                                    "new": new_name,
-                                    "status": "success",
-                                }
-                            )
-                            self.logger.info("修复字幕: %s → %s", item.name, new_name)
-                        except Exception as e:
-                            changes.append(
-                                {
-                                    "type": record_type,
-                                    "original": item.name,
-                                    "new": new_name,
-                                    "status": "failed",
-                                    "error": str(e),
-                                }
-                            )
+            for item_name in snapshot.sidecars_for(orig_stem):
+                remainder = item_name[len(orig_stem) :]
+                new_name = f"{new_stem}{remainder}"
+                record_type = self._associated_record_type(
+                    os.path.splitext(item_name)[1].lower()
+                )
+                if not snapshot.exists(new_name):
+                    try:
+                        self._move(season_dir / item_name, season_dir / new_name)
+                        snapshot.rename(item_name, new_name)
+                        changes.append(
+                            {
+                                "type": record_type,
+                                "original": item_name,
+                                "new": new_name,
+                                "status": "success",
+                            }
+                        )
+                        self.logger.info("修复字幕: %s → %s", item_name, new_name)
+                    except Exception as e:
+                        changes.append(
+                            {
+                                "type": record_type,
+                                "original": item_name,
+                                "new": new_name,
+                                "status": "failed",
+                                "error": str(e),
+                            }
+                        )
             # 2) NFO 删除
-            changes = self._delete_old_nfo(season_dir, orig_stem, changes)
+            changes = self._delete_old_nfo(season_dir, orig_stem, changes, snapshot)
         return changes
 
     def _get_new_change_record(
@@ -510,30 +834,29 @@ class EmbressRenamer:
             processed_changes.append(c)
         return processed_changes
 
-    def _write_all_change_records(self, season_dir):
-        rename_record_path = season_dir / "rename_record.json"
+    def _journal_change_records(self, season_dir: Path, records: List[Dict]):
+        """把本次变更追加到季目录的 rename_record.jsonl，调用方持有季目录锁"""
         try:
-            new_records = config_db.get_season_change_records(str(season_dir))
+            self.journal.append_change_records(season_dir.absolute(), records)
         except Exception as e:
-            self.logger.error(f"获取变更记录失败: {e}")
-        rename_record_path.write_text(
-            json.dumps(new_records, ensure_ascii=False, indent=2), encoding="utf-8"
-        )
+            self.logger.error(f"Failed to append rename_record.jsonl: {e}")
 
-    def _season_processed_set(self, season_dir: Path) -> Set[Tuple[str, str]]:
-        """从数据库获取已处理的文件集合"""
+    def _journal_rollback_records(self, season_dir: Path, records: List[Dict]):
         try:
-            records = config_db.get_season_change_records(str(season_dir.absolute()))
-            processed: Set[Tuple[str, str]] = set()
+            self.journal.append_rollback_records(season_dir.absolute(), records)
+        except Exception as e:
+            self.logger.error(f"Failed to append rollback.jsonl: {e}")
 
-            for record in records:
-                if record.get("status") == "success" or record.get("status") == "skip":
-                    processed.add((record["path"], record.get("new", "")))
+    @staticmethod
+    def _rolled_back_records(
+        index: Dict[Tuple[str, str], List[Dict]], keys: List[Tuple[str, str]]
+    ) -> List[Dict]:
+        """已回滚的 (path, original) 对应的记录，回滚标记与 mark_rolled_back 一致"""
+        return [dict(rec, rollback=True) for key in keys for rec in index.get(key, [])]
 
-            return processed
-        except Exception as e:
-            self.logger.error(f"从数据库获取已处理文件失败: {e}")
-            return set()
+    def _processed_index(self, root_dir: Path) -> ProcessedIndex:
+        """整个扫描根目录共用的已处理文件索引，季目录扫描只在内存中查询"""
+        return ProcessedIndex(root_dir)
 
     @staticmethod
     def _count_success_renames(changes: List[Dict]) -> int:
@@ -589,40 +912,84 @@ class EmbressRenamer:
         return list(latest_map.values())
 
     def scan_and_rollback(self, sub_path: str):
+        # 与该季目录上的扫描互斥，扫描进行中时排队等待
+        with self.season_locks.lock_for(Path(MEDIA_PATH) / sub_path):
+            return self._rollback_season(sub_path)
+
+    def _rollback_season(self, sub_path: str):
         self.logger.info(f"Start rollback Season: {sub_path}")
         season_dir = Path(MEDIA_PATH) / sub_path
-        rollback_record_path = season_dir / "rollback.json"
-        media_type = self._extract_media_type(season_dir)
         if not season_dir.exists():
             result = {"success": False, "message": "Season path not found "}
             code = 200
             return {"result": result, "code": code}
         try:
-            original_records = config_db.get_season_change_records(
-                str(season_dir.absolute())
-            )
+            counts = self._rollback_season_records(season_dir)
         except Exception as e:
             self.logger.error(f"Failed to retrieve change records: {e}")
             result = {"records": [], "total": 0, "error": str(e)}
             code = 500
             return {"result": result, "code": code}
+        rollback_result = self._rollback_summary(counts, sub_path)
+        config_db.add_scan_history(rollback_result)
+        code = 200
+        print(rollback_result)
+        return {"result": rollback_result, "code": code}
+
+    @staticmethod
+    def _rollback_summary(counts: Dict[str, int], target: str) -> Dict:
+        return {
+            "status": "completed",
+            "processed": counts["renamed"]
+            + counts["renamed_subtitle"]
+            + counts["renamed_picture"]
+            + counts["renamed_audio"],
+            "renamed": counts["renamed"],
+            "renamed_subtitle": counts["renamed_subtitle"],
+            "renamed_audio": counts["renamed_audio"],
+            "renamed_picture": counts["renamed_picture"],
+            "deleted_nfo": counts["deleted_nfo"],
+            "timestamp": datetime.now().isoformat(),
+            "target": target,
+            "scan_type": "rollback",
+        }
+
+    def _rollback_season_records(
+        self, season_dir: Path, scan_id: Optional[str] = None
+    ) -> Dict[str, int]:
+        """
+        回滚一个季目录的重命名（scan_id 不为空时只回滚该次扫描产生的），返回各类计数。
+        整季只列一次目录、建一次记录索引，回滚标记最后在同一个事务里写库。
+        调用方负责持有季目录锁；读取变更记录失败时抛出异常。
+        """
+        media_type = self._extract_media_type(season_dir)
+        original_records = config_db.get_season_change_records(
+            str(season_dir.absolute())
+        )
         rollback_results = []
         original_records = self._dedup_latest(original_records)
+        snapshot = self._snapshot_season(season_dir.absolute())
+        record_index = self._index_change_records(original_records)
+        rolled_back_keys: List[Tuple[str, str]] = []
         nfo_changes = []
-        rolled_back_file_cnt = 0
-        rolled_back_sub_cnt = 0
-        rolled_back_audio_cnt = 0
-        rolled_back_picture_cnt = 0
+        counts = {
+            "renamed": 0,
+            "renamed_subtitle": 0,
+            "renamed_audio": 0,
+            "renamed_picture": 0,
+            "deleted_nfo": 0,
+        }
         for rec in original_records:
             if (
                 rec.get("type") != "rename"
                 or rec.get("status") != "success"
                 or rec.get("rollback") is True
+                or (scan_id is not None and rec.get("scan_id") != scan_id)
             ):
                 continue
             cur_path = Path(rec["path"])
             original_name = rec["original"]
-            if not cur_path.exists():
+            if not self._exists_in_snapshot(cur_path, snapshot):
                 rollback_results.append(
                     {
                         "type": "rollback",
@@ -637,11 +1004,13 @@ class EmbressRenamer:
                 continue
             try:
                 changes = self._rollback_file_and_subtitles(
-                    cur_path, original_name, original_records
+                    cur_path,
+                    original_name,
+                    snapshot if cur_path.parent == snapshot.season_dir else None,
                 )
 
                 if self._count_success_renames(changes):
-                    rolled_back_file_cnt += 1
+                    counts["renamed"] += 1
                     rollback_result = {
                         "type": "rollback",
                         "original": rec["new"],
@@ -652,9 +1021,7 @@ class EmbressRenamer:
                     }
                     rollback_results.append(rollback_result)
                     rec["rollback"] = True
-                    config_db.update_change_record_rollback(
-                        rec["path"], rec["original"], True
-                    )
+                    rolled_back_keys.append((rec["path"], rec["original"]))
                     for change in changes:
                         if (
                             change.get("status") == "success"
@@ -663,13 +1030,13 @@ class EmbressRenamer:
                             rollback_type = "subtitle_rollback"
                             if change.get("type") == "subtitle_rename":
                                 rollback_type = "subtitle_rollback"
-                                rolled_back_sub_cnt += 1
+                                counts["renamed_subtitle"] += 1
                             elif change.get("type") == "audio_rename":
                                 rollback_type = "audio_rollback"
-                                rolled_back_audio_cnt += 1
+                                counts["renamed_audio"] += 1
                             elif change.get("type") == "picture_rename":
                                 rollback_type = "picture_rollback"
-                                rolled_back_picture_cnt += 1
+                                counts["renamed_picture"] += 1
                             rollback_result = {
                                 "type": rollback_type,
                                 "original": change["original"],
@@ -684,11 +1051,12 @@ class EmbressRenamer:
                             subtitle_path = str(
                                 (cur_path.parent / change["original"]).absolute()
                             )
-                            config_db.update_change_record_rollback(
-                                subtitle_path, change["new"], True
+                            self._mark_indexed_rollback(
+                                record_index, subtitle_path, change["new"]
                             )
+                            rolled_back_keys.append((subtitle_path, change["new"]))
                     nfo_changes = self._delete_old_nfo(
-                        season_dir, Path(rec["new"]).stem, nfo_changes
+                        season_dir, Path(rec["new"]).stem, nfo_changes, snapshot
                     )
                 else:
                     rollback_results.append(
@@ -715,77 +1083,151 @@ class EmbressRenamer:
                         "path": rec["path"],
                     }
                 )
-        if rollback_results:
+        if rolled_back_keys:
             try:
-                nfo_delete_records = self._get_new_change_record(
-                    season_dir, media_type, nfo_changes
-                )
-                try:
-                    config_db.add_change_records(nfo_delete_records)
-                except Exception as e:
-                    self.logger.error(
-                        f"Failed to save and delete records to database: {e}"
-                    )
-                self._write_all_change_records(season_dir.absolute())
-            except Exception as exc:
-                self.logger.exception("Failed to update the rename_record.json")
-            existing = []
-            if rollback_record_path.exists():
+                config_db.mark_rolled_back(rolled_back_keys)
+            except Exception as e:
+                self.logger.error(f"Failed to mark change records rolled back: {e}")
+        if not rollback_results:
+            return counts
+        nfo_delete_records = self._get_new_change_record(
+            season_dir, media_type, nfo_changes
+        )
+        counts["deleted_nfo"] = len(nfo_delete_records)
+        try:
+            config_db.add_change_records(nfo_delete_records)
+        except Exception as e:
+            self.logger.error(f"Failed to save and delete records to database: {e}")
+        self._journal_change_records(
+            season_dir,
+            self._rolled_back_records(record_index, rolled_back_keys)
+            + nfo_delete_records,
+        )
+        self._journal_rollback_records(season_dir, rollback_results)
+        return counts
+
+    def rollback_scan_run(
+        self, scan_id: str, progress: Optional[ScanProgress] = None
+    ) -> Dict:
+        """
+        撤销一次扫描产生的全部重命名：按季目录并发回滚，每个季目录持有各自的锁，
+        结果汇总为一条回滚记录（由调用方写入扫描历史）。
+        """
+        progress = progress or ScanProgress()
+        season_dirs = config_db.get_scan_season_dirs(scan_id)
+        self.logger.info(
+            f"Start rollback scan run {scan_id}: {len(season_dirs)} seasons"
+        )
+        progress.set_total(len(season_dirs))
+        counts = self._rollback_seasons(
+            [Path(d) for d in season_dirs], progress, scan_id
+        )
+        result = self._rollback_summary(counts, f"scan:{scan_id}")
+        result.update({"rollback_of": scan_id, "seasons": len(season_dirs)})
+        if progress.cancelled:
+            result.update({"status": "cancelled", "message": "回滚已取消"})
+        return result
+
+    def rollback_tree(
+        self, sub_path: str, progress: Optional[ScanProgress] = None
+    ) -> Dict:
+        """
+        回滚节目目录或媒体类型目录下所有季目录的重命名：只处理数据库中仍有未回滚记录的季目录，
+        按季目录并发回滚，结果汇总为一条回滚记录（由调用方写入扫描历史）。
+        """
+        progress = progress or ScanProgress()
+        root_dir = (Path(MEDIA_PATH) / sub_path).absolute()
+        season_dirs = config_db.get_rollback_season_dirs(str(root_dir))
+        self.logger.info(f"Start rollback {sub_path}: {len(season_dirs)} seasons")
+        progress.set_total(len(season_dirs))
+        counts = self._rollback_seasons([Path(d) for d in season_dirs], progress)
+        result = self._rollback_summary(counts, sub_path)
+        result["seasons"] = len(season_dirs)
+        if progress.cancelled:
+            result.update({"status": "cancelled", "message": "回滚已取消"})
+        return result
+
+    def _rollback_seasons(
+        self,
+        season_dirs: List[Path],
+        progress: ScanProgress,
+        scan_id: Optional[str] = None,
+    ) -> Dict[str, int]:
+        """在线程池中逐季回滚并累加计数，取消后不再开始新的季目录"""
+
+        def rollback_one(season_dir: Path) -> Optional[Dict[str, int]]:
+            if progress.cancelled:
+                return None
+            with self.season_locks.lock_for(season_dir):
+                if not season_dir.exists():
+                    self.logger.warning(f"Rollback skipped, missing: {season_dir}")
+                    return None
                 try:
-                    existing = json.loads(
-                        rollback_record_path.read_text(encoding="utf-8")
-                    )
+                    return self._rollback_season_records(season_dir, scan_id)
                 except Exception:
-                    pass
-            rollback_result = {
-                "status": "completed",
-                "processed": rolled_back_file_cnt
-                + rolled_back_sub_cnt
-                + rolled_back_picture_cnt
-                + rolled_back_audio_cnt,
-                "renamed": rolled_back_file_cnt,
-                "renamed_subtitle": rolled_back_sub_cnt,
-                "renamed_audio": rolled_back_audio_cnt,
-                "renamed_picture": rolled_back_picture_cnt,
-                "deleted_nfo": len(nfo_delete_records),
-                "timestamp": datetime.now().isoformat(),
-                "target": sub_path,
-                "scan_type": "rollback",
-            }
-            config_db.add_scan_history(rollback_result)
-            try:
-                all_records = existing + rollback_results
-                rollback_record_path.write_text(
-                    json.dumps(all_records, ensure_ascii=False, indent=2),
-                    encoding="utf-8",
+                    self.logger.exception(f"Rollback failed: {season_dir}")
+                    return None
+
+        totals = {
+            "renamed": 0,
+            "renamed_subtitle": 0,
+            "renamed_audio": 0,
+            "renamed_picture": 0,
+            "deleted_nfo": 0,
+        }
+        with ThreadPoolExecutor(
+            max_workers=SCAN_WORKERS, thread_name_prefix="season-rollback"
+        ) as pool:
+            for counts in pool.map(rollback_one, season_dirs):
+                if counts is None:
+                    progress.add(seasons=1)
+                    continue
+                for key, value in counts.items():
+                    totals[key] += value
+                progress.add(
+                    seasons=1,
+                    files=counts["renamed"],
+                    renames=counts["renamed"]
+                    + counts["renamed_subtitle"]
+                    + counts["renamed_audio"]
+                    + counts["renamed_picture"],
                 )
-            except Exception as exc:
-                self.logger.exception("Writing rollback.json failed")
-        else:
-            rollback_result = {
-                "status": "completed",
-                "processed": 0,
-                "renamed": 0,
-                "renamed_subtitle": 0,
-                "renamed_audio": 0,
-                "renamed_picture": 0,
-                "deleted_nfo": 0,
-                "timestamp": datetime.now().isoformat(),
-                "target": sub_path,
-                "scan_type": "rollback",
-            }
-            config_db.add_scan_history(rollback_result)
-        code = 200
-        print(rollback_result)
-        return {"result": rollback_result, "code": code}
+        return totals
 
-    def rollback_single_file(self, file_path: str):
-        """回滚单个文件"""
-        self.logger.info(f"Start rollback file: {file_path}")
+    @staticmethod
+    def _index_change_records(
+        records: List[Dict],
+    ) -> Dict[Tuple[str, str], List[Dict]]:
+        """按 (path, original) 索引变更记录，回滚时按关联文件直接查找"""
+        index: Dict[Tuple[str, str], List[Dict]] = {}
+        for rec in records:
+            index.setdefault((rec.get("path"), rec.get("original")), []).append(rec)
+        return index
 
+    @staticmethod
+    def _mark_indexed_rollback(
+        index: Dict[Tuple[str, str], List[Dict]], path: str, original: str
+    ):
+        for rec in index.get((path, original), []):
+            if rec.get("type") in ASSOCIATED_CHANGE and rec.get("status") == "success":
+                rec["rollback"] = True
+
+    @staticmethod
+    def _exists_in_snapshot(path: Path, snapshot: SeasonSnapshot) -> bool:
+        if path.parent == snapshot.season_dir:
+            return snapshot.exists(path.name)
+        return path.exists()
+
+    def rollback_single_file(self, file_path: str):
+        """回滚单个文件，持有所在季目录的锁"""
         abs_file_path = Path(file_path)
         if not abs_file_path.is_absolute():
             abs_file_path = Path(MEDIA_PATH) / file_path
+        with self.season_locks.lock_for(abs_file_path.parent):
+            return self._rollback_file(file_path, abs_file_path)
+
+    def _rollback_file(self, file_path: str, abs_file_path: Path):
+        self.logger.info(f"Start rollback file: {file_path}")
 
         if not abs_file_path.exists():
             result = {"success": False, "message": "文件不存在"}
@@ -821,9 +1263,9 @@ class EmbressRenamer:
 
             # 执行回滚
             original_name = target_record["original"]
-            changes = self._rollback_file_and_subtitles(
-                abs_file_path, original_name, original_records
-            )
+            record_index = self._index_change_records(original_records)
+            changes = self._rollback_file_and_subtitles(abs_file_path, original_name)
+            rolled_back_keys: List[Tuple[str, str]] = []
 
             rollback_results = []
             rolled_back_file_cnt = 0
@@ -845,8 +1287,8 @@ class EmbressRenamer:
 
                 # 更新数据库记录
                 target_record["rollback"] = True
-                config_db.update_change_record_rollback(
-                    target_record["path"], target_record["original"], True
+                rolled_back_keys.append(
+                    (target_record["path"], target_record["original"])
                 )
 
                 # 处理关联文件的回滚记录
@@ -882,22 +1324,29 @@ class EmbressRenamer:
                         subtitle_path = str(
                             (abs_file_path.parent / change["original"]).absolute()
                         )
-                        config_db.update_change_record_rollback(
-                            subtitle_path, change["new"], True
+                        self._mark_indexed_rollback(
+                            record_index, subtitle_path, change["new"]
                         )
+                        rolled_back_keys.append((subtitle_path, change["new"]))
+                config_db.mark_rolled_back(rolled_back_keys)
 
                 # 删除旧的NFO文件
                 nfo_changes = self._delete_old_nfo(
                     season_dir, Path(target_record["new"]).stem, []
                 )
+                nfo_delete_records = []
                 if nfo_changes:
                     nfo_delete_records = self._get_new_change_record(
                         season_dir, media_type, nfo_changes
                     )
                     config_db.add_change_records(nfo_delete_records)
 
-                # 更新rename_record.json
-                self._write_all_change_records(season_dir.absolute())
+                # 追加到 rename_record.jsonl
+                self._journal_change_records(
+                    season_dir,
+                    self._rolled_back_records(record_index, rolled_back_keys)
+                    + nfo_delete_records,
+                )
 
                 # 记录回滚历史
                 rollback_history = {
@@ -916,22 +1365,7 @@ class EmbressRenamer:
                     "scan_type": "rollback",
                 }
                 config_db.add_scan_history(rollback_history)
-                rollback_record_path = season_dir / "rollback.json"
-                if rollback_record_path.exists():
-                    try:
-                        existing = json.loads(
-                            rollback_record_path.read_text(encoding="utf-8")
-                        )
-                    except Exception:
-                        existing = []
-                else:
-                    existing = []
-
-                all_records = existing + rollback_results
-                rollback_record_path.write_text(
-                    json.dumps(all_records, ensure_ascii=False, indent=2),
-                    encoding="utf-8",
-                )
+                self._journal_rollback_records(season_dir, rollback_results)
 
                 return {"result": rollback_history, "code": 200}
             else:
@@ -947,28 +1381,310 @@ class EmbressRenamer:
             result = {"success": False, "message": f"回滚过程中发生错误: {str(e)}"}
             return {"result": result, "code": 500}
 
-    def scan_and_rename(self, sub_path: Optional[str] = None) -> Dict:
-        self.current_sub_path = sub_path
+    def _is_full_sweep_due(self) -> bool:
+        last = config_db.get_meta("last_full_sweep")
+        if not last:
+            return True
+        try:
+            return time.time() - float(last) >= FULL_SWEEP_INTERVAL
+        except ValueError:
+            return True
+
+    def _stat_season_dir(
+        self, season_dir: Path, stats: WalkStats
+    ) -> Optional[os.stat_result]:
+        try:
+            return stat_path(season_dir, stats)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _index_unchanged(st: Optional[os.stat_result], entry: Optional[Dict]) -> bool:
+        return (
+            st is not None
+            and entry is not None
+            and entry["mtime_ns"] == st.st_mtime_ns
+            and entry["inode"] == st.st_ino
+        )
+
+    def _build_index_entry(
+        self, st: Optional[os.stat_result], p_list: List[Dict]
+    ) -> Optional[Dict]:
+        """根据扫描前的目录状态生成索引项；存在失败或目录仍在变化时返回 None"""
+        if st is None or time.time() - st.st_mtime < INDEX_SETTLE_SECONDS:
+            return None
+        if any(f.get("status") == STATUS_FAILED for f in p_list):
+            return None
+        return {
+            "mtime_ns": st.st_mtime_ns,
+            "inode": st.st_ino,
+            "unrenamed": [
+                f["path"]
+                for f in p_list
+                if f.get("status") not in {STATUS_RENAMED, STATUS_WHITELIST, STATUS_SKIP}
+            ],
+        }
+
+    def _scan_season_task(
+        self,
+        ctx: ScanContext,
+        show_dir: Path,
+        season_dir: Path,
+        video_exts: Set[str],
+        season_index: Dict[str, Dict],
+        use_index: bool,
+        processed_files: ProcessedIndex,
+    ) -> Dict:
+        """线程池任务：持有季目录锁，按索引判断是否跳过，否则扫描单个季目录"""
+        with self.season_locks.lock_for(season_dir):
+            return self._scan_season_locked(
+                ctx,
+                show_dir,
+                season_dir,
+                video_exts,
+                season_index,
+                use_index,
+                processed_files,
+            )
+
+    def _scan_season_locked(
+        self,
+        ctx: ScanContext,
+        show_dir: Path,
+        season_dir: Path,
+        video_exts: Set[str],
+        season_index: Dict[str, Dict],
+        use_index: bool,
+        processed_files: ProcessedIndex,
+    ) -> Dict:
+        season_key = str(season_dir.absolute())
+        started = time.monotonic()
+        with ctx.timings.phase(PHASE_WALK):
+            st = (
+                self._stat_season_dir(season_dir, ctx.walk_stats) if use_index else None
+            )
+        cached = season_index.get(season_key)
+        if self._index_unchanged(st, cached):
+            return {
+                "season_key": season_key,
+                "skipped": True,
+                "p_list": [
+                    {"path": p, "status": STATUS_UNMATCHED, "reason": "indexed"}
+                    for p in cached["unrenamed"]
+                ],
+                "counts": (len(cached["unrenamed"]), 0, 0, 0, 0, 0),
+                "index_entry": cached,
+            }
+        media_type = self._extract_media_type(season_dir)
+        self.logger.info(f"Processing season: {season_dir} (Media type: {media_type})")
+        with ctx.timings.phase(PHASE_WALK):
+            entries = self._list_season(season_dir, ctx.walk_stats)
+        p_list, *counts = self._scan_single_season(
+            ctx,
+            season_dir=season_dir,
+            parent_show=show_dir,
+            video_exts=video_exts,
+            media_type_name=media_type,
+            entries=entries,
+            processed_files=processed_files,
+        )
+        ctx.timings.season(season_key, time.monotonic() - started)
+        return {
+            "season_key": season_key,
+            "skipped": False,
+            "p_list": p_list,
+            "counts": tuple(counts),
+            "index_entry": (
+                self._build_index_entry(st, p_list) if use_index else None
+            ),
+        }
+
+    def _iter_target_seasons(
+        self, root_path: Path, stats: WalkStats
+    ) -> Iterator[Tuple[Path, Path]]:
+        if self.is_season_dir(root_path):
+            yield root_path.parent, root_path
+        elif show_seasons := self._show_season_dirs(root_path, stats):
+            for season_dir in show_seasons:
+                yield root_path, season_dir
+        else:
+            yield from self._iter_season_dirs(root_path, stats)
+
+    def _plan_season(
+        self, season_dir: Path, processed_files: ProcessedIndex, stats: WalkStats
+    ) -> List[Dict]:
+        """单个季目录的重命名计划：只读目录和数据库，所有变更都在快照上模拟"""
+        season_key = str(season_dir.absolute())
+        entries = self._list_season(season_dir, stats)
+        snapshot = self._snapshot_season(season_dir, entries)
+        season_num_hint = self._get_season_from_path(season_dir)
+        plan: List[Dict] = []
+        for entry in entries:
+            if (
+                not entry.is_file()
+                or os.path.splitext(entry.name)[1].lower() not in VIDEO_EXTS
+            ):
+                continue
+            f = Path(entry.path)
+            abs_path = str(f.absolute())
+            if abs_path in processed_files or WhitelistLoader.is_whitelisted(
+                abs_path
+            ):
+                continue
+            episode_info = self._extract_episode_info(f.name)
+            if episode_info is None:
+                plan.append(
+                    {
+                        "season_dir": season_key,
+                        "type": "rename",
+                        "original": f.name,
+                        "new": None,
+                        "status": STATUS_UNMATCHED,
+                    }
+                )
+                continue
+            season_num, ep_num, match_span = episode_info
+            if season_num is not None:
+                continue
+            new_name = self._generate_new_filename(
+                f.name, season_num_hint, ep_num, match_span
+            )
+            if new_name == f.name:
+                continue
+            for change in self._rename_file_and_subtitles(
+                f, new_name, snapshot, dry_run=True
+            ):
+                plan.append({"season_dir": season_key, **change})
+        return plan
+
+    def plan_renames(self, sub_path: Optional[str] = None) -> Iterator[Dict]:
+        """
+        计划模式：与 scan_and_rename 走相同的遍历、解析和命名逻辑，
+        逐条产出视频/关联文件重命名与 NFO 删除计划，不改动文件也不写数据库。
+        """
+        root_path = (
+            self.media_path if sub_path is None else (self.media_path / sub_path)
+        )
+        if not root_path.exists():
+            yield {"type": "error", "message": f"媒体路径不存在: {root_path}"}
+            return
+        summary = {"type": "summary", "seasons": 0, "target": str(sub_path or "ALL")}
+        processed_files = self._processed_index(root_path)
+        stats = WalkStats()
+        pool = ThreadPoolExecutor(max_workers=SCAN_WORKERS, thread_name_prefix="plan")
+        try:
+            for plan in _bounded_map(
+                pool,
+                lambda pair: self._plan_season(pair[1], processed_files, stats),
+                self._iter_target_seasons(root_path, stats),
+                SCAN_WORKERS * 2,
+            ):
+                summary["seasons"] += 1
+                for item in plan:
+                    key = f"{item['type']}:{item['status']}"
+                    summary[key] = summary.get(key, 0) + 1
+                    yield item
+        finally:
+            # 客户端中途断开时不再等待剩余季目录
+            pool.shutdown(wait=False, cancel_futures=True)
+        yield summary
+
+    def scan_and_rename(
+        self,
+        sub_path: Optional[str] = None,
+        full_sweep: bool = False,
+        progress: Optional[ScanProgress] = None,
+    ) -> Dict:
+        """
+        流水线扫描：遍历生成季目录 → 线程池解析并重命名（在途任务数有上限）→
+        变更记录按批写库。只保留计数和未重命名文件路径，内存不随媒体库规模增长。
+        progress 用于对外报告进度，取消后已派发的季目录处理完即返回。
+        全库扫描同一时间只运行一个，重复请求附加到正在运行的扫描：同步其进度、
+        取消会转给该扫描，结束后返回其结果（attached=True）。正在运行的是增量扫描时，
+        全量扫描请求不附加，直接返回 status=busy。
+        """
+        if sub_path is not None:
+            return self._run_scan(ScanContext(sub_path, progress), full_sweep)
+        ctx = ScanContext(None, progress)
+        ctx.full_sweep = full_sweep
+        with self._full_scan_lock:
+            running = self._full_scan
+            owner = running is None
+            if owner:
+                running = self._full_scan = _InFlightScan(ctx)
+        if not owner:
+            if full_sweep and not running.ctx.full_sweep:
+                self.logger.info("Incremental full scan running, full sweep rejected")
+                return self._busy_result()
+            self.logger.info("Full scan already running, attaching to it")
+            return self._attach(running, ctx.progress)
+        try:
+            running.result = self._run_scan(ctx, full_sweep)
+        except Exception as exc:
+            running.result = {
+                "status": "error",
+                "message": str(exc),
+                "timestamp": datetime.now().isoformat(),
+            }
+            raise
+        finally:
+            with self._full_scan_lock:
+                self._full_scan = None
+            running.done.set()
+        return running.result
+
+    def full_scan_busy(self, full_sweep: bool) -> bool:
+        """全库扫描请求是否无法附加到正在运行的扫描（正在运行增量扫描而请求全量）"""
+        with self._full_scan_lock:
+            running = self._full_scan
+        return running is not None and full_sweep and not running.ctx.full_sweep
+
+    @staticmethod
+    def _busy_result() -> Dict:
+        return {
+            "status": "busy",
+            "message": "全库增量扫描正在进行中，请在其结束后再发起全量扫描",
+            "target": "ALL",
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    @staticmethod
+    def _attach(running: _InFlightScan, progress: ScanProgress) -> Dict:
+        """等待正在运行的全库扫描结束，期间同步其进度并转发取消"""
+        owner_progress = running.ctx.progress
+        while not running.done.wait(ATTACH_POLL_SECONDS):
+            progress.mirror(owner_progress)
+            if progress.cancelled:
+                owner_progress.cancel()
+        progress.mirror(owner_progress)
+        return {**running.result, "attached": True}
+
+    def _run_scan(self, ctx: ScanContext, full_sweep: bool) -> Dict:
+        """执行一次扫描并记录扫描次数、结果状态和耗时指标"""
+        scope = "all" if ctx.sub_path is None else "path"
+        SCANS_STARTED.inc(scope=scope)
+        status = "error"
+        try:
+            result = self._scan(ctx, full_sweep)
+            status = result.get("status", "completed")
+            return result
+        finally:
+            SCANS_COMPLETED.inc(scope=scope, status=status)
+            SCAN_DURATION.observe(ctx.timings.elapsed, scope=scope)
+
+    def _scan(self, ctx: ScanContext, full_sweep: bool) -> Dict:
+        sub_path = ctx.sub_path
+        progress = ctx.progress
         self.logger.info(
             f"Starting media scan and rename process. Target: '{sub_path or 'ALL'}'"
         )
-        processed_files_list: List[Dict] = []
         total, renamed = 0, 0
         renamed_subtitle = 0
         renamed_audio = 0
         renamed_picture = 0
         deleted_nfo = 0
-        video_exts = {
-            ".mkv",
-            ".mp4",
-            ".avi",
-            ".mov",
-            ".wmv",
-            ".flv",
-            ".webm",
-            ".ts",
-            ".m2ts",
-        }
+        skipped_seasons = 0
+        video_exts = VIDEO_EXTS
         finished_statuses = {STATUS_RENAMED, STATUS_WHITELIST, STATUS_SKIP}
         root_path = (
             self.media_path if sub_path is None else (self.media_path / sub_path)
@@ -985,86 +1701,124 @@ class EmbressRenamer:
                 "timestamp": datetime.now().isoformat(),
             }
 
-        if self._is_season_dir(root_path):
-            media_type = self._extract_media_type(root_path)
+        use_index = False
+        season_index: Dict[str, Dict] = {}
+        if self.is_season_dir(root_path):
+            self.logger.info(f"Processing season directory: {root_path}")
+            seasons = iter([(root_path.parent, root_path)])
+            progress.set_total(1)
+        elif show_seasons := self._show_season_dirs(root_path, ctx.walk_stats):
+            self.logger.info(f"Processing show directory: {root_path}")
+            seasons = ((root_path, season_dir) for season_dir in show_seasons)
+            progress.set_total(len(show_seasons))
+        else:
+            # 全库扫描走目录索引：mtime/inode 未变化的季目录直接跳过，不再列目录
+            use_index = sub_path is None
+            full_sweep = use_index and (full_sweep or self._is_full_sweep_due())
+            ctx.full_sweep = full_sweep
+            # 季目录总数按上次扫描留下的索引估算，需在全量扫描清空索引之前读取
+            try:
+                progress.set_total(
+                    config_db.count_season_index(str(root_path.absolute()))
+                )
+            except Exception as e:
+                self.logger.warning("Failed to estimate season count: %s", e)
+            if use_index and not full_sweep:
+                season_index = config_db.get_season_index()
+            elif full_sweep:
+                # 全量扫描重建索引和解析缓存：先清空，之后随变更记录分批写入
+                try:
+                    config_db.save_season_index({}, replace_all=True)
+                    config_db.clear_parse_cache(str(root_path.absolute()))
+                except Exception as e:
+                    self.logger.error("Failed to reset season index: %s", e)
             self.logger.info(
-                f"Processing season directory: {root_path} (Media type: {media_type})"
+                f"Processing base directory: {root_path} "
+                f"(mode: {'full sweep' if full_sweep else 'incremental'})"
             )
-            p_list, t_inc, r_inc, s_inc, a_inc, p_inc, n_inc = self._scan_single_season(
-                season_dir=root_path,
-                parent_show=root_path.parent,
-                video_exts=video_exts,
-                media_type_name=media_type,
+            seasons = self._iter_season_dirs(root_path, ctx.walk_stats)
+
+        # 已处理文件集合整库一次流式查询取回，首个未命中索引的季目录才触发加载
+        processed_files = self._processed_index(root_path)
+        ctx.parse_cache = ParseCache(root_path, ctx.walk_stats)
+        index_updates: Dict[str, Optional[Dict]] = {}
+        # 各季目录互不相关，交给线程池并发处理；同一季目录只会落在一个任务里
+        with ThreadPoolExecutor(
+            max_workers=SCAN_WORKERS, thread_name_prefix="season-scan"
+        ) as pool:
+            season_results = _bounded_map(
+                pool,
+                lambda pair: None
+                if progress.cancelled
+                else self._scan_season_task(
+                    ctx,
+                    pair[0],
+                    pair[1],
+                    video_exts,
+                    season_index,
+                    use_index,
+                    processed_files,
+                ),
+                self._until_cancelled(
+                    ctx.timings.timed_iter(seasons, PHASE_WALK), progress
+                ),
+                SCAN_WORKERS * 2,
             )
-            processed_files_list.extend(p_list)
-            total += t_inc
-            renamed += r_inc
-            renamed_subtitle += s_inc
-            renamed_audio += a_inc
-            renamed_picture += p_inc
-            deleted_nfo += n_inc
-        elif self._is_show_dir(root_path):
-            self.logger.info(f"Processing show directory: {root_path}")
-            for season_dir in root_path.iterdir():
-                media_type = self._extract_media_type(root_path)
-                self.logger.info(
-                    f"Processing season: {season_dir} (Media type: {media_type})"
-                )
-                if season_dir.is_dir() and self._is_season_dir(season_dir):
-                    p_list, t_inc, r_inc, s_inc, a_inc, p_inc, n_inc = (
-                        self._scan_single_season(
-                            season_dir=season_dir,
-                            parent_show=root_path,
-                            video_exts=video_exts,
-                            media_type_name=media_type,
-                        )
-                    )
-                    processed_files_list.extend(p_list)
-                    total += t_inc
-                    renamed += r_inc
-                    renamed_subtitle += s_inc
-                    renamed_audio += a_inc
-                    renamed_picture += p_inc
-                    deleted_nfo += n_inc
-        else:
-            self.logger.info(f"Processing base directory: {root_path}")
-            for show_dir, season_dir in self._iter_season_dirs(root_path):
-                media_type = self._extract_media_type(season_dir)
-                p_list, t_inc, r_inc, s_inc, a_inc, p_inc, n_inc = (
-                    self._scan_single_season(
-                        season_dir=season_dir,
-                        parent_show=show_dir,
-                        video_exts=video_exts,
-                        media_type_name=media_type,
-                    )
+            for res in season_results:
+                if res is None:
+                    continue
+                if res["skipped"]:
+                    skipped_seasons += 1
+                elif use_index:
+                    index_updates[res["season_key"]] = res["index_entry"]
+                ctx.queue_unrenamed(
+                    [
+                        f["path"]
+                        for f in res["p_list"]
+                        if f.get("status") not in finished_statuses
+                    ]
                 )
-                processed_files_list.extend(p_list)
+                t_inc, r_inc, s_inc, a_inc, p_inc, n_inc = res["counts"]
                 total += t_inc
                 renamed += r_inc
                 renamed_subtitle += s_inc
                 renamed_audio += a_inc
                 renamed_picture += p_inc
                 deleted_nfo += n_inc
-        unrenamed_files = [
-            {"path": f["path"]}
-            for f in processed_files_list
-            if f.get("status") not in finished_statuses
-        ]
+                progress.add(
+                    seasons=1,
+                    files=0 if res["skipped"] else len(res["p_list"]),
+                    renames=r_inc + s_inc + a_inc + p_inc,
+                )
+                if self._flush_change_records(ctx):
+                    # 索引条目晚于对应的变更记录落库，崩溃后不会跳过未记录的季目录
+                    self._flush_season_index(ctx, index_updates)
+                self._flush_parse_cache(ctx)
+                self._flush_unrenamed(ctx)
+        self._flush_change_records(ctx, force=True)
+        self._flush_parse_cache(ctx, force=True)
+        self._flush_unrenamed(ctx, force=True)
+        if use_index:
+            self._flush_season_index(ctx, index_updates)
+            if full_sweep and not progress.cancelled:
+                try:
+                    config_db.set_meta("last_full_sweep", str(time.time()))
+                except Exception as e:
+                    self.logger.error("Failed to record full sweep time: %s", e)
+        fs_stats = ctx.walk_stats.as_dict()
+        timings = ctx.timings.as_dict()
+        duration = round(ctx.timings.elapsed, 3)
         self.logger.info(
-            f"Scan completed: {total} files processed, {renamed} files renamed."
+            f"Scan completed: {total} files processed, {renamed} files renamed, "
+            f"{skipped_seasons} unchanged seasons skipped. "
+            f"Syscalls: {fs_stats['scandir']} scandir, {fs_stats['stat']} stat "
+            f"for {fs_stats['entries']} entries."
         )
-        if self._pending_change_records:
-            try:
-                config_db.add_change_records(self._pending_change_records)
-                self.logger.info("Change records saved")
-
-            except Exception as e:
-                self.logger.error("Failed to batch save change records: %s", e)
-            for season_dir in self._seasons_to_update:
-                self._write_all_change_records(season_dir.absolute())
-            self._pending_change_records = []
-            self._seasons_to_update = set()
-        return {
+        self.logger.info(
+            f"Scan took {duration}s; phase totals: "
+            + ", ".join(f"{k} {v}s" for k, v in timings["phases"].items())
+        )
+        result = {
             "status": "completed",
             "processed": total,
             "renamed": renamed,
@@ -1072,33 +1826,118 @@ class EmbressRenamer:
             "renamed_audio": renamed_audio,
             "renamed_picture": renamed_picture,
             "deleted_nfo": deleted_nfo,
-            "unrenamed_count": len(unrenamed_files),
-            "unrenamed_files": unrenamed_files,
+            # 明细已按 scan_id 暂存，写入扫描历史后通过 /api/history/<id>/unrenamed 分页读取
+            "unrenamed_count": ctx.unrenamed_count,
+            "skipped_seasons": skipped_seasons,
+            "fs_stats": fs_stats,
+            "duration": duration,
+            "timings": timings,
+            "scan_id": ctx.scan_id,
             "timestamp": datetime.now().isoformat(),
             "target": str(sub_path or "ALL"),
         }
+        if progress.cancelled:
+            self.logger.info("Scan cancelled after %d seasons", progress.seasons_done)
+            result.update({"status": "cancelled", "message": "扫描已取消"})
+        return result
+
+    @staticmethod
+    def _until_cancelled(
+        seasons: Iterator[Tuple[Path, Path]], progress: ScanProgress
+    ) -> Iterator[Tuple[Path, Path]]:
+        for pair in seasons:
+            if progress.cancelled:
+                return
+            yield pair
+
+    def _flush_change_records(self, ctx: ScanContext, force: bool = False) -> bool:
+        """待写变更记录达到 CHANGE_RECORD_BATCH（或 force）时写库，并追加到各季目录的记录日志"""
+        taken = ctx.take_records(1 if force else CHANGE_RECORD_BATCH)
+        if taken is None:
+            return False
+        records, seasons = taken
+        with ctx.timings.phase(PHASE_DB_FLUSH):
+            try:
+                config_db.add_change_records(records)
+                self.logger.info("Change records saved: %d", len(records))
+            except Exception as e:
+                self.logger.error("Failed to batch save change records: %s", e)
+            by_season: Dict[str, List[Dict]] = {}
+            for record in records:
+                by_season.setdefault(record["season_dir"], []).append(record)
+            for season_dir in seasons:
+                season_records = by_season.get(str(season_dir.absolute()))
+                if not season_records:
+                    continue
+                with self.season_locks.lock_for(season_dir):
+                    self._journal_change_records(season_dir, season_records)
+        return True
+
+    def _flush_parse_cache(self, ctx: ScanContext, force: bool = False):
+        if ctx.parse_cache is None:
+            return
+        taken = ctx.parse_cache.take(1 if force else CHANGE_RECORD_BATCH)
+        if taken is None:
+            return
+        with ctx.timings.phase(PHASE_DB_FLUSH):
+            try:
+                config_db.save_parse_cache(taken)
+            except Exception as e:
+                self.logger.error("Failed to save parse cache: %s", e)
+
+    def _flush_unrenamed(self, ctx: ScanContext, force: bool = False):
+        taken = ctx.take_unrenamed(1 if force else CHANGE_RECORD_BATCH)
+        if taken is None:
+            return
+        with ctx.timings.phase(PHASE_DB_FLUSH):
+            try:
+                config_db.add_pending_unrenamed(ctx.scan_id, taken)
+            except Exception as e:
+                self.logger.error("Failed to save unrenamed files: %s", e)
+
+    def _flush_season_index(
+        self, ctx: ScanContext, index_updates: Dict[str, Optional[Dict]]
+    ):
+        if not index_updates:
+            return
+        with ctx.timings.phase(PHASE_DB_FLUSH):
+            try:
+                config_db.save_season_index(index_updates)
+            except Exception as e:
+                self.logger.error("Failed to save season index: %s", e)
+        index_updates.clear()
 
     def _queue_change_records(
-        self, season_dir: Path, media_type: str, changes: List[Dict]
+        self, ctx: ScanContext, season_dir: Path, media_type: str, changes: List[Dict]
     ):
         if not changes:
             return
 
         processed = self._get_new_change_record(season_dir, media_type, changes)
-        self._pending_change_records.extend(processed)
-        self._seasons_to_update.add(season_dir)
+        for record in processed:
+            record["scan_id"] = ctx.scan_id
+        ctx.queue_records(season_dir, processed)
 
-    def _delete_old_nfo(self, season_dir, old_stem, changes):
+    def _delete_old_nfo(
+        self, season_dir, old_stem, changes, snapshot=None, dry_run=False
+    ):
         nfo_path = season_dir / f"{old_stem}.nfo"
         for candidate in [nfo_path, nfo_path.with_suffix(".NFO")]:
-            if candidate.exists():
+            if snapshot is not None:
+                found = snapshot.exists(candidate.name)
+            else:
+                found = candidate.exists()
+            if found:
                 try:
-                    candidate.unlink()
+                    if not dry_run:
+                        self._remove(candidate)
+                    if snapshot is not None:
+                        snapshot.remove(candidate.name)
                     changes.append(
                         {
                             "type": "nfo_delete",
                             "original": candidate.name,
-                            "status": "success",
+                            "status": STATUS_PLANNED if dry_run else "success",
                             "error": None,
                         }
                     )
@@ -1120,32 +1959,40 @@ class EmbressRenamer:
         except ValueError:
             return any_path.parent.name
 
-    def _iter_season_dirs(self, base_dir: Path):
-        for entry in base_dir.iterdir():
-            if not entry.is_dir():
-                continue
-            if self._is_season_dir(entry):
-                yield entry.parent, entry
-            else:
-                yield from self._iter_season_dirs(entry)
+    def _iter_season_dirs(self, base_dir: Path, stats: WalkStats):
+        return iter_season_dirs(base_dir, self._is_season_name, stats)
+
+    def _list_season(
+        self, season_dir: Path, stats: Optional[WalkStats] = None
+    ) -> List[os.DirEntry]:
+        return list_dir(season_dir, stats or WalkStats())
+
+    @staticmethod
+    def _is_season_name(name: str) -> bool:
+        return any(pat.search(name) for pat in SEASON_PATTERNS)
 
-    def _is_season_dir(self, path: Path) -> bool:
+    def is_season_dir(self, path: Path) -> bool:
+        """path 是否为季目录（存在且目录名匹配季目录规则），供接口层判断回滚方式"""
         if not path.is_dir():
             return False
-        return any(pat.search(path.name) for pat in SEASON_PATTERNS)
+        return self._is_season_name(path.name)
 
-    def _is_show_dir(self, path: Path) -> bool:
+    def _show_season_dirs(self, path: Path, stats: WalkStats) -> List[Path]:
+        """节目目录下的季目录列表，非节目目录返回空列表"""
         if not path.is_dir():
-            return False
-        return any(self._is_season_dir(d) for d in path.iterdir() if d.is_dir())
+            return []
+        return list(iter_child_season_dirs(path, self._is_season_name, stats))
 
     def _scan_single_season(
         self,
+        ctx: ScanContext,
         season_dir: Path,
         parent_show: Path,
         video_exts: Set[str],
         media_type_name: str,
-    ) -> Tuple[List[Dict], int, int, int, int]:
+        entries: Optional[List[os.DirEntry]] = None,
+        processed_files: Optional[ProcessedIndex] = None,
+    ) -> Tuple[List[Dict], int, int, int, int, int, int]:
         processed_files_list: List[Dict] = []
         total, renamed, renamed_sub, deleted_nfo, renamed_audio, renamed_picture = (
             0,
@@ -1155,21 +2002,47 @@ class EmbressRenamer:
             0,
             0,
         )
-        processed_files = self._season_processed_set(season_dir)
+        if processed_files is None:
+            processed_files = self._processed_index(season_dir)
         season_num_hint = self._get_season_from_path(season_dir)
         season_changes: List[Dict] = []
 
-        for f in season_dir.iterdir():
-            abs_path = str(f.absolute())
+        if entries is None:
+            entries = self._list_season(season_dir, ctx.walk_stats)
+        snapshot = self._snapshot_season(season_dir, entries)
+        parse_cache = ctx.parse_cache
+        season_mtime = (
+            parse_cache.season_mtime(season_dir) if parse_cache is not None else None
+        )
+        observed: List[Tuple[os.DirEntry, str, str]] = []
+        for entry in entries:
             if (
-                not f.is_file()
-                or f.suffix.lower() not in video_exts
-                or (abs_path, f.name) in processed_files
+                not entry.is_file()
+                or os.path.splitext(entry.name)[1].lower() not in video_exts
             ):
                 continue
+            f = Path(entry.path)
+            abs_path = str(f.absolute())
+            if abs_path in processed_files:
+                continue
+            cached_status = None
+            if parse_cache is not None and not WhitelistLoader.is_whitelisted(
+                abs_path
+            ):
+                cached_status = parse_cache.lookup(entry, abs_path, season_mtime)
+            if cached_status is not None:
+                # 文件与正则均未变化，沿用上次的未匹配/失败结果
+                processed_files_list.append(
+                    {"path": abs_path, "status": cached_status, "reason": "cached"}
+                )
+                PARSE_CACHE_HITS.inc()
+                FILES_RESULT.inc(status=cached_status)
+                total += 1
+                continue
             file_info, changes, renamed_flag = self._process_episode_file(
-                f, season_num_hint, abs_path
+                f, season_num_hint, abs_path, snapshot, ctx.timings
             )
+            observed.append((entry, abs_path, file_info["status"]))
             processed_files_list.append(file_info)
             season_changes.extend(changes)
             if (
@@ -1179,15 +2052,23 @@ class EmbressRenamer:
                 total += 1
             if renamed_flag:
                 renamed += 1
-        if self.current_sub_path is not None:
-            orphan_changes = self._sync_orphan_subtitles(season_dir)
+        if observed:
+            FILES_PARSED.inc(len(observed))
+            for _, _, status in observed:
+                FILES_RESULT.inc(status=status)
+            if parse_cache is not None:
+                parse_cache.record(season_dir, observed)
+        if ctx.sub_path is not None:
+            orphan_changes = self._sync_orphan_subtitles(season_dir, snapshot)
             self.logger.info(
                 f"Orphan subtitles processed: {len(orphan_changes)} changes."
             )
             if orphan_changes:
                 season_changes.extend(orphan_changes)
         if season_changes:
-            self._queue_change_records(season_dir, media_type_name, season_changes)
+            self._queue_change_records(
+                ctx, season_dir, media_type_name, season_changes
+            )
             for change in season_changes:
                 if (
                     change.get("type") in ADDITION_CHANGE
@@ -1215,38 +2096,44 @@ class EmbressRenamer:
         file_path: Path,
         season_num_hint: Optional[int],
         abs_path: str,
+        snapshot: Optional[SeasonSnapshot] = None,
+        timings: Optional[ScanTimings] = None,
     ) -> Tuple[Dict, List[Dict], bool]:
-        if WhitelistLoader.is_whitelisted(abs_path):
-            return (
-                {"path": abs_path, "status": STATUS_WHITELIST},
-                [],
-                False,
-            )
-        file_info = {
-            "path": abs_path,
-            "status": STATUS_UNPROCESSED,
-        }
-        episode_info = self._extract_episode_info(file_path.name)
-        if episode_info is None:
-            file_info.update(
-                {"status": STATUS_UNMATCHED, "reason": "no_episode_and_season_info"}
+        if timings is None:
+            timings = ScanTimings()
+        with timings.phase(PHASE_PARSE):
+            if WhitelistLoader.is_whitelisted(abs_path):
+                return (
+                    {"path": abs_path, "status": STATUS_WHITELIST},
+                    [],
+                    False,
+                )
+            file_info = {
+                "path": abs_path,
+                "status": STATUS_UNPROCESSED,
+            }
+            episode_info = self._extract_episode_info(file_path.name)
+            if episode_info is None:
+                file_info.update(
+                    {"status": STATUS_UNMATCHED, "reason": "no_episode_and_season_info"}
+                )
+                return file_info, [], False
+
+            season_num, ep_num, match_span = episode_info
+            if season_num is not None:
+                file_info.update({"status": STATUS_SKIP, "reason": "no_rename_needed"})
+                changes = self._build_skip_record(file_path.name)
+                return file_info, changes, False
+            effective_season = season_num_hint
+            new_name = self._generate_new_filename(
+                file_path.name, effective_season, ep_num, match_span
             )
-            return file_info, [], False
-
-        season_num, ep_num, match_span = episode_info
-        if season_num is not None:
-            file_info.update({"status": STATUS_SKIP, "reason": "no_rename_needed"})
-            changes = self._build_skip_record(file_path.name)
-            return file_info, changes, False
-        effective_season = season_num_hint
-        new_name = self._generate_new_filename(
-            file_path.name, effective_season, ep_num, match_span
-        )
-        if new_name == file_path.name:
-            file_info.update({"status": STATUS_SKIP, "reason": "no_rename_needed"})
-            changes = self._build_skip_record(file_path.name)
-            return file_info, changes, False
-        changes = self._rename_file_and_subtitles(file_path, new_name)
+            if new_name == file_path.name:
+                file_info.update({"status": STATUS_SKIP, "reason": "no_rename_needed"})
+                changes = self._build_skip_record(file_path.name)
+                return file_info, changes, False
+        with timings.phase(PHASE_RENAME):
+            changes = self._rename_file_and_subtitles(file_path, new_name, snapshot)
         if self._count_success_renames(changes):
             file_info.update(
                 {
@@ -1267,8 +2154,23 @@ class EmbressRenamer:
 
 
 if __name__ == "__main__":
-
-    root = sys.argv[1] if len(sys.argv) > 1 else MEDIA_PATH
-    print(
-        json.dumps(EmbressRenamer(root).scan_and_rename(), ensure_ascii=False, indent=2)
+    parser = argparse.ArgumentParser(description="EMBRESS 媒体文件重命名")
+    parser.add_argument("root", nargs="?", default=MEDIA_PATH, help="媒体库根目录")
+    parser.add_argument("--sub-path", help="只处理根目录下的某个子目录")
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="只输出重命名计划（JSON Lines），不修改文件也不写数据库",
     )
+    args = parser.parse_args()
+    renamer = EmbressRenamer(args.root)
+    if args.plan:
+        for item in renamer.plan_renames(args.sub_path):
+            sys.stdout.write(json.dumps(item, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+    else:
+        print(
+            json.dumps(
+                renamer.scan_and_rename(args.sub_path), ensure_ascii=False, indent=2
+            )
+        )
@@ -0,0 +1,104 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+try:  # Python 3.11+
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_parse
+
+# 按优先级排列的模式分组，先尝试 (季,集) 再尝试 仅集数
+PATTERN_TYPES = ("season_episode", "episode_only")
+
+# re.I 下除大小写外还能匹配非 ASCII 字符的字母（ı / ſ），不能用作子串预筛选
+_UNSAFE_FOLD = {"i", "s"}
+
+
+def _fold_safe(ch: str) -> bool:
+    if ch.isascii():
+        return ch.lower() not in _UNSAFE_FOLD
+    return ch.lower() == ch and ch.upper() == ch
+
+
+def _literal_char(op, av) -> Optional[str]:
+    """LITERAL 或只含同一字母大小写的字符集 ([Ee]) 返回对应的小写字符"""
+    if op is sre_parse.LITERAL:
+        ch = chr(av).lower()
+    elif op is sre_parse.IN:
+        chars = set()
+        for sub_op, sub_av in av:
+            if sub_op is not sre_parse.LITERAL:
+                return None
+            chars.add(chr(sub_av).lower())
+        if len(chars) != 1:
+            return None
+        ch = chars.pop()
+    else:
+        return None
+    return ch if _fold_safe(ch) else None
+
+
+def _required_literals(parsed, out: Set[str]):
+    """收集匹配成功时文件名中必然出现的字面量片段（已转小写）"""
+    run = ""
+    for op, av in parsed:
+        ch = _literal_char(op, av)
+        if ch is not None:
+            run += ch
+            continue
+        if run:
+            out.add(run)
+            run = ""
+        if op is sre_parse.SUBPATTERN:
+            _required_literals(av[-1], out)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            _required_literals(av[2], out)
+        elif op is sre_parse.ASSERT:
+            _required_literals(av[1], out)
+    if run:
+        out.add(run)
+
+
+def required_literals(pattern: re.Pattern) -> Tuple[str, ...]:
+    out: Set[str] = set()
+    try:
+        _required_literals(sre_parse.parse(pattern.pattern, pattern.flags), out)
+    except Exception:
+        return ()
+    return tuple(sorted(out, key=len, reverse=True))
+
+
+class EpisodeMatcher:
+    """
+    将配置的正则列表编译为一个有序匹配引擎：
+    第一遍对小写文件名做字面量子串预筛选（如 第 / episode / [ / - / e），
+    第二遍只按优先级运行字面量齐全的候选模式，结果与逐条 re.search 完全一致。
+    """
+
+    def __init__(self, patterns: Dict[str, List[re.Pattern]]):
+        self._entries: List[Tuple[str, re.Pattern, Tuple[str, ...]]] = []
+        for p_type in PATTERN_TYPES:
+            for pat in patterns.get(p_type, []):
+                self._entries.append((p_type, pat, required_literals(pat)))
+        self._tokens = sorted({lit for _, _, lits in self._entries for lit in lits})
+
+    @property
+    def tokens(self) -> List[str]:
+        return list(self._tokens)
+
+    def match(self, filename: str) -> Optional[Tuple[str, re.Match]]:
+        """返回 (模式类型, Match)；按优先级第一个命中的模式获胜"""
+        lowered = filename.lower()
+        present = {tok for tok in self._tokens if tok in lowered}
+        for p_type, pat, lits in self._entries:
+            if lits and not present.issuperset(lits):
+                continue
+            if m := pat.search(filename):
+                return p_type, m
+        return None
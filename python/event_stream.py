@@ -0,0 +1,73 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import json
+import queue
+import threading
+from typing import Iterator, List
+
+# 单个连接最多积压的事件数，超出后丢弃最旧的事件，慢客户端不会拖住发布方
+EVENT_QUEUE_SIZE = 1000
+# 空闲时发送注释行保活，避免反向代理断开长连接
+HEARTBEAT_SECONDS = 15
+
+
+class EventBroadcaster:
+    """进程内事件广播：每个 SSE 连接持有一个有界队列，publish 不阻塞、不写日志"""
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self._queue_size = queue_size
+        self._subscribers: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> queue.Queue:
+        q: queue.Queue = queue.Queue(maxsize=self._queue_size)
+        with self._lock:
+            self._subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q: queue.Queue):
+        with self._lock:
+            if q in self._subscribers:
+                self._subscribers.remove(q)
+
+    @property
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: str, data: dict):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        message = (event, json.dumps(data, ensure_ascii=False))
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def stream(self, heartbeat: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+        """按 text/event-stream 格式逐条产出事件，连接断开时自动退订"""
+        q = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    event, data = q.get(timeout=heartbeat)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: {event}\ndata: {data}\n\n"
+        finally:
+            self.unsubscribe(q)
@@ -0,0 +1,140 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import bisect
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class WalkStats:
+    """统计目录遍历产生的系统调用次数，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.scandir = 0
+        self.stat = 0
+        self.entries = 0
+
+    def add(self, scandir: int = 0, stat: int = 0, entries: int = 0):
+        with self._lock:
+            self.scandir += scandir
+            self.stat += stat
+            self.entries += entries
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "scandir": self.scandir,
+                "stat": self.stat,
+                "entries": self.entries,
+            }
+
+
+def list_dir(path: Path, stats: WalkStats) -> List[os.DirEntry]:
+    """一次 scandir 列出目录，后续 is_dir()/is_file() 直接复用 DirEntry 缓存的类型"""
+    with os.scandir(path) as it:
+        entries = list(it)
+    stats.add(scandir=1, entries=len(entries))
+    return entries
+
+
+def stat_path(path: Path, stats: WalkStats) -> os.stat_result:
+    stats.add(stat=1)
+    return os.stat(path)
+
+
+def iter_season_dirs(
+    base_dir: Path, is_season_name: Callable[[str], bool], stats: WalkStats
+) -> Iterator[Tuple[Path, Path]]:
+    """单次遍历同时完成季目录判定，返回 (节目目录, 季目录)"""
+    for entry in list_dir(base_dir, stats):
+        if not entry.is_dir():
+            continue
+        if is_season_name(entry.name):
+            yield base_dir, Path(entry.path)
+        else:
+            yield from iter_season_dirs(Path(entry.path), is_season_name, stats)
+
+
+def iter_child_season_dirs(
+    show_dir: Path, is_season_name: Callable[[str], bool], stats: WalkStats
+) -> Iterator[Path]:
+    for entry in list_dir(show_dir, stats):
+        if entry.is_dir() and is_season_name(entry.name):
+            yield Path(entry.path)
+
+
+class SeasonSnapshot:
+    """
+    季目录的内存快照：目录只列一次，关联文件（字幕/音轨/图片）按小写 stem 排序建索引，
+    重命名、关联文件、NFO 各阶段共用并随重命名原地更新。
+    """
+
+    def __init__(self, season_dir: Path, entries: List[os.DirEntry], sidecar_exts):
+        self.season_dir = season_dir
+        self._sidecar_exts = set(sidecar_exts)
+        self._names = {e.name for e in entries}
+        self._sidecar_keys: List[str] = []
+        self._sidecar_names: List[str] = []
+        for e in entries:
+            if e.is_file():
+                self._add_sidecar(e.name)
+
+    def _sidecar_key(self, name: str) -> Optional[str]:
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in self._sidecar_exts:
+            return None
+        return stem.lower()
+
+    def _add_sidecar(self, name: str):
+        key = self._sidecar_key(name)
+        if key is None:
+            return
+        idx = bisect.bisect_left(self._sidecar_keys, key)
+        self._sidecar_keys.insert(idx, key)
+        self._sidecar_names.insert(idx, name)
+
+    def _remove_sidecar(self, name: str):
+        key = self._sidecar_key(name)
+        if key is None:
+            return
+        idx = bisect.bisect_left(self._sidecar_keys, key)
+        while idx < len(self._sidecar_keys) and self._sidecar_keys[idx] == key:
+            if self._sidecar_names[idx] == name:
+                del self._sidecar_keys[idx]
+                del self._sidecar_names[idx]
+                return
+            idx += 1
+
+    def exists(self, name: str) -> bool:
+        return name in self._names
+
+    def sidecars_for(self, stem: str) -> List[str]:
+        """stem 相同或以 "stem." 开头（不区分大小写）的关联文件名"""
+        prefix = stem.lower()
+        result = []
+        idx = bisect.bisect_left(self._sidecar_keys, prefix)
+        while idx < len(self._sidecar_keys):
+            key = self._sidecar_keys[idx]
+            if not key.startswith(prefix):
+                break
+            if len(key) == len(prefix) or key[len(prefix)] == ".":
+                result.append(self._sidecar_names[idx])
+            idx += 1
+        return result
+
+    def rename(self, old: str, new: str):
+        self.remove(old)
+        self._names.add(new)
+        self._add_sidecar(new)
+
+    def remove(self, name: str):
+        if name in self._names:
+            self._names.discard(name)
+            self._remove_sidecar(name)
@@ -0,0 +1,146 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import os
+import random
+from pathlib import Path
+from typing import Dict, List, Optional
+
+SHOW_WORDS = [
+    "Frieren",
+    "Spy x Family",
+    "Blue Lock",
+    "Oshi no Ko",
+    "The Apothecary Diaries",
+    "Dungeon Meshi",
+    "葬送的芙莉莲",
+    "间谍过家家",
+    "Kusuriya no Hitorigoto",
+    "Shingeki no Kyojin",
+]
+GROUPS = ["Nekomoe kissaten", "LoliHouse", "ANi", "SweetSub", "Sakurato", "VCB-Studio"]
+QUALITIES = ["1080p", "720p", "2160p", "WebRip 1080p HEVC-10bit AAC", "BDRip 1080p"]
+LANGS = ["CHS", "CHT", "GB", "BIG5", "JPSC"]
+
+# 常见发布命名风格，{show} {ep} {season} {group} {quality} {lang} 为占位符
+RELEASE_STYLES = [
+    "[{group}] {show} - {ep} [{quality}].mkv",
+    "[{group}] {show} [{ep}][{quality}][{lang}].mp4",
+    "[{group}][{show}][{ep}][{quality}].mkv",
+    "{show} - S{season}E{ep} - {quality}.mkv",
+    "{show}.S{season}E{ep}.{quality}.WEB-DL.mkv",
+    "{show} 第{ep}集 {quality}.mp4",
+    "{show} 第{season_n}季 第{ep}集.mp4",
+    "{show} Episode {ep} ({quality}).mkv",
+    "{show} Season {season_n} Episode {ep}.mkv",
+    "{show} - {ep} - {lang}.mkv",
+    "{show} {ep} [{quality}].mkv",
+    "{show} {ep} ({quality}).mkv",
+    "{show}.{ep}.Web.mkv",
+    "{show} E{ep} {quality}.mkv",
+    "[{group}] {show} - {ep}.5 [{quality}].mkv",
+    "{show} - {season_n} - {ep} [{quality}].mkv",
+    "{show}.{season_n}.{ep}.{quality}.mkv",
+    "{show} - SP [{quality}].mkv",
+    "{show} NCOP {quality}.mkv",
+    "random_video_{ep}{season}.mkv",
+]
+
+
+# 关联文件：(文件名后缀, 出现概率)，字幕带语言标记以覆盖 stem.lang.ext 形式
+SIDECARS = [
+    (".chs.ass", 0.6),
+    (".cht.srt", 0.3),
+    (".mka", 0.15),
+    ("-thumb.jpg", 0.2),
+    (".nfo", 0.5),
+]
+MEDIA_TYPES = ["tv", "anime"]
+
+
+def release_name(
+    rng: random.Random,
+    style: str = None,
+    ep: int = None,
+    show: str = None,
+    season: int = None,
+) -> str:
+    style = style or rng.choice(RELEASE_STYLES)
+    season_n = season if season is not None else rng.randint(1, 4)
+    return style.format(
+        show=show or rng.choice(SHOW_WORDS),
+        ep=f"{ep if ep is not None else rng.randint(1, 120):02d}",
+        season=f"{season_n:02d}",
+        season_n=season_n,
+        group=rng.choice(GROUPS),
+        quality=rng.choice(QUALITIES),
+        lang=rng.choice(LANGS),
+    )
+
+
+def release_names(count: int, seed: int = 0) -> List[str]:
+    """生成 count 个覆盖多种真实发布风格的视频文件名"""
+    rng = random.Random(seed)
+    return [release_name(rng) for _ in range(count)]
+
+
+def _show_name(rng: random.Random, index: int) -> str:
+    return f"{rng.choice(SHOW_WORDS)} {index:05d}"
+
+
+def generate_library(
+    root: Path,
+    shows: int,
+    seasons: int,
+    episodes: int,
+    seed: int = 0,
+    sidecars: bool = True,
+    style: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    在 root 下生成 shows × seasons × episodes 个视频文件的媒体库：
+    {媒体类型}/{节目}/Season N/{发布名}，并按 SIDECARS 的概率生成字幕/音轨/封面/NFO。
+    文件均为空文件，返回各类文件数量。
+    """
+    rng = random.Random(seed)
+    root = Path(root)
+    counts = {"shows": shows, "seasons": 0, "videos": 0, "sidecars": 0}
+    for show_idx in range(shows):
+        show = _show_name(rng, show_idx)
+        show_dir = root / MEDIA_TYPES[show_idx % len(MEDIA_TYPES)] / show
+        for season_n in range(1, seasons + 1):
+            season_dir = show_dir / f"Season {season_n}"
+            season_dir.mkdir(parents=True, exist_ok=True)
+            counts["seasons"] += 1
+            names = set()
+            for ep in range(1, episodes + 1):
+                name = release_name(rng, style, ep=ep, show=show, season=season_n)
+                if name in names:
+                    name = release_name(
+                        rng, RELEASE_STYLES[0], ep=ep, show=show, season=season_n
+                    )
+                names.add(name)
+                open(season_dir / name, "w").close()
+                counts["videos"] += 1
+                if not sidecars:
+                    continue
+                stem = os.path.splitext(name)[0]
+                for suffix, chance in SIDECARS:
+                    if rng.random() < chance:
+                        open(season_dir / f"{stem}{suffix}", "w").close()
+                        counts["sidecars"] += 1
+    return counts
+
+
+def library_shape(files: int, seasons: int = 2, episodes: int = 12) -> Dict[str, int]:
+    """按目标视频文件数推算节目数，季数与每季集数固定"""
+    per_show = seasons * episodes
+    return {
+        "shows": max(1, -(-files // per_show)),
+        "seasons": seasons,
+        "episodes": episodes,
+    }
@@ -6,12 +6,17 @@
 """
 
 import logging
+import os
 from logging.handlers import TimedRotatingFileHandler
 from datetime import datetime
 from pathlib import Path
+from typing import Callable, List
 
 
 class DailyFileHandler(TimedRotatingFileHandler):
+    # 新写入日志行的订阅者，参数为 (日志文件名, 格式化后的日志行)
+    _listeners: List[Callable[[str, str], None]] = []
+
     def __init__(
         self,
         log_dir: Path,
@@ -36,6 +41,31 @@ class DailyFileHandler(TimedRotatingFileHandler):
             utc=utc,
         )
 
+    @classmethod
+    def add_listener(cls, listener: Callable[[str, str], None]):
+        if listener not in cls._listeners:
+            cls._listeners.append(listener)
+
+    @classmethod
+    def remove_listener(cls, listener: Callable[[str, str], None]):
+        if listener in cls._listeners:
+            cls._listeners.remove(listener)
+
+    def emit(self, record: logging.LogRecord):
+        super().emit(record)
+        if not self._listeners:
+            return
+        try:
+            line = self.format(record)
+        except Exception:
+            return
+        name = os.path.basename(self.baseFilename)
+        for listener in list(self._listeners):
+            try:
+                listener(name, line)
+            except Exception:
+                pass
+
     def _refresh_filename(self):
         date_str = datetime.now().strftime("%Y%m%d")
         self.baseFilename = str(self.log_dir / f"{self.base_name}_{date_str}.log")
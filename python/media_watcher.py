@@ -0,0 +1,360 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from fs_walker import WalkStats, iter_season_dirs, list_dir
+from record_journal import COMPACT_SUFFIX, RENAME_JOURNAL, ROLLBACK_JOURNAL
+
+WATCH_MODE = os.getenv("WATCH_MODE", "off").lower()
+WATCH_DEBOUNCE = float(os.getenv("WATCH_DEBOUNCE", 15))
+WATCH_POLL_INTERVAL = float(os.getenv("WATCH_POLL_INTERVAL", 60))
+# 自身改动记录的最短保留秒数，覆盖较长的扫描和轮询间隔；记录通常在对应事件到达时即被抵消
+OWN_CHANGE_TTL = 300
+
+# 不投递 inotify 事件的网络/用户态文件系统，auto 模式下改用轮询
+NETWORK_FS_TYPES = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "9p", "fuse.sshfs"}
+# 扫描自身写入的记录文件，忽略其事件避免自触发
+IGNORED_NAMES = {
+    "rename_record.json",
+    "rollback.json",
+    RENAME_JOURNAL,
+    ROLLBACK_JOURNAL,
+    RENAME_JOURNAL + COMPACT_SUFFIX,
+}
+
+
+class _Inotify:
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+
+    WATCH_MASK = (
+        IN_CLOSE_WRITE
+        | IN_MOVED_FROM
+        | IN_MOVED_TO
+        | IN_CREATE
+        | IN_DELETE
+        | IN_DELETE_SELF
+        | IN_MOVE_SELF
+        | IN_ONLYDIR
+    )
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(
+            self.fd, os.fsencode(path), ctypes.c_uint32(self.WATCH_MASK)
+        )
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        return wd
+
+    def read_events(self) -> Iterator[Tuple[int, int, str]]:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+def _network_fs_under(root: Path) -> bool:
+    """root 本身或其下挂载的文件系统中是否存在网络文件系统"""
+    try:
+        root_str = str(root.resolve())
+        with open("/proc/mounts", "r", encoding="utf-8") as f:
+            mounts = [line.split()[1:3] for line in f if line.strip()]
+    except OSError:
+        return False
+    covering = ""
+    covering_type = ""
+    for mount_point, fs_type in mounts:
+        mount_point = mount_point.replace("\\040", " ")
+        if mount_point.startswith(root_str.rstrip("/") + "/"):
+            if fs_type in NETWORK_FS_TYPES:
+                return True
+        elif (root_str + "/").startswith(mount_point.rstrip("/") + "/"):
+            if len(mount_point) >= len(covering):
+                covering, covering_type = mount_point, fs_type
+    return covering_type in NETWORK_FS_TYPES
+
+
+class MediaWatcher:
+    """
+    监听 MEDIA_PATH 下的文件系统变化：同一季目录的事件在防抖窗口内合并，
+    窗口结束后只对受影响的季目录调用 scan_and_rename(sub_path=...)。
+    Linux 下使用 inotify，网络挂载或 inotify 不可用时退化为目录 mtime 轮询。
+    """
+
+    def __init__(
+        self,
+        renamer,
+        on_result: Callable[[Dict], None],
+        mode: str = WATCH_MODE,
+        debounce: float = WATCH_DEBOUNCE,
+        poll_interval: float = WATCH_POLL_INTERVAL,
+    ):
+        self.renamer = renamer
+        self.root = Path(renamer.media_path)
+        self.on_result = on_result
+        self.mode = mode
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.logger = logging.getLogger("MediaWatcher")
+        self._pending: Dict[Path, float] = {}
+        self._full_rescan_due: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inotify: Optional[_Inotify] = None
+        self._watches: Dict[int, Path] = {}
+        self.active_mode: Optional[str] = None
+
+    # ------------------------------------------------------------------ 生命周期
+    def start(self) -> bool:
+        if self.mode == "off":
+            return False
+        mode = self.mode
+        if mode == "auto":
+            mode = "poll" if _network_fs_under(self.root) else "inotify"
+        if mode == "inotify":
+            try:
+                self._inotify = _Inotify()
+                self._watch_tree(self.root)
+            except (OSError, AttributeError) as e:
+                self.logger.warning(
+                    "inotify unavailable (%s), falling back to polling", e
+                )
+                if self._inotify is not None:
+                    self._inotify.close()
+                    self._inotify = None
+                self._watches.clear()
+                mode = "poll"
+        self.active_mode = mode
+        self.renamer.own_changes.enable(
+            max(OWN_CHANGE_TTL, self.debounce + 2 * self.poll_interval)
+        )
+        target = self._run_inotify if mode == "inotify" else self._run_poll
+        self._thread = threading.Thread(target=target, name="media-watcher", daemon=True)
+        self._thread.start()
+        self.logger.info(
+            "Media watcher started (mode: %s, debounce: %ss)", mode, self.debounce
+        )
+        return True
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self.renamer.own_changes.disable()
+
+    # ------------------------------------------------------------------ 事件归并
+    def _season_for(self, path: Path) -> Optional[Path]:
+        p = path
+        while p != self.root and self.root in p.parents:
+            if self.renamer._is_season_name(p.name):
+                return p
+            p = p.parent
+        return None
+
+    def _mark(self, path: Path):
+        season = self._season_for(path)
+        if season is not None:
+            # 每个新事件都把该季目录的截止时间顺延，突发事件合并为一次扫描
+            self._pending[season] = time.monotonic() + self.debounce
+
+    def _next_timeout(self, default: float) -> float:
+        deadlines = list(self._pending.values())
+        if self._full_rescan_due is not None:
+            deadlines.append(self._full_rescan_due)
+        if not deadlines:
+            return default
+        return max(0.0, min(min(deadlines) - time.monotonic(), default))
+
+    def _flush_due(self):
+        now = time.monotonic()
+        if self._full_rescan_due is not None and now >= self._full_rescan_due:
+            self._full_rescan_due = None
+            self._pending.clear()
+            self._run_scan(None)
+            return
+        due = [season for season, deadline in self._pending.items() if deadline <= now]
+        for season in due:
+            del self._pending[season]
+            if season.is_dir():
+                self._run_scan(str(season.relative_to(self.root)))
+
+    def _run_scan(self, sub_path: Optional[str]):
+        self.logger.info("Watcher triggered scan: %s", sub_path or "ALL")
+        try:
+            result = self.renamer.scan_and_rename(sub_path=sub_path)
+            result["scan_type"] = "watch"
+            self.on_result(result)
+        except Exception:
+            self.logger.exception("Watcher scan failed: %s", sub_path or "ALL")
+
+    # ------------------------------------------------------------------ inotify
+    def _watch_tree(self, top: Path):
+        stack: List[Path] = [top]
+        stats = WalkStats()
+        while stack:
+            path = stack.pop()
+            try:
+                wd = self._inotify.add_watch(str(path))
+            except FileNotFoundError:
+                continue
+            self._watches[wd] = path
+            try:
+                entries = list_dir(path, stats)
+            except OSError:
+                continue
+            stack.extend(Path(e.path) for e in entries if e.is_dir(follow_symlinks=False))
+
+    def _run_inotify(self):
+        ino = self._inotify
+        while not self._stop.is_set():
+            ready, _, _ = select.select([ino.fd], [], [], self._next_timeout(1.0))
+            if ready:
+                for wd, mask, name in ino.read_events():
+                    self._handle_event(wd, mask, name)
+            self._flush_due()
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if mask & _Inotify.IN_Q_OVERFLOW:
+            # 事件队列溢出，无法判断哪些目录变化，退化为一次全库（索引增量）扫描
+            self.logger.warning("inotify queue overflow, scheduling library scan")
+            self._full_rescan_due = time.monotonic() + self.debounce
+            return
+        base = self._watches.get(wd)
+        if base is None:
+            return
+        if mask & _Inotify.IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        if name in IGNORED_NAMES:
+            return
+        path = base / name if name else base
+        if name and self.renamer.own_changes.consume(path):
+            # 扫描/回滚自身的重命名、NFO 删除，只忽略这一路径
+            return
+        if mask & _Inotify.IN_ISDIR and mask & (
+            _Inotify.IN_CREATE | _Inotify.IN_MOVED_TO
+        ):
+            try:
+                self._watch_tree(path)
+            except OSError as e:
+                self.logger.warning("Failed to watch new directory %s: %s", path, e)
+            self._mark(path)
+            return
+        self._mark(path if mask & _Inotify.IN_ISDIR else base)
+
+    # ------------------------------------------------------------------ 轮询
+    def _poll_snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        stats = WalkStats()
+        snapshot = {}
+        for _, season in iter_season_dirs(
+            self.root, self.renamer._is_season_name, stats
+        ):
+            try:
+                st = os.stat(season)
+            except OSError:
+                continue
+            snapshot[season] = (st.st_mtime_ns, st.st_ino)
+        return snapshot
+
+    def _own_changes_only(
+        self, season: Path, listings: Dict[Path, Set[str]]
+    ) -> bool:
+        """
+        mtime 变化的季目录重新列目录并与上次的列表比对，增删的文件全部是
+        程序自身的重命名/删除时返回 True。没有上次的列表时无法判断，按外部变化处理。
+        """
+        try:
+            names = {
+                e.name
+                for e in list_dir(season, WalkStats())
+                if e.name not in IGNORED_NAMES
+            }
+        except OSError:
+            listings.pop(season, None)
+            return False
+        previous = listings.get(season)
+        listings[season] = names
+        if previous is None:
+            return False
+        own = self.renamer.own_changes
+        # 自身移走的文件名又出现，说明外部放入了同名新文件
+        if own.gone_names(season) & names & previous:
+            return False
+        changed = (names - previous) | (previous - names)
+        foreign = [name for name in changed if not own.consume(season / name)]
+        return not foreign
+
+    def _run_poll(self):
+        seen: Optional[Dict[Path, Tuple[int, int]]] = None
+        # 发生过变化的季目录的文件名列表，用于区分自身改动
+        listings: Dict[Path, Set[str]] = {}
+        next_poll = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() >= next_poll:
+                try:
+                    current = self._poll_snapshot()
+                except OSError as e:
+                    self.logger.warning("Polling media path failed: %s", e)
+                    current = seen or {}
+                if seen is not None:
+                    for season, state in current.items():
+                        previous = seen.get(season)
+                        if previous == state:
+                            continue
+                        if previous is not None and self._own_changes_only(
+                            season, listings
+                        ):
+                            self.logger.debug("Ignoring own changes: %s", season)
+                            continue
+                        self._mark(season)
+                seen = current
+                next_poll = time.monotonic() + self.poll_interval
+            self._flush_due()
+            self._stop.wait(self._next_timeout(1.0))
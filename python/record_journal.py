@@ -0,0 +1,199 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+RENAME_JOURNAL = "rename_record.jsonl"
+ROLLBACK_JOURNAL = "rollback.jsonl"
+# 旧版整体重写的 JSON 数组文件，首次追加时并入日志后删除
+LEGACY_FILES = {
+    RENAME_JOURNAL: "rename_record.json",
+    ROLLBACK_JOURNAL: "rollback.json",
+}
+COMPACT_SUFFIX = ".tmp"
+# 重命名日志达到该大小才考虑压缩；压缩后大小翻倍时再压缩一次
+COMPACT_MIN_BYTES = 256 * 1024
+# 写入日志的变更记录字段，与 get_season_change_records 的返回一致
+RECORD_FIELDS = (
+    "path",
+    "original",
+    "new",
+    "type",
+    "status",
+    "error",
+    "timestamp",
+    "media_type",
+    "rollback",
+    "scan_id",
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _record_key(record: Dict) -> Tuple:
+    return record.get("path"), record.get("original"), record.get("type")
+
+
+def merge_record(old: Optional[Dict], new: Dict) -> Dict:
+    """
+    与 change_record 的 UPSERT 语义一致：状态未变时只覆盖非空字段，skip 重复写入不做改动，
+    未回滚的成功记录遇到失败尝试时保留，只记下错误信息
+    """
+    if old is None:
+        return new
+    if old.get("status") == "skip" and new.get("status") == "skip":
+        return old
+    if (
+        new.get("status") == "failed"
+        and old.get("status") == "success"
+        and not old.get("rollback")
+    ):
+        kept = dict(old)
+        for field in ("error", "media_type"):
+            if new.get(field) is not None:
+                kept[field] = new.get(field)
+        return kept
+    merged = dict(new)
+    if new.get("status") == old.get("status"):
+        for field in ("new", "error"):
+            if merged.get(field) is None:
+                merged[field] = old.get(field)
+    for field in ("media_type", "scan_id"):
+        if merged.get(field) is None:
+            merged[field] = old.get(field)
+    return merged
+
+
+def iter_journal(path: Path) -> Iterator[Dict]:
+    """逐行读取日志；写入中断留下的残行跳过"""
+    try:
+        f = path.open(encoding="utf-8")
+    except FileNotFoundError:
+        return
+    with f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning("Skipping malformed journal line in %s", path)
+
+
+def read_change_records(season_dir: Path) -> List[Dict]:
+    """按日志重建季目录的变更记录视图，按时间倒序，与旧版 rename_record.json 内容一致"""
+    season_dir = Path(season_dir)
+    records = _legacy_records(season_dir, RENAME_JOURNAL)
+    records.extend(iter_journal(season_dir / RENAME_JOURNAL))
+    view = _fold(records)
+    view.sort(key=lambda r: r.get("timestamp") or "", reverse=True)
+    return view
+
+
+def _fold(records: List[Dict]) -> List[Dict]:
+    latest: Dict[Tuple, Dict] = {}
+    for rec in records:
+        key = _record_key(rec)
+        latest[key] = merge_record(latest.get(key), rec)
+    return list(latest.values())
+
+
+def _legacy_records(season_dir: Path, journal_name: str) -> List[Dict]:
+    legacy_path = season_dir / LEGACY_FILES[journal_name]
+    if not legacy_path.exists():
+        return []
+    try:
+        records = json.loads(legacy_path.read_text(encoding="utf-8"))
+    except Exception:
+        logger.warning("Ignoring unreadable legacy record file %s", legacy_path)
+        return []
+    if journal_name == RENAME_JOURNAL:
+        # 旧文件按时间倒序写入，并入日志时改为正序
+        records.reverse()
+    return records
+
+
+class RecordJournal:
+    """
+    季目录下的追加式 JSON Lines 记录文件，每次只追加本次的变更，
+    重命名日志中被覆盖的旧行累积到一定量后整体压缩。调用方负责持有季目录锁。
+    """
+
+    def __init__(self, compact_min_bytes: int = COMPACT_MIN_BYTES):
+        self._compact_min_bytes = compact_min_bytes
+        # 每个日志下次触发压缩的大小，进程内记忆；首次见到时取当前大小的两倍
+        self._compact_at: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def append_change_records(self, season_dir: Path, records: List[Dict]):
+        if not records:
+            return
+        rows = [{field: rec.get(field) for field in RECORD_FIELDS} for rec in records]
+        for row in rows:
+            row["rollback"] = bool(row["rollback"])
+        path = self._append(Path(season_dir), RENAME_JOURNAL, rows)
+        self._maybe_compact(path)
+
+    def append_rollback_records(self, season_dir: Path, records: List[Dict]):
+        if records:
+            self._append(Path(season_dir), ROLLBACK_JOURNAL, records)
+
+    def compact(self, season_dir: Path) -> int:
+        """
+        把重命名日志重写为 read_change_records 的当前视图（每个记录一行，按时间正序），
+        旧版 rename_record.json 一并并入后删除，返回压缩后的字节数
+        """
+        season_dir = Path(season_dir)
+        path = season_dir / RENAME_JOURNAL
+        view = read_change_records(season_dir)
+        # 稳定排序，同一时间戳的记录保持原有先后，重读后视图不变
+        view.sort(key=lambda r: r.get("timestamp") or "")
+        tmp_path = path.with_name(path.name + COMPACT_SUFFIX)
+        with tmp_path.open("w", encoding="utf-8") as f:
+            f.writelines(self._lines(view))
+        os.replace(tmp_path, path)
+        legacy_path = season_dir / LEGACY_FILES[RENAME_JOURNAL]
+        if legacy_path.exists():
+            legacy_path.unlink()
+        return path.stat().st_size
+
+    def _append(self, season_dir: Path, journal_name: str, rows: List[Dict]) -> Path:
+        path = season_dir / journal_name
+        legacy_path = season_dir / LEGACY_FILES[journal_name]
+        legacy = _legacy_records(season_dir, journal_name)
+        with path.open("a", encoding="utf-8") as f:
+            f.writelines(self._lines(legacy + rows))
+        if legacy_path.exists():
+            legacy_path.unlink()
+        return path
+
+    def _maybe_compact(self, path: Path):
+        size = path.stat().st_size
+        key = str(path)
+        with self._lock:
+            threshold = self._compact_at.setdefault(
+                key, max(self._compact_min_bytes, size * 2)
+            )
+        if size <= threshold:
+            return
+        try:
+            size = self.compact(path.parent)
+        except OSError as e:
+            logger.error("Failed to compact %s: %s", path, e)
+        with self._lock:
+            self._compact_at[key] = max(self._compact_min_bytes, size * 2)
+
+    @staticmethod
+    def _lines(records: List[Dict]) -> Iterator[str]:
+        for rec in records:
+            yield json.dumps(rec, ensure_ascii=False, separators=(",", ":")) + "\n"
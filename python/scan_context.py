@@ -0,0 +1,162 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+from fs_walker import WalkStats
+from scan_jobs import ScanProgress
+from scan_timing import ScanTimings
+
+# 季目录锁分片数，不同季目录哈希冲突时只会多一次排队，不影响正确性
+SEASON_LOCK_STRIPES = 64
+
+
+class ScanContext:
+    """
+    单次扫描的可变状态：目标子路径、遍历统计、分阶段计时、进度以及待写入的变更记录。
+    每次扫描各自持有一个，共享同一个 EmbressRenamer 的并发扫描互不干扰。
+    """
+
+    def __init__(
+        self, sub_path: Optional[str] = None, progress: Optional[ScanProgress] = None
+    ):
+        self.sub_path = sub_path
+        # 实际采用的扫描模式，全库扫描在判断是否到期全量后更新
+        self.full_sweep = False
+        # 本次扫描写入的变更记录与扫描历史共用此 ID，用于整次扫描回滚
+        self.scan_id = uuid.uuid4().hex
+        self.walk_stats = WalkStats()
+        self.timings = ScanTimings()
+        self.progress = progress or ScanProgress()
+        self.progress.walk_stats = self.walk_stats
+        self._pending_records: List[Dict] = []
+        self._seasons_to_update: Set[Path] = set()
+        # 未重命名文件分批暂存入库，扫描结果只保留计数
+        self._pending_unrenamed: List[str] = []
+        self.unrenamed_count = 0
+        # 未匹配/失败文件的解析缓存，由扫描入口按扫描根目录创建
+        self.parse_cache = None
+        self._lock = threading.Lock()
+
+    def queue_records(self, season_dir: Path, records: List[Dict]):
+        with self._lock:
+            self._pending_records.extend(records)
+            self._seasons_to_update.add(season_dir)
+
+    def take_records(
+        self, min_count: int = 1
+    ) -> Optional[Tuple[List[Dict], Set[Path]]]:
+        """待写记录不少于 min_count 时整体取出，否则返回 None"""
+        with self._lock:
+            if not self._pending_records or len(self._pending_records) < min_count:
+                return None
+            taken = (self._pending_records, self._seasons_to_update)
+            self._pending_records = []
+            self._seasons_to_update = set()
+        return taken
+
+    def queue_unrenamed(self, paths: List[str]):
+        with self._lock:
+            self._pending_unrenamed.extend(paths)
+            self.unrenamed_count += len(paths)
+
+    def take_unrenamed(self, min_count: int = 1) -> Optional[List[str]]:
+        with self._lock:
+            if not self._pending_unrenamed or len(self._pending_unrenamed) < min_count:
+                return None
+            taken = self._pending_unrenamed
+            self._pending_unrenamed = []
+        return taken
+
+
+class SeasonLocks:
+    """
+    按季目录分片的锁：同一季目录上的扫描、回滚串行执行，
+    不同节目的季目录落在不同分片上可以并发。可重入，同一线程可重复获取。
+    """
+
+    def __init__(self, stripes: int = SEASON_LOCK_STRIPES):
+        self._locks = [threading.RLock() for _ in range(stripes)]
+
+    @staticmethod
+    def key(season_dir: Union[str, Path]) -> str:
+        return os.path.abspath(str(season_dir))
+
+    def lock_for(self, season_dir: Union[str, Path]) -> threading.RLock:
+        digest = zlib.crc32(self.key(season_dir).encode("utf-8", "surrogateescape"))
+        return self._locks[digest % len(self._locks)]
+
+
+class OwnChanges:
+    """
+    程序自身造成的文件变化：重命名的源/目标路径和删除的文件路径。
+    监听模式下每条记录抵消一次对应路径的事件，只忽略这些路径，其余变化照常触发扫描；
+    未被抵消的记录 ttl 秒后丢弃。监听未启用（ttl 为 None）时不记录。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # 路径 -> (是否为移走/删除的路径, 过期时间)，按登记顺序即过期顺序排列
+        self._paths: "OrderedDict[str, Tuple[bool, float]]" = OrderedDict()
+        self.ttl: Optional[float] = None
+
+    def enable(self, ttl: float):
+        self.ttl = ttl
+
+    def disable(self):
+        self.ttl = None
+        with self._lock:
+            self._paths.clear()
+
+    def moved(self, src: Path, dst: Path):
+        self._record(src, gone=True)
+        self._record(dst, gone=False)
+
+    def removed(self, path: Path):
+        self._record(path, gone=True)
+
+    def consume(self, path: Union[str, Path]) -> bool:
+        """path 上的事件是否来自自身改动；是则抵消该记录"""
+        with self._lock:
+            self._prune(time.monotonic())
+            return self._paths.pop(SeasonLocks.key(path), None) is not None
+
+    def gone_names(self, season_dir: Path) -> Set[str]:
+        """季目录下已被自身移走/删除、尚未被事件抵消的文件名"""
+        prefix = SeasonLocks.key(season_dir) + os.sep
+        with self._lock:
+            self._prune(time.monotonic())
+            return {
+                key[len(prefix) :]
+                for key, (gone, _) in self._paths.items()
+                if gone and key.startswith(prefix) and os.sep not in key[len(prefix) :]
+            }
+
+    def _record(self, path: Path, gone: bool):
+        ttl = self.ttl
+        if ttl is None:
+            return
+        key = SeasonLocks.key(path)
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            self._paths.pop(key, None)
+            self._paths[key] = (gone, now + ttl)
+
+    def _prune(self, now: float):
+        while self._paths:
+            key, (_, expires) = next(iter(self._paths.items()))
+            if expires > now:
+                return
+            del self._paths[key]
@@ -0,0 +1,281 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = {JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED}
+
+# 内存中保留的已结束任务数，结果本身已写入 scan_history
+JOB_HISTORY_LIMIT = 50
+# 同时执行的任务数；同一季目录上的操作由季目录锁串行化，不同节目可并发
+JOB_WORKERS = 4
+# 随媒体库规模增长的结果明细，任务列表和事件推送中只保留计数，明细按历史记录分页拉取
+RESULT_DETAIL_FIELDS = ("unrenamed_files",)
+
+
+def result_summary(result: Optional[Dict]) -> Optional[Dict]:
+    if result is None:
+        return None
+    summary = {k: v for k, v in result.items() if k not in RESULT_DETAIL_FIELDS}
+    if "unrenamed_files" in result:
+        summary.setdefault("unrenamed_count", len(result["unrenamed_files"]))
+    return summary
+
+
+class ScanProgress:
+    """
+    单次扫描的进度计数，线程安全。cancel() 之后扫描不再派发新的季目录，
+    已在处理的季目录完成后返回 status=cancelled 的结果。
+    """
+
+    def __init__(
+        self,
+        listener: Optional[Callable[[], None]] = None,
+        notify_interval: float = 0.5,
+    ):
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._started = time.monotonic()
+        self._listener = listener
+        self._notify_interval = notify_interval
+        self._notified = 0.0
+        self.seasons_total: Optional[int] = None
+        self.seasons_done = 0
+        self.files_parsed = 0
+        self.renames_done = 0
+        self.walk_stats = None
+
+    def set_total(self, seasons_total: Optional[int]):
+        with self._lock:
+            self.seasons_total = seasons_total or None
+
+    def add(self, seasons: int = 0, files: int = 0, renames: int = 0):
+        now = time.monotonic()
+        with self._lock:
+            self.seasons_done += seasons
+            self.files_parsed += files
+            self.renames_done += renames
+            # 进度回调限频，避免每个季目录都推送一次
+            due = self._listener and now - self._notified >= self._notify_interval
+            if due:
+                self._notified = now
+        if due:
+            self._listener()
+
+    def mirror(self, other: "ScanProgress"):
+        """复制另一次扫描的进度（附加到正在进行的全库扫描时使用），并通知监听方"""
+        with other._lock:
+            snapshot = (
+                other.seasons_total,
+                other.seasons_done,
+                other.files_parsed,
+                other.renames_done,
+                other._started,
+            )
+        with self._lock:
+            (
+                self.seasons_total,
+                self.seasons_done,
+                self.files_parsed,
+                self.renames_done,
+                self._started,
+            ) = snapshot
+            self.walk_stats = other.walk_stats
+        if self._listener:
+            self._listener()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def eta_seconds(self) -> Optional[int]:
+        """按已完成季目录的平均耗时估算剩余时间，总数来自上次扫描的目录索引"""
+        with self._lock:
+            total, done = self.seasons_total, self.seasons_done
+        if not total or not done:
+            return None
+        elapsed = time.monotonic() - self._started
+        return max(0, round(elapsed / done * (total - done)))
+
+    def as_dict(self) -> Dict:
+        walked = self.walk_stats.as_dict()["scandir"] if self.walk_stats else 0
+        with self._lock:
+            data = {
+                "dirs_walked": walked,
+                "seasons_done": self.seasons_done,
+                "seasons_total": self.seasons_total,
+                "files_parsed": self.files_parsed,
+                "renames_done": self.renames_done,
+                "elapsed_seconds": round(time.monotonic() - self._started, 1),
+            }
+        data["eta_seconds"] = self.eta_seconds()
+        return data
+
+
+class ScanJob:
+    def __init__(
+        self,
+        kind: str,
+        target: str,
+        params: Dict,
+        on_update: Optional[Callable[["ScanJob"], None]] = None,
+    ):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.target = target
+        self.params = params
+        self.status = JOB_QUEUED
+        self.progress = ScanProgress(
+            (lambda: on_update(self)) if on_update is not None else None
+        )
+        self.result: Optional[Dict] = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at: Optional[str] = None
+        self.finished_at: Optional[str] = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "target": self.target,
+            "status": self.status,
+            "progress": self.progress.as_dict(),
+            "result": result_summary(self.result),
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ScanJobManager:
+    """
+    后台扫描任务：接口提交后立即返回任务 ID，任务在工作线程池中执行；
+    同一 (kind, target, 参数) 已有未结束的任务时直接返回该任务，不重复排队。
+    run(job) 负责实际扫描，on_finish(job) 负责持久化结果，
+    on_update(job) 在状态变化和进度推进时回调（用于事件推送）。
+    """
+
+    def __init__(
+        self,
+        run: Callable[[ScanJob], Dict],
+        on_finish: Callable[[ScanJob], None],
+        on_update: Optional[Callable[[ScanJob], None]] = None,
+    ):
+        self._run = run
+        self._on_finish = on_finish
+        self._on_update = on_update
+        self._executor = ThreadPoolExecutor(
+            max_workers=JOB_WORKERS, thread_name_prefix="scan-job"
+        )
+        self._jobs: "OrderedDict[str, ScanJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger("ScanJobManager")
+
+    def submit(self, kind: str, target: str, **params) -> ScanJob:
+        with self._lock:
+            for existing in self._jobs.values():
+                if (
+                    existing.kind == kind
+                    and existing.target == target
+                    and existing.params == params
+                    and existing.status not in FINISHED_STATES
+                    and not existing.progress.cancelled
+                ):
+                    self.logger.info(
+                        "Scan job %s already pending for %s, attaching", existing.id, target
+                    )
+                    return existing
+            job = ScanJob(kind, target, params, self._notify)
+            self._jobs[job.id] = job
+        self._executor.submit(self._execute, job)
+        self.logger.info("Scan job queued: %s (%s %s)", job.id, kind, target)
+        self._notify(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[ScanJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return [job.as_dict() for job in reversed(jobs)]
+
+    def cancel(self, job_id: str) -> Optional[ScanJob]:
+        job = self.get(job_id)
+        if job is not None and job.status not in FINISHED_STATES:
+            job.progress.cancel()
+            self.logger.info("Scan job cancel requested: %s", job_id)
+            self._notify(job)
+        return job
+
+    def _notify(self, job: ScanJob):
+        if self._on_update is None:
+            return
+        try:
+            self._on_update(job)
+        except Exception:
+            self.logger.exception("Scan job update callback failed: %s", job.id)
+
+    def _execute(self, job: ScanJob):
+        if job.progress.cancelled:
+            job.status = JOB_CANCELLED
+            job.finished_at = datetime.now().isoformat()
+            self._notify(job)
+            return
+        job.status = JOB_RUNNING
+        job.started_at = datetime.now().isoformat()
+        self._notify(job)
+        try:
+            job.result = self._run(job)
+            status = job.result.get("status")
+            if status == "cancelled":
+                job.status = JOB_CANCELLED
+            elif status in ("error", "busy"):
+                job.status = JOB_FAILED
+            else:
+                job.status = JOB_COMPLETED
+        except Exception as exc:
+            self.logger.exception("Scan job failed: %s", job.id)
+            job.result = {
+                "status": "error",
+                "message": str(exc),
+                "timestamp": datetime.now().isoformat(),
+            }
+            job.status = JOB_FAILED
+        job.finished_at = datetime.now().isoformat()
+        try:
+            self._on_finish(job)
+        except Exception:
+            self.logger.exception("Failed to record scan job result: %s", job.id)
+        self._notify(job)
+        self._trim()
+
+    def _trim(self):
+        with self._lock:
+            finished = [
+                job_id
+                for job_id, job in self._jobs.items()
+                if job.status in FINISHED_STATES
+            ]
+            for job_id in finished[: max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+                del self._jobs[job_id]
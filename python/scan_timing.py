@@ -0,0 +1,99 @@
+"""
+/**
+ * @author: Meidlinger
+ * @date: 2026-10-17
+ */
+"""
+
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+PHASE_WALK = "walk"
+PHASE_PARSE = "parse"
+PHASE_RENAME = "rename"
+PHASE_DB_FLUSH = "db_flush"
+PHASES = (PHASE_WALK, PHASE_PARSE, PHASE_RENAME, PHASE_DB_FLUSH)
+
+# 单个季目录处理耗时直方图的桶上界（秒），最后一个桶收纳更慢的目录
+SEASON_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# 扫描结果中保留的最慢季目录数
+SLOWEST_SEASONS = 10
+
+
+class ScanTimings:
+    """
+    单次扫描的分阶段计时，线程安全，全部使用单调时钟。
+    各阶段耗时是所有工作线程的累计值，并发扫描时总和可能大于扫描总耗时。
+    """
+
+    def __init__(self, slowest: int = SLOWEST_SEASONS):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._phases: Dict[str, float] = {name: 0.0 for name in PHASES}
+        self._buckets: List[int] = [0] * (len(SEASON_LATENCY_BUCKETS) + 1)
+        self._slowest: List[Tuple[float, str]] = []
+        self._slowest_limit = slowest
+
+    def add(self, phase: str, seconds: float):
+        with self._lock:
+            self._phases[phase] = self._phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, phase: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(phase, time.monotonic() - started)
+
+    def timed_iter(self, items: Iterator, phase: str) -> Iterator:
+        """把生成器每次 next() 的耗时计入 phase，用于懒遍历目录树"""
+        items = iter(items)
+        while True:
+            started = time.monotonic()
+            try:
+                item = next(items)
+            except StopIteration:
+                self.add(phase, time.monotonic() - started)
+                return
+            self.add(phase, time.monotonic() - started)
+            yield item
+
+    def season(self, season_dir: str, seconds: float):
+        """记录一个实际处理（未被索引跳过）的季目录耗时"""
+        index = len(SEASON_LATENCY_BUCKETS)
+        for i, bound in enumerate(SEASON_LATENCY_BUCKETS):
+            if seconds <= bound:
+                index = i
+                break
+        with self._lock:
+            self._buckets[index] += 1
+            item = (seconds, season_dir)
+            if len(self._slowest) < self._slowest_limit:
+                heapq.heappush(self._slowest, item)
+            elif item > self._slowest[0]:
+                heapq.heapreplace(self._slowest, item)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            phases = {name: round(value, 3) for name, value in self._phases.items()}
+            counts = list(self._buckets)
+            slowest = sorted(self._slowest, reverse=True)
+        return {
+            "phases": phases,
+            "season_latency": {
+                "buckets": list(SEASON_LATENCY_BUCKETS),
+                "counts": counts,
+            },
+            "slowest_seasons": [
+                {"path": path, "seconds": round(seconds, 3)}
+                for seconds, path in slowest
+            ],
+        }
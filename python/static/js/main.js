@@ -23,6 +23,12 @@ new Vue({
     scanIntervalError: "",
     // 扫描相关
     scanLoading: false,
+    scanJob: null,
+    // 服务端推送（SSE）
+    eventSource: null,
+    jobWaiters: {},
+    finishedJobs: {},
+    logTailAppended: 0,
 
     // 历史记录
     history: [],
@@ -60,6 +66,12 @@ new Vue({
     subScanLoading: false,
     showUnrenamedModal: false,
     unrenamedFiles: [],
+    // 未重命名文件按扫描历史分页懒加载
+    unrenamedHistoryId: null,
+    unrenamedTotal: 0,
+    unrenamedPage: 0,
+    unrenamedPageSize: 100,
+    unrenamedLoading: false,
     addToWhitelistLoading: false,
 
     renameLoading: false,
@@ -105,6 +117,13 @@ new Vue({
     this.autoAuthenticate();
   },
   computed: {
+    // 未重命名文件是否还有未加载的分页
+    unrenamedHasMore() {
+      return (
+        !!this.unrenamedHistoryId &&
+        this.unrenamedPage * this.unrenamedPageSize < this.unrenamedTotal
+      );
+    },
     // 按类型统计记录数量
     recordTypeStats() {
       const stats = {};
@@ -393,6 +412,60 @@ new Vue({
       this.loadHistory();
       this.loadChangeRecords();
       this.loadLogFiles();
+      this.connectEvents();
+    },
+
+    // 订阅服务端事件：扫描任务进度、定时/监听扫描结果、新写入的日志行
+    connectEvents() {
+      if (this.eventSource || typeof EventSource === "undefined") return;
+      const accessKey = localStorage.getItem("access_key") || "";
+      const source = new EventSource(
+        "/api/events?access_key=" + encodeURIComponent(accessKey)
+      );
+      source.addEventListener("job", (evt) => this.onJobEvent(JSON.parse(evt.data)));
+      source.addEventListener("scan", () => {
+        this.loadSystemStatus();
+        this.loadHistory();
+      });
+      source.addEventListener("log", (evt) => this.onLogEvent(JSON.parse(evt.data)));
+      // 断线重连期间可能错过任务结束事件，重连后补查一次等待中的任务
+      source.addEventListener("open", () => {
+        Object.keys(this.jobWaiters).forEach((jobId) => this.refreshJob(jobId));
+      });
+      this.eventSource = source;
+    },
+    isJobFinished(job) {
+      return ["completed", "failed", "cancelled"].includes(job.status);
+    },
+    onJobEvent(job) {
+      if (this.scanJob && this.scanJob.id === job.id) {
+        this.scanJob = job;
+      }
+      if (!this.isJobFinished(job)) return;
+      const resolve = this.jobWaiters[job.id];
+      if (resolve) {
+        delete this.jobWaiters[job.id];
+        resolve(job);
+      } else {
+        this.finishedJobs[job.id] = job;
+      }
+    },
+    async refreshJob(jobId) {
+      try {
+        const data = await this.auth_fetch("/api/jobs/" + jobId);
+        this.onJobEvent(data.job);
+      } catch (error) {
+        console.error("刷新任务状态失败:", error);
+      }
+    },
+    onLogEvent(evt) {
+      if (this.selectedLogFile !== evt.file || this.logContentLoading) return;
+      this.logContent += evt.line + "\n";
+      // 与 /api/logs/<filename> 一致只保留最近 1000 行，按批裁剪
+      if (++this.logTailAppended >= 200) {
+        this.logTailAppended = 0;
+        this.logContent = this.logContent.split("\n").slice(-1001).join("\n");
+      }
     },
 
     // 系统状态相关方法
@@ -526,6 +599,104 @@ new Vue({
         }
       }
     },
+    // 等待后台扫描任务结束：进度由 SSE 推送更新 scanJob，不支持 EventSource 时退回轮询
+    async waitForJob(jobId) {
+      if (this.eventSource) {
+        const finished = this.finishedJobs[jobId];
+        if (finished) {
+          delete this.finishedJobs[jobId];
+          return finished;
+        }
+        return new Promise((resolve) => {
+          this.jobWaiters[jobId] = resolve;
+        });
+      }
+      while (true) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const data = await this.auth_fetch("/api/jobs/" + jobId);
+        this.scanJob = data.job;
+        if (this.isJobFinished(data.job)) {
+          return data.job;
+        }
+      }
+    },
+    handleScanJobResult(job, successMessage, successTitle = "扫描成功") {
+      this.scanJob = null;
+      if (job.result) {
+        this.lastScanResult = job.result;
+      }
+      this.loadHistory();
+      this.loadChangeRecords();
+      this.loadSystemStatus();
+      if (job.status === "completed") {
+        this.showSuccess(successMessage, successTitle);
+      } else if (job.status === "cancelled") {
+        this.showModalComponent(
+          "warning",
+          "扫描已取消",
+          "已处理的季目录结果已保存。",
+          "bi-exclamation-triangle"
+        );
+      } else {
+        this.showModalComponent(
+          "error",
+          "扫描失败",
+          (job.result && job.result.message) || "未知错误",
+          "bi-x-circle"
+        );
+      }
+    },
+    async cancelScanJob() {
+      if (!this.scanJob) return;
+      try {
+        await this.auth_fetch("/api/jobs/" + this.scanJob.id + "/cancel", {
+          method: "POST",
+        });
+      } catch (error) {
+        this.showModalComponent(
+          "error",
+          "请求失败",
+          "取消扫描失败: 网络错误",
+          "bi-x-circle"
+        );
+      }
+    },
+    formatEta(seconds) {
+      if (seconds === null || seconds === undefined) return "--";
+      if (seconds < 60) return seconds + "秒";
+      const minutes = Math.floor(seconds / 60);
+      if (minutes < 60) return minutes + "分" + (seconds % 60) + "秒";
+      return Math.floor(minutes / 60) + "小时" + (minutes % 60) + "分";
+    },
+    formatDuration(seconds) {
+      if (seconds === null || seconds === undefined) return "--";
+      if (seconds < 1) return Math.round(seconds * 1000) + "毫秒";
+      if (seconds < 60) return seconds.toFixed(1) + "秒";
+      return this.formatEta(Math.round(seconds));
+    },
+    phaseLabel(name) {
+      const labels = {
+        walk: "遍历目录",
+        parse: "解析文件名",
+        rename: "重命名",
+        db_flush: "写入数据库",
+      };
+      return labels[name] || name;
+    },
+    // 季目录耗时直方图，只返回非空的桶
+    latencyBuckets(timings) {
+      const latency = timings && timings.season_latency;
+      if (!latency) return [];
+      return latency.counts
+        .map((count, i) => ({
+          label:
+            i < latency.buckets.length
+              ? "≤" + this.formatDuration(latency.buckets[i])
+              : ">" + this.formatDuration(latency.buckets[i - 1]),
+          count: count,
+        }))
+        .filter((bucket) => bucket.count > 0);
+    },
     // 手动扫描
     async performManualScan() {
       this.scanLoading = true;
@@ -536,12 +707,9 @@ new Vue({
         });
 
         if (data.success) {
-          this.lastScanResult = data.result;
-          // 刷新其他数据
-          this.loadHistory();
-          this.loadChangeRecords();
-          this.loadSystemStatus();
-          this.showSuccess("文件扫描已完成，结果已更新。", "扫描成功");
+          this.scanJob = data.job;
+          const job = await this.waitForJob(data.job_id);
+          this.handleScanJobResult(job, "文件扫描已完成，结果已更新。");
         } else {
           this.showModalComponent(
             "error",
@@ -572,6 +740,7 @@ new Vue({
         }
       } finally {
         this.scanLoading = false;
+        this.scanJob = null;
       }
     },
 
@@ -821,6 +990,7 @@ new Vue({
           this.logContent = "";
         } else {
           this.logContent = data.content;
+          this.logTailAppended = 0;
           this.logContentError = "";
         }
       } catch (error) {
@@ -881,14 +1051,12 @@ new Vue({
           body: JSON.stringify({ sub_path: this.subPath.trim() }),
         });
         if (data.success) {
-          this.lastScanResult = data.result;
-          // 刷新相关面板
-          this.loadHistory();
-          this.loadChangeRecords();
-          this.loadSystemStatus();
-          // 自动关闭
+          // 任务已提交，进度在操作面板显示
           this.closeSubPathModal();
-          this.showSuccess("指定路径的扫描操作已完成。", "扫描成功");
+          this.scanLoading = true;
+          this.scanJob = data.job;
+          const job = await this.waitForJob(data.job_id);
+          this.handleScanJobResult(job, "指定路径的扫描操作已完成。");
         } else {
           this.showModalComponent(
             "error",
@@ -919,6 +1087,8 @@ new Vue({
         }
       } finally {
         this.subScanLoading = false;
+        this.scanLoading = false;
+        this.scanJob = null;
       }
     },
     async performSubRollBack() {
@@ -926,7 +1096,7 @@ new Vue({
         this.showModalComponent(
           "warning",
           "警告",
-          "请输入Season路径",
+          "请输入回滚路径",
           "bi-exclamation-triangle"
         );
         return;
@@ -937,7 +1107,14 @@ new Vue({
           method: "POST",
           body: JSON.stringify({ sub_path: this.subPath.trim() }),
         });
-        if (data.success) {
+        if (data.success && data.job_id) {
+          // 节目/媒体类型目录的回滚作为后台任务执行，进度在操作面板显示
+          this.closeSubPathRollbackModal();
+          this.scanLoading = true;
+          this.scanJob = data.job;
+          const job = await this.waitForJob(data.job_id);
+          this.handleScanJobResult(job, "指定路径的回滚操作已完成。", "回滚成功");
+        } else if (data.success) {
           this.lastScanResult = data.result;
           // 刷新相关面板
           this.loadHistory();
@@ -975,12 +1152,115 @@ new Vue({
         }
       } finally {
         this.subScanLoading = false;
+        this.scanLoading = false;
+        this.scanJob = null;
+      }
+    },
+    // 回滚某次扫描产生的全部重命名
+    confirmRollbackScanRun(record) {
+      this.showModalComponent(
+        "warning",
+        "回滚本次扫描",
+        "将撤销该次扫描重命名的 " +
+          record.renamed +
+          " 个视频及其关联文件，是否继续？",
+        "bi-arrow-counterclockwise",
+        true,
+        () => this.rollbackScanRun(record.scan_id)
+      );
+    },
+    async rollbackScanRun(scanId) {
+      this.scanLoading = true;
+      try {
+        const data = await this.auth_fetch(
+          "/api/scans/" + encodeURIComponent(scanId) + "/rollback",
+          { method: "POST" }
+        );
+        this.scanJob = data.job;
+        const job = await this.waitForJob(data.job_id);
+        this.handleScanJobResult(job, "该次扫描的重命名已全部回滚。", "回滚成功");
+      } catch (error) {
+        if (error.status === 401) {
+          this.isAuthenticated = false;
+          localStorage.removeItem("access_key");
+          this.authError = "未授权或密钥无效";
+          this.showModalComponent(
+            "error",
+            "认证失败",
+            "Access Key 无效或已过期，请重新登录。",
+            "bi-lock"
+          );
+        } else if (error.status === 404) {
+          this.showModalComponent(
+            "warning",
+            "无需回滚",
+            "该次扫描没有可回滚的重命名",
+            "bi-exclamation-triangle"
+          );
+        } else {
+          this.showModalComponent(
+            "error",
+            "请求失败",
+            "请求失败: 网络错误",
+            "bi-x-circle"
+          );
+        }
+      } finally {
+        this.scanLoading = false;
+        this.scanJob = null;
       }
     },
-    showUnrenamedFiles(files) {
-      this.unrenamedFiles = files || [];
+    showUnrenamedFiles(record) {
+      this.unrenamedFiles = [];
+      this.unrenamedPage = 0;
+      // 历史记录带 id，扫描任务结果写入历史后带 history_id
+      this.unrenamedHistoryId = record.id || record.history_id || null;
+      if (!this.unrenamedHistoryId) {
+        this.unrenamedFiles = record.unrenamed_files || [];
+        this.unrenamedTotal = this.unrenamedFiles.length;
+      } else {
+        this.unrenamedTotal = record.unrenamed_count || 0;
+        this.loadMoreUnrenamed();
+      }
       this.showUnrenamedModal = true;
     },
+    async loadMoreUnrenamed() {
+      if (!this.unrenamedHistoryId || this.unrenamedLoading) return;
+      this.unrenamedLoading = true;
+      try {
+        const data = await this.auth_fetch(
+          "/api/history/" +
+            this.unrenamedHistoryId +
+            "/unrenamed?page=" +
+            (this.unrenamedPage + 1)
+        );
+        this.unrenamedFiles = this.unrenamedFiles.concat(data.files || []);
+        this.unrenamedTotal = data.total;
+        this.unrenamedPage = data.page;
+        this.unrenamedPageSize = data.page_size;
+      } catch (error) {
+        if (error.status === 401) {
+          this.isAuthenticated = false;
+          localStorage.removeItem("access_key");
+          this.authError = "未授权或密钥无效";
+          this.showModalComponent(
+            "error",
+            "认证失败",
+            "Access Key 无效或已过期，请重新登录。",
+            "bi-lock"
+          );
+        } else {
+          this.showModalComponent(
+            "error",
+            "请求失败",
+            "请求失败: 网络错误",
+            "bi-x-circle"
+          );
+        }
+      } finally {
+        this.unrenamedLoading = false;
+      }
+    },
 
     // 关闭未重命名文件弹窗
     closeUnrenamedModal() {
@@ -1074,9 +1354,13 @@ new Vue({
             (file) => file.path !== filePath
           );
 
-          // 如果列表为空，关闭弹窗
+          // 如果列表为空，还有未加载的分页时继续加载，否则关闭弹窗
           if (this.unrenamedFiles.length === 0) {
-            this.closeUnrenamedModal();
+            if (this.unrenamedHasMore) {
+              this.loadMoreUnrenamed();
+            } else {
+              this.closeUnrenamedModal();
+            }
           }
 
           // 刷新数据
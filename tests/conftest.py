@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+PYTHON_DIR = Path(__file__).resolve().parent.parent / "python"
+CONF_DIR = Path(__file__).resolve().parent.parent / "conf"
+
+# 模块在导入时读取这些环境变量，需在导入前指向临时目录和仓库内的配置
+_workdir = tempfile.mkdtemp(prefix="embress-tests-")
+os.environ.setdefault("CONFIG_DB_PATH", os.path.join(_workdir, "config.db"))
+os.environ.setdefault("MEDIA_PATH", os.path.join(_workdir, "media"))
+os.environ.setdefault("LOG_PATH", os.path.join(_workdir, "logs"))
+os.environ.setdefault("DEFAULT_REGEX_PATH", str(CONF_DIR / "regex_pattern.json"))
+sys.path.insert(0, str(PYTHON_DIR))
+
+
+@pytest.fixture
+def config_db(tmp_path):
+    """让 ConfigDB 单例改连一个空的临时库，用完关闭连接"""
+    import database
+
+    database.config_db.close()
+    database.CONFIG_DB_PATH = str(tmp_path / "config.db")
+    database.ConfigDB._initialized = False
+    yield database.config_db
+    database.config_db.close()
+
+
+@pytest.fixture
+def library(tmp_path, config_db, monkeypatch):
+    """在临时目录生成一个小媒体库，返回 (EmbressRenamer, 媒体库根目录)"""
+    import embress_renamer
+    from library_generator import generate_library
+
+    root = tmp_path / "media"
+    generate_library(root, shows=4, seasons=2, episodes=5, seed=3)
+    # 刚生成的目录 mtime 还在稳定窗口内，测试中不等待直接写索引
+    monkeypatch.setattr(embress_renamer, "INDEX_SETTLE_SECONDS", -1)
+    embress_renamer.RegexLoader.force_reload()
+    embress_renamer.WhitelistLoader.force_reload()
+    return embress_renamer.EmbressRenamer(str(root)), root
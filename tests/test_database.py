@@ -0,0 +1,140 @@
+import sqlite3
+
+import database
+from metrics import DB_OPERATION_SECONDS
+
+LEGACY_CHANGE_RECORD = """
+CREATE TABLE change_record (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    path TEXT NOT NULL,
+    original TEXT NOT NULL,
+    new TEXT,
+    type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    timestamp TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    media_type TEXT,
+    show_name TEXT,
+    season_name TEXT,
+    rollback INTEGER DEFAULT 0,
+    season_dir TEXT NOT NULL
+);
+"""
+
+
+def _legacy_db(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_CHANGE_RECORD)
+    conn.executemany(
+        "INSERT INTO change_record (path, original, new, type, status, timestamp, "
+        "season_dir) VALUES (?, ?, ?, 'rename', ?, ?, '/m/S1');",
+        rows,
+    )
+    conn.commit()
+    conn.close()
+
+
+def test_key_migration_keeps_latest_success_over_later_failures(config_db):
+    _legacy_db(
+        database.CONFIG_DB_PATH,
+        [
+            ("/m/S1/a.mkv", "a0.mkv", "a.mkv", "success", "1"),
+            ("/m/S1/a.mkv", "a0.mkv", "a.mkv", "success", "2"),
+            ("/m/S1/a.mkv", "a0.mkv", None, "failed", "3"),
+            ("/m/S1/a.mkv", "a0.mkv", None, "skip", "4"),
+            ("/m/S1/b.mkv", "b0.mkv", None, "failed", "1"),
+            ("/m/S1/b.mkv", "b0.mkv", None, "skip", "2"),
+        ],
+    )
+    records = {r["path"]: r for r in config_db.get_season_change_records("/m/S1")}
+    assert len(records) == 2
+    assert records["/m/S1/a.mkv"]["status"] == "success"
+    assert records["/m/S1/a.mkv"]["timestamp"] == "2"
+    assert records["/m/S1/b.mkv"]["status"] == "skip"
+
+
+def _change(status, timestamp, scan_id, new=None, error=None, rollback=False):
+    return {
+        "path": "/m/S1/a.mkv",
+        "original": "a0.mkv",
+        "new": new,
+        "type": "rename",
+        "status": status,
+        "error": error,
+        "timestamp": timestamp,
+        "rollback": rollback,
+        "season_dir": "/m/S1",
+        "scan_id": scan_id,
+    }
+
+
+def test_later_failure_does_not_overwrite_success(config_db):
+    config_db.add_change_records([_change("success", "1", "s1", new="a.mkv")])
+    config_db.add_change_records([_change("failed", "2", "s2", error="busy")])
+
+    (record,) = config_db.get_season_change_records("/m/S1")
+    assert (record["status"], record["new"], record["timestamp"]) == (
+        "success",
+        "a.mkv",
+        "1",
+    )
+    assert record["scan_id"] == "s1"
+    assert record["error"] == "busy"
+    assert config_db.get_scan_season_dirs("s1") == ["/m/S1"]
+    assert list(config_db.iter_processed_paths("/m")) == ["/m/S1/a.mkv"]
+
+    # 已回滚的成功记录不再受保护，新的失败照常记录
+    config_db.add_change_records([_change("success", "3", "s1", rollback=True)])
+    config_db.add_change_records([_change("failed", "4", "s3", error="gone")])
+    (record,) = config_db.get_season_change_records("/m/S1")
+    assert (record["status"], record["scan_id"]) == ("failed", "s3")
+
+
+def _observations(operation):
+    row = DB_OPERATION_SECONDS._values.get((operation,))
+    return sum(row[:-1]) if row else 0
+
+
+def test_read_paths_are_timed(config_db):
+    config_db.add_scan_history({"status": "completed", "timestamp": "1"})
+    before = {
+        op: _observations(op)
+        for op in ("get_season_index", "get_unrenamed_files", "iter_processed_paths")
+    }
+    config_db.get_season_index()
+    config_db.get_unrenamed_files(1)
+    assert list(config_db.iter_processed_paths("/m")) == []
+    for op, count in before.items():
+        assert _observations(op) == count + 1, op
+
+
+def _reopen(config_db):
+    config_db.close()
+    database.ConfigDB._initialized = False
+
+
+def _legacy_unrenamed(conn, history_id, path):
+    conn.execute(
+        "UPDATE scan_history SET data = ? WHERE id = ?;",
+        (f'{{"unrenamed_files": [{{"path": "{path}"}}]}}', history_id),
+    )
+    conn.commit()
+
+
+def test_unrenamed_migration_runs_once(config_db):
+    history_id = config_db.add_scan_history({"status": "completed", "timestamp": "1"})
+    conn = sqlite3.connect(database.CONFIG_DB_PATH)
+    conn.execute(
+        "DELETE FROM config_meta WHERE key = ?;", (database.UNRENAMED_MIGRATED_META,)
+    )
+    _legacy_unrenamed(conn, history_id, "/m/S1/x.mkv")
+
+    _reopen(config_db)
+    assert config_db.get_unrenamed_files(history_id) == ([{"path": "/m/S1/x.mkv"}], 1)
+    assert config_db.get_meta(database.UNRENAMED_MIGRATED_META) == "1"
+
+    # 已迁移过的库再次启动时不再扫描 scan_history
+    _legacy_unrenamed(conn, history_id, "/m/S1/y.mkv")
+    _reopen(config_db)
+    assert config_db.get_unrenamed_files(history_id) == ([{"path": "/m/S1/x.mkv"}], 1)
+    conn.close()
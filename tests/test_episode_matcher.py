@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+import database
+from database import load_regex_from_file
+from episode_matcher import PATTERN_TYPES, EpisodeMatcher
+from library_generator import release_names
+
+# re.I 下 i/s 还能匹配 ı (U+0131) 与 ſ (U+017F)，预筛选不能因此漏掉候选模式
+CASE_FOLD_NAMES = [
+    "Frieren Epıſode 05 [1080p].mkv",
+    "Frieren ſ01E02 1080p.mkv",
+    "Frieren [ſ01E03].mkv",
+    "Frieren ſeaſon 1 Epiſode 04.mkv",
+    "Frieren ſeaſon 1 Epıſode 06.mkv",
+    "FRIEREN EPISODE 07.mkv",
+    "frieren s01e08.mkv",
+    "Frieren İ S01E09.mkv",
+]
+
+
+def _sequential_match(raw, filename):
+    """旧实现：按优先级逐条 re.search，第一个命中的模式获胜"""
+    for p_type in PATTERN_TYPES:
+        for pat in raw.get(p_type, []):
+            if m := re.search(pat, filename, re.I):
+                return p_type, m.span(), m.groups()
+    return None
+
+
+def _engine_match(matcher, filename):
+    hit = matcher.match(filename)
+    return (hit[0], hit[1].span(), hit[1].groups()) if hit else None
+
+
+def _matcher(raw):
+    return EpisodeMatcher(
+        {t: [re.compile(p, re.I) for p in pats] for t, pats in raw.items()}
+    )
+
+
+@pytest.fixture(
+    params=["shipped", "builtin"],
+    ids=["conf/regex_pattern.json", "built-in defaults"],
+)
+def raw_patterns(request, monkeypatch):
+    if request.param == "builtin":
+        monkeypatch.setattr(database, "DEFAULT_REGEX_PATH", "/nonexistent.json")
+    raw = load_regex_from_file()
+    assert raw.get("season_episode") and raw.get("episode_only")
+    return raw
+
+
+def test_matches_sequential_search_on_release_corpus(raw_patterns):
+    matcher = _matcher(raw_patterns)
+    mismatches = [
+        name
+        for name in release_names(5000, seed=7)
+        if _engine_match(matcher, name) != _sequential_match(raw_patterns, name)
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("name", CASE_FOLD_NAMES)
+def test_matches_sequential_search_with_unicode_case_folding(raw_patterns, name):
+    expected = _sequential_match(raw_patterns, name)
+    assert expected is not None
+    assert _engine_match(_matcher(raw_patterns), name) == expected
+
+
+def test_fold_unsafe_letters_are_not_prefilter_tokens(raw_patterns):
+    tokens = _matcher(raw_patterns).tokens
+    assert not any("i" in tok or "s" in tok for tok in tokens)
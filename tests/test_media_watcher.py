@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from media_watcher import MediaWatcher
+from scan_context import OwnChanges
+
+
+def _season(root):
+    return sorted(root.glob("*/*/Season *"))[0]
+
+
+def _new_episode(season, episode):
+    path = season / f"[ANi] {season.parent.name} [{episode:02d}][1080p][CHS].mp4"
+    path.touch()
+    return path
+
+
+def _wait_for(results, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while len(results) < count and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+
+def test_own_changes_are_consumed_once(tmp_path):
+    own = OwnChanges()
+    own.moved(tmp_path / "a.mkv", tmp_path / "b.mkv")
+    assert not own.consume(tmp_path / "a.mkv")  # 未启用时不记录
+
+    own.enable(60)
+    own.moved(tmp_path / "a.mkv", tmp_path / "b.mkv")
+    own.removed(tmp_path / "a.nfo")
+    assert own.gone_names(tmp_path) == {"a.mkv", "a.nfo"}
+    assert own.consume(tmp_path / "a.mkv")
+    assert not own.consume(tmp_path / "a.mkv")
+    assert own.consume(str(tmp_path / "b.mkv"))
+    assert not own.consume(tmp_path / "c.mkv")
+    assert own.gone_names(tmp_path) == {"a.nfo"}
+
+    expiring = OwnChanges()
+    expiring.enable(-1)
+    expiring.removed(tmp_path / "d.nfo")
+    assert not expiring.consume(tmp_path / "d.nfo")
+
+
+@pytest.mark.parametrize("mode", ["inotify", "poll"])
+def test_new_episode_after_watch_scan_is_renamed(library, mode):
+    renamer, root = library
+    renamer.scan_and_rename(full_sweep=True)
+    season = _season(root)
+    results = []
+    watcher = MediaWatcher(
+        renamer, on_result=results.append, mode=mode, debounce=0.3, poll_interval=0.2
+    )
+    if not watcher.start() or watcher.active_mode != mode:
+        pytest.skip(f"{mode} unavailable")
+    try:
+        time.sleep(0.3)
+        first = _new_episode(season, 7)
+        _wait_for(results, 1)
+        assert [r["renamed"] for r in results] == [1]
+        assert not first.exists()
+
+        # 紧接着上一次监听扫描放入的新剧集不能被当作扫描自身的改动
+        time.sleep(0.1)
+        second = _new_episode(season, 8)
+        _wait_for(results, 2)
+        assert [r["renamed"] for r in results] == [1, 1]
+        assert not second.exists()
+
+        # 扫描自身的重命名和记录文件写入不再触发扫描
+        time.sleep(1.5)
+    finally:
+        watcher.stop()
+    assert len(results) == 2
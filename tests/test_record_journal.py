@@ -0,0 +1,103 @@
+import json
+
+from record_journal import (
+    LEGACY_FILES,
+    RENAME_JOURNAL,
+    RecordJournal,
+    read_change_records,
+)
+
+SEASON_DIR = "/m/S1"
+
+
+def _record(path, status, timestamp, new=None, error=None, **extra):
+    record = {
+        "path": f"{SEASON_DIR}/{path}",
+        "original": f"{path}.orig",
+        "new": new,
+        "type": "rename",
+        "status": status,
+        "error": error,
+        "timestamp": timestamp,
+        "media_type": None,
+        "rollback": False,
+        "scan_id": None,
+    }
+    record.update(extra)
+    return record
+
+
+# 每批对应一次扫描的写入，覆盖状态变化、同状态只补非空字段、skip 重复写入不改动、
+# 成功记录不被之后的失败覆盖
+BATCHES = [
+    [
+        _record("a", "success", "01", new="A1", media_type="anime", scan_id="s1"),
+        _record("b", "failed", "01", error="busy"),
+        _record("c", "skip", "01"),
+    ],
+    [
+        _record("a", "success", "02", scan_id="s2"),
+        _record("b", "failed", "02"),
+        _record("c", "skip", "02", error="ignored"),
+    ],
+    [
+        _record("b", "success", "03", new="B1"),
+        _record("a", "failed", "04", error="gone", rollback=True),
+        _record("d", "skip", "04"),
+    ],
+]
+
+
+def _by_path(records):
+    return {r["path"]: r for r in records}
+
+
+def test_append_compact_read_round_trip(tmp_path):
+    journal = RecordJournal()
+    for batch in BATCHES:
+        journal.append_change_records(tmp_path, batch)
+    before = read_change_records(tmp_path)
+    size = journal.compact(tmp_path)
+
+    lines = (tmp_path / RENAME_JOURNAL).read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 4
+    assert size == (tmp_path / RENAME_JOURNAL).stat().st_size
+    assert read_change_records(tmp_path) == before
+
+    # 压缩后继续追加，视图与不压缩时一致
+    extra = [_record("c", "success", "05", new="C1")]
+    journal.append_change_records(tmp_path, extra)
+    view = read_change_records(tmp_path)
+    assert [r["timestamp"] for r in view] == ["05", "04", "03", "02"]
+    assert _by_path(view)[f"{SEASON_DIR}/c"]["new"] == "C1"
+
+
+def test_view_matches_change_record_upsert(tmp_path, config_db):
+    journal = RecordJournal()
+    for batch in BATCHES:
+        journal.append_change_records(tmp_path, batch)
+        config_db.add_change_records(
+            [dict(r, season_dir=SEASON_DIR) for r in batch]
+        )
+    journal.compact(tmp_path)
+
+    assert _by_path(read_change_records(tmp_path)) == _by_path(
+        config_db.get_season_change_records(SEASON_DIR)
+    )
+
+
+def test_legacy_file_is_merged_once(tmp_path):
+    legacy = [_record("a", "success", "02", new="A1"), _record("b", "skip", "01")]
+    legacy_path = tmp_path / LEGACY_FILES[RENAME_JOURNAL]
+    legacy_path.write_text(json.dumps(legacy), encoding="utf-8")
+    assert read_change_records(tmp_path) == legacy
+
+    journal = RecordJournal()
+    journal.append_change_records(tmp_path, [_record("a", "success", "03", new="A2")])
+    assert not legacy_path.exists()
+    view = _by_path(read_change_records(tmp_path))
+    assert view[f"{SEASON_DIR}/a"]["new"] == "A2"
+    assert view[f"{SEASON_DIR}/b"]["status"] == "skip"
+
+    journal.compact(tmp_path)
+    assert _by_path(read_change_records(tmp_path)) == view
@@ -0,0 +1,124 @@
+import threading
+
+import embress_renamer
+from scan_jobs import ScanProgress
+
+
+def _season_count(root):
+    return sum(1 for _ in root.glob("*/*/Season *"))
+
+
+def test_full_sweep_estimates_total_from_previous_index(library):
+    renamer, root = library
+    first = ScanProgress()
+    renamer.scan_and_rename(full_sweep=True, progress=first)
+    assert first.seasons_total is None  # 首次扫描没有索引可供估算
+
+    sweep = ScanProgress()
+    result = renamer.scan_and_rename(full_sweep=True, progress=sweep)
+    assert result["status"] == "completed"
+    assert sweep.seasons_total == _season_count(root)
+
+
+def _blocking_scan(renamer, monkeypatch, release):
+    """把 _scan 替换为推进一点进度后阻塞，直到被取消或 release 置位"""
+    started = threading.Event()
+
+    def fake_scan(ctx, full_sweep):
+        ctx.progress.set_total(5)
+        ctx.progress.add(seasons=2, files=7)
+        started.set()
+        while not (ctx.progress.cancelled or release.wait(0.01)):
+            pass
+        status = "cancelled" if ctx.progress.cancelled else "completed"
+        return {"status": status, "full_sweep": full_sweep}
+
+    monkeypatch.setattr(renamer, "_scan", fake_scan)
+    return started
+
+
+def test_attached_full_scan_shares_progress_and_cancel(library, monkeypatch):
+    renamer, _ = library
+    monkeypatch.setattr(embress_renamer, "ATTACH_POLL_SECONDS", 0.01)
+    release = threading.Event()
+    started = _blocking_scan(renamer, monkeypatch, release)
+    results = {}
+    owner = threading.Thread(
+        target=lambda: results.setdefault("owner", renamer.scan_and_rename())
+    )
+    owner.start()
+    assert started.wait(5)
+
+    attached_progress = ScanProgress()
+    attached = threading.Thread(
+        target=lambda: results.setdefault(
+            "attached", renamer.scan_and_rename(progress=attached_progress)
+        )
+    )
+    attached.start()
+    for _ in range(500):
+        if attached_progress.seasons_done == 2:
+            break
+        threading.Event().wait(0.01)
+    assert attached_progress.as_dict()["seasons_total"] == 5
+    assert attached_progress.files_parsed == 7
+
+    attached_progress.cancel()
+    owner.join(5)
+    attached.join(5)
+    assert results["owner"]["status"] == "cancelled"
+    assert results["attached"]["status"] == "cancelled"
+    assert results["attached"]["attached"] is True
+
+
+def test_full_sweep_is_not_downgraded_while_incremental_scan_runs(
+    library, monkeypatch
+):
+    renamer, _ = library
+    release = threading.Event()
+    started = _blocking_scan(renamer, monkeypatch, release)
+    owner = threading.Thread(target=renamer.scan_and_rename)
+    owner.start()
+    assert started.wait(5)
+    try:
+        assert renamer.full_scan_busy(True)
+        assert not renamer.full_scan_busy(False)
+        assert renamer.scan_and_rename(full_sweep=True)["status"] == "busy"
+    finally:
+        release.set()
+        owner.join(5)
+    assert not renamer.full_scan_busy(True)
+
+
+def test_unrenamed_files_are_staged_and_moved_into_history(library, config_db):
+    renamer, root = library
+    season = sorted(root.glob("*/*/Season *"))[0]
+    for name in ("no episode here.mkv", "still nothing.mkv"):
+        (season / name).touch()
+    result = renamer.scan_and_rename(sub_path=str(season.relative_to(root)))
+    assert "unrenamed_files" not in result
+    assert result["unrenamed_count"] >= 2
+
+    history_id = config_db.add_scan_history(result)
+    files, total = config_db.get_unrenamed_files(history_id, limit=1000)
+    assert total == result["unrenamed_count"]
+    assert {str(season / "no episode here.mkv"), str(season / "still nothing.mkv")} <= {
+        f["path"] for f in files
+    }
+    # 暂存记录已移入历史，再次写入同一结果不会重复
+    second_id = config_db.add_scan_history(result)
+    assert config_db.get_unrenamed_files(second_id) == ([], 0)
+
+
+def test_discarded_results_drop_staged_unrenamed_files(config_db):
+    config_db.add_pending_unrenamed("scan-1", ["/m/S1/a.mkv"])
+    config_db.discard_pending_unrenamed("scan-1")
+    history_id = config_db.add_scan_history(
+        {
+            "status": "completed",
+            "timestamp": "1",
+            "scan_id": "scan-1",
+            "unrenamed_count": 1,
+        }
+    )
+    assert config_db.get_unrenamed_files(history_id) == ([], 0)
@@ -0,0 +1,41 @@
+import threading
+
+from scan_jobs import JOB_FAILED, ScanJobManager
+
+
+def test_submit_merges_only_jobs_with_identical_params():
+    release = threading.Event()
+    manager = ScanJobManager(lambda job: release.wait(5) and {}, lambda job: None)
+    try:
+        first = manager.submit("manual", "ALL", full_sweep=False)
+        assert manager.submit("manual", "ALL", full_sweep=False) is first
+        assert manager.submit("manual", "ALL", full_sweep=True) is not first
+    finally:
+        release.set()
+
+
+def test_busy_result_fails_the_job():
+    done = threading.Event()
+    manager = ScanJobManager(
+        lambda job: {"status": "busy", "message": "running"},
+        lambda job: done.set(),
+    )
+    job = manager.submit("manual", "ALL", full_sweep=True)
+    assert done.wait(5)
+    assert job.status == JOB_FAILED
+
+
+def test_job_dicts_carry_only_the_unrenamed_count():
+    done = threading.Event()
+    manager = ScanJobManager(
+        lambda job: {
+            "status": "completed",
+            "unrenamed_files": [{"path": "/m/S1/a.mkv"}, {"path": "/m/S1/b.mkv"}],
+        },
+        lambda job: done.set(),
+    )
+    job = manager.submit("manual", "ALL")
+    assert done.wait(5)
+    assert job.result["unrenamed_files"]  # 完整结果仍交给 on_finish 持久化
+    for data in [job.as_dict(), *manager.list()]:
+        assert data["result"] == {"status": "completed", "unrenamed_count": 2}